@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import http.server
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from bakkesmod_linux.download import Downloader
+
+RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)")
+
+class ThrottledHandler(http.server.BaseHTTPRequestHandler):
+    # stand-in for the github asset host: ranges, per connection throttling
+    # and optional dropped connections to exercise retries
+    payload = b""
+    rate = 0
+    drop_after = 0
+    ranges = True
+
+    def log_message(self, *args):
+        pass
+
+    def _headers(self, status: int, start: int, end: int):
+        self.send_response(status)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("ETag", '"bench"')
+
+        if self.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(self.payload)}")
+
+        self.end_headers()
+
+    def _span(self) -> tuple[int, int, int]:
+        size = len(self.payload)
+        match = RANGE_RE.fullmatch(self.headers.get("Range", "")) if self.ranges else None
+
+        if not match:
+            return 200, 0, size - 1
+
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else size - 1
+        return 206, start, min(end, size - 1)
+
+    def do_HEAD(self):
+        self._headers(*self._span())
+
+    def do_GET(self):
+        status, start, end = self._span()
+        self._headers(status, start, end)
+
+        sent = 0
+        chunk = 64 * 1024
+        started = time.monotonic()
+
+        for offset in range(start, end + 1, chunk):
+            data = self.payload[offset:min(offset + chunk, end + 1)]
+
+            if self.drop_after and sent + len(data) > self.drop_after:
+                return
+
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+            sent += len(data)
+
+            if self.rate:
+                ahead = sent / self.rate - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+def serve(handler) -> http.server.ThreadingHTTPServer:
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run_case(name: str, url: str, dest: Path, connections: int, expected: str):
+    dest.unlink(missing_ok=True)
+    downloader = Downloader(connections=connections)
+
+    start = time.perf_counter()
+    # the inline hash is checked against a second pass over the file
+    inline = downloader.download(url, dest, digest=expected)
+    elapsed = time.perf_counter() - start
+
+    digest = hashlib.sha256(dest.read_bytes()).hexdigest()
+    status = "ok" if digest == expected == inline else "CORRUPT"
+    mib = dest.stat().st_size / (1024 * 1024)
+    print(f"{name:<28} {elapsed:>8.2f}s {mib / elapsed:>9.1f} MiB/s  {status}")
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark the downloader against a throttled local server")
+    parser.add_argument("--size-mb", type=int, default=32, help="payload size")
+    parser.add_argument("--rate-mb", type=float, default=8, help="per connection throttle in MiB/s")
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size_mb * 1024 * 1024)
+    expected = hashlib.sha256(payload).hexdigest()
+    rate = int(args.rate_mb * 1024 * 1024)
+
+    handlers = {
+        "ranged": type("Ranged", (ThrottledHandler,), {"payload": payload, "rate": rate}),
+        "no-ranges": type("Plain", (ThrottledHandler,), {"payload": payload, "rate": rate, "ranges": False}),
+        "flaky": type("Flaky", (ThrottledHandler,), {
+            "payload": payload, "rate": rate, "drop_after": 3 * 1024 * 1024
+        }),
+    }
+    servers = {name: serve(handler) for name, handler in handlers.items()}
+
+    def url(name):
+        return f"http://127.0.0.1:{servers[name].server_port}/bakkesmod.zip"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dest = Path(tmp) / "bakkesmod.zip"
+
+        print(f"{args.size_mb} MiB payload, {args.rate_mb} MiB/s per connection\n")
+        run_case("single stream", url("ranged"), dest, 1, expected)
+        run_case("4 connections", url("ranged"), dest, 4, expected)
+        run_case("8 connections", url("ranged"), dest, 8, expected)
+        run_case("no Accept-Ranges fallback", url("no-ranges"), dest, 4, expected)
+        run_case("dropping connections", url("flaky"), dest, 4, expected)
+
+        # simulate a crash halfway: keep the .part and state, then resume
+        dest.unlink(missing_ok=True)
+        crashing = Downloader(connections=4)
+        original = crashing._fetch_segment
+        calls = []
+
+        class Crash(Exception):
+            pass
+
+        def crash_after_half(url_, fd, start, end, transfer):
+            calls.append(start)
+            if len(calls) > 4:
+                raise Crash()
+            original(url_, fd, start, end, transfer)
+
+        crashing._fetch_segment = crash_after_half
+
+        try:
+            crashing.download(url("ranged"), dest)
+        except Crash:
+            pass
+
+        resumed = dest.with_name(f"{dest.name}.part").exists()
+        start = time.perf_counter()
+        inline = Downloader(connections=4).download(url("ranged"), dest, digest=expected)
+        elapsed = time.perf_counter() - start
+        status = "ok" if hashlib.sha256(dest.read_bytes()).hexdigest() == expected == inline else "CORRUPT"
+        print(f"{'resume after crash':<28} {elapsed:>8.2f}s {'':>15}  {status} (resumed: {resumed})")
+
+if __name__ == "__main__":
+    main()
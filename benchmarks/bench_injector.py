@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from bakkesmod_linux.injector_session import InjectorError, InjectorSession, ProcessTransport
+
+FAKE_INJECTOR = Path(__file__).resolve().parent / "fake_injector.py"
+
+def oneshot(env: dict[str, str], ops: int) -> float:
+    # what every get-path / inject cost before: a fresh process each time
+    start = time.perf_counter()
+
+    for index in range(ops):
+        args = ["--get-path"] if index % 2 == 0 else []
+        subprocess.run([sys.executable, str(FAKE_INJECTOR), *args], env=env, check=True, capture_output=True)
+
+    return time.perf_counter() - start
+
+def served(env: dict[str, str], ops: int) -> float:
+    session = InjectorSession(lambda: ProcessTransport([sys.executable, str(FAKE_INJECTOR), "--serve"], env))
+    start = time.perf_counter()
+
+    for index in range(ops):
+        if index % 2 == 0:
+            session.get_path()
+        else:
+            assert session.inject() == 0
+
+    elapsed = time.perf_counter() - start
+    session.close()
+    return elapsed
+
+def check_recovery(env: dict[str, str]):
+    session = InjectorSession(lambda: ProcessTransport([sys.executable, str(FAKE_INJECTOR), "--serve"], env))
+    session.get_path()
+
+    try:
+        session.request("crash")
+    except InjectorError as e:
+        print(f"helper crash surfaced as: {e}")
+
+    # the next command transparently starts a new helper
+    print(f"after restart: get-path -> {session.get_path()}")
+    session.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="compare one wine process per command with a served injector")
+    parser.add_argument("--ops", type=int, default=10, help="number of get-path / inject commands")
+    parser.add_argument("--startup", type=float, default=0.5, help="simulated wine startup in seconds")
+    args = parser.parse_args()
+
+    env = dict(os.environ, FAKE_INJECTOR_STARTUP=str(args.startup))
+
+    print(f"{args.ops} commands, {args.startup}s simulated wine startup\n")
+    print(f"{'one process per command':<28} {oneshot(env, args.ops):>8.2f}s")
+    print(f"{'served helper':<28} {served(env, args.ops):>8.2f}s\n")
+    check_recovery(env)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from bakkesmod_linux.procscan import ProcessScanner
+from fixtures import PROCESS_NAME, build_proc_tree
+
+def measure(fn, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs
+
+def bench_size(count: int, runs: int) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        expected = build_proc_tree(root, count)
+
+        scanner = ProcessScanner(str(root))
+
+        cold_start = time.perf_counter()
+        result = scanner.find(PROCESS_NAME)
+        cold = time.perf_counter() - cold_start
+
+        assert result is not None and result[0] == expected, result
+
+        warm = measure(lambda: scanner.find(PROCESS_NAME), runs)
+
+    return {"processes": count, "cold_ms": cold * 1000, "warm_ms": warm * 1000}
+
+def bench_pgrep(runs: int) -> float | None:
+    if not any((Path(p) / "pgrep").exists() for p in os.get_exec_path()):
+        return None
+
+    def spawn():
+        subprocess.run(["pgrep", "-f", PROCESS_NAME], capture_output=True, check=False)
+
+    return measure(spawn, runs) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark the /proc scanner on synthetic trees")
+    parser.add_argument("--sizes", default="500,2000,5000,10000", help="comma separated process counts")
+    parser.add_argument("--runs", type=int, default=20, help="warm scans per size")
+    args = parser.parse_args()
+
+    print(f"{'processes':>10} {'cold (ms)':>10} {'warm (ms)':>10} {'per proc (us)':>14}")
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        result = bench_size(size, args.runs)
+        per_proc = result["warm_ms"] * 1000 / size
+        print(f"{size:>10} {result['cold_ms']:>10.2f} {result['warm_ms']:>10.2f} {per_proc:>14.2f}")
+
+    pgrep = bench_pgrep(args.runs)
+
+    if pgrep is not None:
+        real = measure(lambda: ProcessScanner().find(PROCESS_NAME), args.runs) * 1000
+        live = len([p for p in os.listdir("/proc") if p.isdigit()])
+        print(f"\nreal /proc ({live} processes): pgrep fork+exec {pgrep:.2f} ms, scanner (cold) {real:.2f} ms")
+
+if __name__ == "__main__":
+    main()
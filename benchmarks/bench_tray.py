@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+# seconds the app is left alone before its idle memory is read
+SETTLE = 3.0
+# shortened window release delay, the real one is a minute
+RELEASE_DELAY = 0.5
+
+def rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+    return 0
+
+def child(mode: str, output: Path):
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QApplication
+    from bakkesmod_linux import gui
+    from bakkesmod_linux.bakkesmod import BakkesHelper
+
+    # the startup update check would go to github
+    BakkesHelper.startup = lambda self, progress: progress.done("up to date")
+    gui.WINDOW_RELEASE_DELAY = RELEASE_DELAY
+
+    app = QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)
+    tray = gui.BakkesTray(show_window=mode == "window")
+
+    # the app logs to stdout from several threads, results go to a file
+    results = {}
+
+    def report(**fields):
+        results.update(fields)
+
+    def finish():
+        output.write_text(json.dumps(results))
+        os._exit(0)
+
+    def first_show():
+        report(rss_idle_kb=rss_kb())
+
+        if mode == "window":
+            finish()
+
+        start = time.perf_counter()
+        tray.show_window()
+        report(build_ms=(time.perf_counter() - start) * 1000)
+        QTimer.singleShot(int(SETTLE * 1000), hide)
+
+    def hide():
+        report(rss_shown_kb=rss_kb())
+        tray.hide_window()
+        QTimer.singleShot(int((RELEASE_DELAY + SETTLE) * 1000), released)
+
+    def released():
+        report(rss_released_kb=rss_kb(), released=tray.window is None)
+        finish()
+
+    # wall clock, compared against when the parent spawned us
+    QTimer.singleShot(0, lambda: report(ready_at=time.time()))
+    QTimer.singleShot(int(SETTLE * 1000), first_show)
+    app.exec()
+
+def run(mode: str) -> dict:
+    with tempfile.TemporaryDirectory() as home:
+        output = Path(home) / "result.json"
+        env = dict(os.environ, HOME=home, PYTHONPATH=str(SRC))
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+        started_at = time.time()
+        subprocess.run(
+            [sys.executable, __file__, "--child", mode, "--output", str(output)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True
+        )
+
+        result = json.loads(output.read_text())
+        result["startup_ms"] = (result.pop("ready_at") - started_at) * 1000
+        return result
+
+def main():
+    parser = argparse.ArgumentParser(description="startup time and idle memory of the tray app, with and without the window")
+    parser.add_argument("--runs", type=int, default=3, help="runs per mode")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--output", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.output)
+        return
+
+    print(f"platform {os.getenv('QT_QPA_PLATFORM', 'offscreen')}, medians of {args.runs} runs\n")
+
+    for mode in ("window", "tray"):
+        results = [run(mode) for _ in range(args.runs)]
+
+        def median(key):
+            values = [result[key] for result in results if key in result]
+            return statistics.median(values) if values else None
+
+        line = f"{mode:<8} startup {median('startup_ms'):>6.0f} ms  idle {median('rss_idle_kb') / 1024:>6.1f} MB"
+
+        if mode == "tray":
+            line += (
+                f"  window built in {median('build_ms'):.0f} ms, shown {median('rss_shown_kb') / 1024:.1f} MB,"
+                f" released {median('rss_released_kb') / 1024:.1f} MB"
+            )
+
+        print(line)
+
+if __name__ == "__main__":
+    main()
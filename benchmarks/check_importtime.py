@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+# modules that must stay off the cold path, they cost >100ms each
+HEAVY_MODULES = ("PySide6", "requests")
+
+# module -> cumulative import budget in ms, measured with -X importtime
+IMPORT_BUDGETS = {
+    "bakkesmod_linux.core": 30,
+    "bakkesmod_linux.bakkesmod": 80,
+}
+
+# wall clock budget for a cli path that never needs qt
+CLI_BUDGET_MS = 250
+CLI_RUNS = 5
+
+def import_profile(module: str) -> dict[str, int]:
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    # "import time: self [us] | cumulative | imported package"
+    cumulative = {}
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        _, total, name = line.split("|")
+
+        if total.strip().isdigit():
+            cumulative[name.strip()] = int(total)
+
+    return cumulative
+
+def cli_wall_time() -> float:
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    samples = []
+
+    for _ in range(CLI_RUNS):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "bakkesmod_linux.core", "--help"],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            check=True
+        )
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="fail if cold start imports regress")
+    parser.add_argument("--cli-budget", type=float, default=CLI_BUDGET_MS, help="cli wall time budget in ms")
+    args = parser.parse_args()
+
+    failures = []
+
+    for module, budget in IMPORT_BUDGETS.items():
+        profile = import_profile(module)
+        heavy = [name for name in HEAVY_MODULES if name in profile]
+        elapsed = profile.get(module, 0) / 1000
+
+        status = "ok"
+
+        if heavy:
+            status = f"FAIL imports {', '.join(heavy)}"
+            failures.append(module)
+        elif elapsed > budget:
+            status = f"FAIL over {budget}ms"
+            failures.append(module)
+
+        print(f"{module:<28} {elapsed:>7.1f}ms  {status}")
+
+    wall = cli_wall_time()
+    status = "ok" if wall <= args.cli_budget else f"FAIL over {args.cli_budget:.0f}ms"
+
+    if wall > args.cli_budget:
+        failures.append("cli")
+
+    print(f"{'bakkesmod --help':<28} {wall:>7.1f}ms  {status}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+# stand-in for simple_injector.exe that speaks the same --serve protocol
+# (bkl-serve/1), so the python side can be exercised without wine
+
+import os
+import sys
+import time
+
+STARTUP = float(os.getenv("FAKE_INJECTOR_STARTUP", "0"))
+APPDATA = os.getenv("FAKE_INJECTOR_APPDATA", "C:\\users\\steamuser\\AppData\\Roaming")
+INJECT_CODE = int(os.getenv("FAKE_INJECTOR_CODE", "0"))
+
+def reply(code: int, payload: str):
+    sys.stdout.write(f"{code} {payload}\n")
+    sys.stdout.flush()
+
+def serve():
+    # wine tends to print a line or two before the program runs
+    print("fixme:ntdll:stub noise from the loader", flush=True)
+
+    for line in sys.stdin:
+        command = line.strip()
+
+        if command == "ping":
+            reply(0, "bkl-serve/1")
+        elif command == "get-path":
+            reply(0, APPDATA)
+        elif command == "inject":
+            reply(INJECT_CODE, "injected" if INJECT_CODE == 0 else "failed")
+        elif command == "quit":
+            reply(0, "bye")
+            return
+        elif command == "crash":
+            os._exit(3)
+        else:
+            reply(3, "unknown command")
+
+def main():
+    # the cost a real injector pays for booting wine in the prefix
+    time.sleep(STARTUP)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        serve()
+        return
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--get-path":
+        print(APPDATA)
+        return
+
+    sys.exit(INJECT_CODE)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import io
+import random
+import zipfile
+
+from pathlib import Path
+
+PROCESS_NAME = "RocketLeague.exe"
+
+# roughly what a bakkesmod release looks like: a handful of large dlls,
+# many small plugin/data files and a deep tree of tiny config files
+TREE_LAYOUT = (
+    ("dll", ".dll", 256 * 1024, 0.02),
+    ("plugins", ".dll", 64 * 1024, 0.18),
+    ("data", ".dat", 8 * 1024, 0.40),
+    ("cfg", ".cfg", 512, 0.25),
+    ("plugins/settings", ".set", 1024, 0.15),
+)
+
+# fixture sizes by name, in number of files
+TREE_SIZES = {
+    "small": 200,
+    "medium": 1000,
+    "large": 4000,
+}
+
+def _payload(rng: random.Random, size: int) -> bytes:
+    # half random, half repeated text so deflate has something to do
+    noise = rng.randbytes(size // 2)
+    text = (b"bakkesmod " * (size // 20 + 1))[:size - len(noise)]
+    return noise + text
+
+def tree_files(count: int, seed: int = 0) -> list[tuple[str, bytes]]:
+    rng = random.Random(seed)
+    files = []
+
+    for directory, suffix, size, share in TREE_LAYOUT:
+        for index in range(max(1, int(count * share))):
+            # spread files over a few subdirectories like the real data/ tree
+            sub = f"{index % 8}/" if directory == "data" else ""
+            jitter = rng.randint(size // 2, size)
+            files.append((f"{directory}/{sub}file{index}{suffix}", _payload(rng, jitter)))
+
+    return files
+
+def build_tree(root: Path, count: int, seed: int = 0) -> int:
+    total = 0
+
+    for rel, data in tree_files(count, seed):
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        total += len(data)
+
+    (root / "version.txt").write_text("1")
+    return total
+
+def build_release_zip(count: int, seed: int = 0) -> bytes:
+    # kept in memory, the streaming extractor is fed from it in chunks
+    buffer = io.BytesIO()
+
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        for rel, data in tree_files(count, seed):
+            archive.writestr(rel, data)
+
+        archive.writestr("version.txt", "1")
+
+    return buffer.getvalue()
+
+def write_proc(root: Path, pid: int, ppid: int, comm: str, cmdline: list[str], env: dict[str, str]):
+    proc = root / str(pid)
+    proc.mkdir()
+
+    # only the fields the scanner cares about need to be realistic
+    fields = ["S", str(ppid)] + ["0"] * 17 + [str(1000 + pid)] + ["0"] * 30
+    (proc / "stat").write_text(f"{pid} ({comm}) {' '.join(fields)}\n")
+    (proc / "comm").write_text(f"{comm}\n")
+    (proc / "cmdline").write_bytes("\0".join(cmdline).encode() + b"\0")
+    (proc / "environ").write_bytes(b"".join(f"{k}={v}\0".encode() for k, v in env.items()))
+
+def game_env(extra: int = 0) -> dict[str, str]:
+    # a steam/proton launch carries a lot of unrelated variables
+    env = {"HOME": "/home/user", "PATH": "/usr/bin", "WINEPREFIX": "/tmp/pfx", "WINELOADER": "/usr/bin/wine"}
+    env.update({f"STEAM_VAR_{index}": "x" * 32 for index in range(extra)})
+    return env
+
+def build_proc_tree(root: Path, count: int) -> int:
+    # returns the pid the scanner should find
+    env = {"HOME": "/home/user", "PATH": "/usr/bin"}
+
+    for pid in range(100, 100 + count):
+        write_proc(root, pid, 1, f"proc-{pid}", [f"/usr/bin/proc-{pid}", "--flag"], env)
+
+    # wrapper chain in front of the game, like umu-run -> proton -> game
+    launch_env = game_env(40)
+    base = 100 + count
+    exe = f"C:\\Games\\{PROCESS_NAME}"
+
+    write_proc(root, base, 1, "umu-run", ["umu-run", exe], launch_env)
+    write_proc(root, base + 1, base, "proton", ["python3", "proton", "waitforexitandrun", exe], launch_env)
+    write_proc(root, base + 2, base + 1, PROCESS_NAME[:15], [exe], launch_env)
+
+    return base + 2
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# the cache and config locations are derived from $HOME at import time,
+# point them at a scratch directory so a run never touches the real install
+SCRATCH = Path(tempfile.mkdtemp(prefix="bkl-bench-"))
+os.environ["HOME"] = str(SCRATCH / "home")
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT.parent / "src"))
+
+from bakkesmod_linux.archive import StreamExtractor
+from bakkesmod_linux.bakkesmod import SYMLINK_DIRS
+from bakkesmod_linux.config import ConfigManager
+from bakkesmod_linux.constants import BAKKESMOD_LOCATION
+from bakkesmod_linux.copier import METHODS, CopyEngine, default_workers
+from bakkesmod_linux.procscan import ProcessScanner
+from bakkesmod_linux.progress import ProgressReporter, TransferMeter
+from bakkesmod_linux.store import KIND_BAKKESMOD, VersionStore
+from bakkesmod_linux.sync import DEPLOY_COPY, DEPLOY_LINK, prepare_manifest, sync_tree
+from bakkesmod_linux.utils import filter_game_env
+from fixtures import PROCESS_NAME, TREE_SIZES, build_proc_tree, build_release_zip, build_tree, game_env
+
+RESULTS_DIR = ROOT / "results"
+RESULTS_VERSION = 1
+
+PROC_SIZES = {
+    "small": 500,
+    "medium": 2000,
+    "large": 10000,
+}
+
+# same chunking as the real download loop
+FEED_CHUNK = 256 * 1024
+
+class Suite:
+    def __init__(self, runs: int, selected: list[str] | None):
+        self.runs = runs
+        self.selected = selected
+        self.results: list[dict] = []
+
+    def wants(self, name: str) -> bool:
+        return not self.selected or any(pattern in name for pattern in self.selected)
+
+    def wants_group(self, prefixes: tuple[str, ...]) -> bool:
+        # a filter may be narrower ("sync_tree.warm") or wider ("sync") than the prefix
+        if not self.selected:
+            return True
+
+        return any(pattern in prefix or prefix in pattern for pattern in self.selected for prefix in prefixes)
+
+    def measure(
+        self, name: str, params: dict, fn, setup=None, inner: int = 1, nbytes: int | None = None, extra=None
+    ):
+        # setup runs before every sample and is not timed, inner repeats
+        # the call for operations too quick to time one at a time
+        if not self.wants(name):
+            return
+
+        samples = []
+
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            for _ in range(self.runs):
+                if setup:
+                    setup()
+
+                start = time.perf_counter()
+
+                for _ in range(inner):
+                    fn()
+
+                samples.append((time.perf_counter() - start) / inner)
+
+        median = statistics.median(samples)
+        result = {
+            "name": name,
+            "params": params,
+            "runs": self.runs,
+            "inner": inner,
+            "min_ms": min(samples) * 1000,
+            "median_ms": median * 1000,
+            "mean_ms": statistics.fmean(samples) * 1000,
+            "stdev_ms": statistics.stdev(samples) * 1000 if len(samples) > 1 else 0.0,
+        }
+
+        if nbytes:
+            result["mb_per_s"] = nbytes / median / 1e6
+
+        # measured once after the timed runs, e.g. disk usage of the result
+        if extra:
+            result.update(extra())
+
+        self.results.append(result)
+        print(format_result(result))
+
+def format_result(result: dict) -> str:
+    params = " ".join(f"{key}={value}" for key, value in result["params"].items())
+    line = f"{result['name']:<28} {params:<28} median {result['median_ms']:>10.3f} ms  min {result['min_ms']:>10.3f} ms"
+
+    if "mb_per_s" in result:
+        line += f"  {result['mb_per_s']:>8.1f} MB/s"
+
+    if "own_kb" in result:
+        line += f"  {result['own_kb']:>8} KB on disk"
+
+    return line
+
+def quietly(fn):
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        return fn()
+
+def reset_dir(path: Path):
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True)
+
+def bench_copy(suite: Suite, work: Path, size: str):
+    count = TREE_SIZES[size]
+    src = work / "tree"
+    dst = work / "copy"
+    nbytes = build_tree(src, count)
+    params = {"size": size, "files": count}
+
+    # the engine per method and worker count, against the serial copy2 loop it replaced
+    jobs = [(path, dst / path.relative_to(src)) for path in sorted(src.rglob("*")) if path.is_file()]
+    directories = sorted({target.parent for _, target in jobs})
+
+    def fresh_dst():
+        reset_dir(dst)
+
+        for directory in directories:
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def copy2_serial():
+        for source, target in jobs:
+            shutil.copy2(source, target)
+
+    suite.measure("copy.copy2", params, copy2_serial, fresh_dst, nbytes=nbytes)
+
+    for method in METHODS:
+        # only the first method that works on this filesystem is meaningful
+        methods = METHODS[METHODS.index(method):]
+
+        for workers in sorted({1, default_workers(work)}):
+            engine = CopyEngine(workers, methods=methods)
+            suite.measure(
+                f"copy.{method}", {**params, "workers": workers}, lambda: engine.copy(jobs), fresh_dst, nbytes=nbytes,
+                extra=lambda: {"used": quietly(lambda: CopyEngine(1, methods=methods).copy(jobs[:1], replace=True)).methods}
+            )
+
+    # what the prefix deploy actually uses now, cold and already in sync
+    suite.measure("sync_tree.cold", params, lambda: sync_tree(src, dst), lambda: reset_dir(dst), nbytes=nbytes)
+    quietly(lambda: sync_tree(src, dst))
+    suite.measure("sync_tree.warm", params, lambda: sync_tree(src, dst))
+
+def own_bytes(root: Path) -> dict:
+    # bytes a prefix adds on disk, links into the cache cost nothing
+    total = 0
+
+    for current, _, files in os.walk(root):
+        for name in files:
+            stat = os.lstat(os.path.join(current, name))
+
+            if stat.st_nlink == 1 and not os.path.islink(os.path.join(current, name)):
+                total += stat.st_size
+
+    return {"own_kb": total // 1024}
+
+def bench_deploy(suite: Suite, work: Path, size: str):
+    count = TREE_SIZES[size]
+    src = work / "tree"
+    nbytes = build_tree(src, count)
+    manifest = quietly(lambda: prepare_manifest(src, SYMLINK_DIRS))
+    changed = [path for path in sorted(src.rglob("*.dll"))][::10]
+
+    def update_release():
+        # an update replaces ~10% of the dlls, like the installer does
+        for path in changed:
+            tmp_path = path.with_name(f".{path.name}.part")
+            tmp_path.write_bytes(os.urandom(path.stat().st_size))
+            os.replace(tmp_path, path)
+
+        manifest.clear()
+        manifest.update(prepare_manifest(src, SYMLINK_DIRS))
+
+    # same layout as a real prefix: cfg and plugins are directory symlinks
+    for mode in (DEPLOY_COPY, DEPLOY_LINK):
+        dst = work / f"prefix-{mode}"
+        params = {"size": size, "files": count}
+
+        suite.measure(
+            f"deploy.{mode}.cold", params, lambda: sync_tree(src, dst, SYMLINK_DIRS, manifest, mode),
+            lambda: reset_dir(dst), nbytes=nbytes, extra=lambda: own_bytes(dst)
+        )
+        suite.measure(
+            f"deploy.{mode}.update", params, lambda: sync_tree(src, dst, SYMLINK_DIRS, manifest, mode),
+            update_release, extra=lambda: own_bytes(dst)
+        )
+
+def bench_procscan(suite: Suite, work: Path, size: str):
+    count = PROC_SIZES[size]
+    root = work / "proc"
+    root.mkdir()
+    expected = build_proc_tree(root, count)
+    params = {"size": size, "processes": count}
+
+    found = ProcessScanner(str(root)).find(PROCESS_NAME)
+    assert found is not None and found[0] == expected, found
+
+    # get_process_env is a thin wrapper over the shared scanner
+    suite.measure("get_process_env.cold", params, lambda: ProcessScanner(str(root)).find(PROCESS_NAME))
+    scanner = ProcessScanner(str(root))
+    suite.measure("get_process_env.warm", params, lambda: scanner.find(PROCESS_NAME))
+
+def bench_filter_env(suite: Suite):
+    for extra in (50, 500):
+        env = game_env(extra)
+        suite.measure("filter_game_env", {"vars": len(env)}, lambda: filter_game_env(env), inner=1000)
+
+def bench_install(suite: Suite, work: Path, size: str):
+    count = TREE_SIZES[size]
+    archive = build_release_zip(count)
+    dest = work / "install"
+    params = {"size": size, "members": count, "zip_kb": len(archive) // 1024}
+
+    def install(version: str):
+        # mirrors BakkesHelper._stream_install without the network
+        store = VersionStore(dest / "store", dest)
+        previous = store.current_path(KIND_BAKKESMOD)
+        previous_index = store.index(previous.name) if previous else {}
+        staging = store.begin(KIND_BAKKESMOD, version)
+
+        def is_unchanged(name, crc, size):
+            return previous is not None and previous_index.get(name) == (crc, size) and (previous / name).is_file()
+
+        extractor = StreamExtractor(staging, is_unchanged=is_unchanged)
+
+        for offset in range(0, len(archive), FEED_CHUNK):
+            extractor.feed(archive[offset:offset + FEED_CHUNK])
+
+        extractor.finish()
+
+        if previous is not None:
+            store.link_unchanged(staging, previous, list(extractor.members))
+
+        return store, store.commit(KIND_BAKKESMOD, version, staging, extractor.members, previous=previous)
+
+    suite.measure("install.cold", params, lambda: install("1"), lambda: reset_dir(dest), nbytes=len(archive))
+
+    # a new release with nothing changed only checks crcs and links the old files
+    store, name = quietly(lambda: install("1"))
+    quietly(lambda: store.activate(KIND_BAKKESMOD, name))
+    suite.measure("install.unchanged", params, lambda: install("2"), nbytes=len(archive))
+
+def bench_config(suite: Suite):
+    data_file = BAKKESMOD_LOCATION / "data.json"
+    BAKKESMOD_LOCATION.mkdir(parents=True, exist_ok=True)
+
+    def fresh_config(entries: int):
+        history = [{"time": index, "mode": "auto", "success": True} for index in range(entries)]
+        data_file.write_text(json.dumps({"bakkesmod_version": "1", "inject_history": history}))
+
+    for entries in (20, 2000):
+        params = {"history": entries}
+        fresh_config(entries)
+
+        suite.measure("config.load", params, ConfigManager)
+
+        config = ConfigManager()
+        counter = iter(range(10 ** 9))
+        suite.measure("config.get", params, lambda: config.get("bakkesmod_version"), inner=1000)
+        suite.measure("config.set", params, lambda: config.set("counter", next(counter)))
+
+        def batch():
+            with config.transaction():
+                for index in range(50):
+                    config.set(f"key{index}", next(counter))
+
+        suite.measure("config.transaction50", params, batch)
+
+def bench_progress(suite: Suite):
+    # what a download costs in progress reporting alone, the callback
+    # stands in for the cross thread signal the gui pays per update
+    total = 64 * 1024 * 1024
+
+    for chunk in (8 * 1024, FEED_CHUNK):
+        params = {"mib": total // (1024 * 1024), "chunk_kb": chunk // 1024}
+        callbacks = []
+
+        def report():
+            callbacks.clear()
+            reporter = ProgressReporter(lambda message, percentage: callbacks.append(percentage))
+            meter = TransferMeter(total)
+
+            for _ in range(total // chunk):
+                if meter.add(chunk):
+                    reporter.progress(meter.describe("downloading..."), meter.percentage)
+
+            reporter.done("downloaded")
+
+        suite.measure("progress.download", params, report, extra=lambda: {"callbacks": len(callbacks)})
+
+# case name prefixes each sized benchmark produces, to skip building
+# fixtures nobody asked for
+BENCHES = (
+    (("copy.", "sync_tree."), bench_copy),
+    (("deploy.",), bench_deploy),
+    (("get_process_env.",), bench_procscan),
+    (("install.",), bench_install),
+)
+
+def git_revision() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return result.stdout.strip() or None
+
+def compare(baseline_path: Path, results: list[dict], threshold: float) -> int:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    previous = {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in baseline["results"]}
+    regressions = 0
+
+    print(f"\ncompared with {baseline_path} ({baseline['meta'].get('revision') or 'unknown revision'})")
+
+    for result in results:
+        old = previous.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+
+        if old is None:
+            continue
+
+        change = (result["median_ms"] / old["median_ms"] - 1) * 100 if old["median_ms"] else 0.0
+        flag = ""
+
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -threshold:
+            flag = "  faster"
+
+        params = " ".join(f"{key}={value}" for key, value in result["params"].items())
+        print(f"{result['name']:<28} {params:<28} {old['median_ms']:>10.3f} -> {result['median_ms']:>10.3f} ms ({change:+.1f}%){flag}")
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="offline micro benchmarks for the hot i/o paths")
+    parser.add_argument("--sizes", default="small,medium", help=f"comma separated fixture sizes ({', '.join(TREE_SIZES)})")
+    parser.add_argument("--runs", type=int, default=5, help="timed samples per case")
+    parser.add_argument("--filter", action="append", help="only run cases whose name contains this (repeatable)")
+    parser.add_argument("--output", type=Path, help="where to write the json results (default: benchmarks/results/)")
+    parser.add_argument("--compare", type=Path, help="a previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="slowdown in %% reported as a regression")
+    parser.add_argument(
+        "--workdir", type=Path, help="where the fixtures are built, e.g. a btrfs or xfs mount (default: a tmp dir)"
+    )
+    args = parser.parse_args()
+
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in TREE_SIZES]
+
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+
+    suite = Suite(max(args.runs, 1), args.filter)
+
+    try:
+        for size in sizes:
+            for prefixes, bench in BENCHES:
+                if not suite.wants_group(prefixes):
+                    continue
+
+                work = (args.workdir or SCRATCH) / f"bkl-{bench.__name__}-{size}"
+                shutil.rmtree(work, ignore_errors=True)
+                work.mkdir(parents=True)
+                bench(suite, work, size)
+                shutil.rmtree(work)
+
+        if suite.wants_group(("filter_game_env",)):
+            bench_filter_env(suite)
+
+        if suite.wants_group(("config.",)):
+            bench_config(suite)
+
+        if suite.wants_group(("progress.",)):
+            bench_progress(suite)
+    finally:
+        shutil.rmtree(SCRATCH, ignore_errors=True)
+
+    report = {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "time": int(time.time()),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "sizes": sizes,
+            "runs": suite.runs,
+        },
+        "results": suite.results,
+    }
+
+    output = args.output or RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nresults written to {output}")
+
+    if args.compare and compare(args.compare, suite.results, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
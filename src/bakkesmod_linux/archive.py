@@ -0,0 +1,335 @@
+import json
+import os
+import struct
+import zlib
+
+from pathlib import Path
+from typing import BinaryIO, Callable
+from bakkesmod_linux.utils import write_atomic
+
+LOCAL_HEADER_SIG = 0x04034B50
+CENTRAL_HEADER_SIG = 0x02014B50
+END_OF_CENTRAL_SIG = 0x06054B50
+DESCRIPTOR_SIG = 0x08074B50
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+ZIP64_EXTRA_ID = 0x0001
+ZIP64_LIMIT = 0xFFFFFFFF
+
+FLAG_ENCRYPTED = 0x1
+FLAG_DESCRIPTOR = 0x8
+
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+
+INSTALL_INDEX_NAME = "install_index.json"
+
+# member name -> (crc32, uncompressed size)
+InstallIndex = dict[str, tuple[int, int]]
+
+class ZipStreamError(Exception):
+    pass
+
+def safe_member_path(name: str) -> str | None:
+    # same idea as zipfile.extract: drop absolute roots and parent references
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    return "/".join(parts) if parts else None
+
+class _Member:
+    def __init__(
+        self, name: str, flags: int, method: int, crc: int, compressed_size: int, size: int, zip64: bool
+    ):
+        self.name = name
+        self.flags = flags
+        self.method = method
+        self.crc = crc
+        self.compressed_size = compressed_size
+        self.expected_size = size
+        self.zip64 = zip64
+        self.remaining = compressed_size
+        self.running_crc = 0
+        self.size = 0
+        self.decompressor = zlib.decompressobj(-15) if method == METHOD_DEFLATED else None
+        self.output: BinaryIO | None = None
+        self.target: Path | None = None
+        self.tmp_path: Path | None = None
+        # sizes are known and nothing is written, so the data can be skipped
+        self.discard = False
+
+    @property
+    def has_descriptor(self) -> bool:
+        return bool(self.flags & FLAG_DESCRIPTOR)
+
+class StreamExtractor:
+    # extracts a zip from sequential chunks using the local file headers,
+    # so members land on disk while the rest of the archive is still downloading
+    def __init__(
+        self,
+        dest: Path,
+        on_member: Callable[[str], None] | None = None,
+        is_unchanged: Callable[[str, int, int], bool] | None = None
+    ):
+        self.dest = dest
+        self.on_member = on_member
+        self.is_unchanged = is_unchanged or (lambda name, crc, size: False)
+        self.members: InstallIndex = {}
+        self._buffer = bytearray()
+        self._member: _Member | None = None
+        self._done = False
+
+    def feed(self, chunk: bytes):
+        self._buffer += chunk
+
+        try:
+            while not self._done and self._step():
+                pass
+        except Exception:
+            self._abort_member()
+            raise
+
+    def finish(self):
+        if not self._done:
+            self._abort_member()
+            raise ZipStreamError("archive ended before the central directory")
+
+    def _step(self) -> bool:
+        if self._member is None:
+            return self._read_header()
+
+        member = self._member
+
+        if member.remaining is None or member.remaining > 0:
+            return self._read_data(member)
+
+        if member.has_descriptor:
+            return self._read_descriptor(member)
+
+        self._finish_member(member, member.crc)
+        return True
+
+    def _read_header(self) -> bool:
+        if len(self._buffer) < 4:
+            return False
+
+        (signature,) = struct.unpack_from("<I", self._buffer)
+
+        if signature in (CENTRAL_HEADER_SIG, END_OF_CENTRAL_SIG):
+            self._done = True
+            self._buffer.clear()
+            return False
+
+        if signature != LOCAL_HEADER_SIG:
+            raise ZipStreamError(f"unexpected signature {signature:#x}")
+
+        if len(self._buffer) < LOCAL_HEADER.size:
+            return False
+
+        (
+            _, _, flags, method, _, _, crc, compressed_size, size, name_len, extra_len
+        ) = LOCAL_HEADER.unpack_from(self._buffer)
+
+        header_len = LOCAL_HEADER.size + name_len + extra_len
+
+        if len(self._buffer) < header_len:
+            return False
+
+        name = bytes(self._buffer[LOCAL_HEADER.size:LOCAL_HEADER.size + name_len]).decode("utf-8", errors="replace")
+        extra = bytes(self._buffer[LOCAL_HEADER.size + name_len:header_len])
+        del self._buffer[:header_len]
+
+        if flags & FLAG_ENCRYPTED:
+            raise ZipStreamError(f"{name}: encrypted members are not supported")
+
+        if method not in (METHOD_STORED, METHOD_DEFLATED):
+            raise ZipStreamError(f"{name}: unsupported compression method {method}")
+
+        zip64 = self._has_zip64_extra(extra)
+
+        if compressed_size == ZIP64_LIMIT or size == ZIP64_LIMIT:
+            size, compressed_size = self._zip64_sizes(extra, size, compressed_size)
+
+        member = _Member(name, flags, method, crc, compressed_size, size, zip64)
+
+        if member.has_descriptor:
+            # sizes only show up after the data, deflate tells us where it ends
+            if method == METHOD_DEFLATED:
+                member.remaining = None
+            elif not name.endswith("/"):
+                raise ZipStreamError(f"{name}: stored member with data descriptor")
+
+        self._member = member
+        self._open_output(member)
+        return True
+
+    def _has_zip64_extra(self, extra: bytes) -> bool:
+        offset = 0
+
+        while offset + 4 <= len(extra):
+            field_id, field_len = struct.unpack_from("<HH", extra, offset)
+
+            if field_id == ZIP64_EXTRA_ID:
+                return True
+
+            offset += 4 + field_len
+
+        return False
+
+    def _zip64_sizes(self, extra: bytes, size: int, compressed_size: int) -> tuple[int, int]:
+        offset = 0
+
+        while offset + 4 <= len(extra):
+            field_id, field_len = struct.unpack_from("<HH", extra, offset)
+            data = extra[offset + 4:offset + 4 + field_len]
+            offset += 4 + field_len
+
+            if field_id != ZIP64_EXTRA_ID:
+                continue
+
+            pos = 0
+
+            if size == ZIP64_LIMIT:
+                (size,) = struct.unpack_from("<Q", data, pos)
+                pos += 8
+
+            if compressed_size == ZIP64_LIMIT:
+                (compressed_size,) = struct.unpack_from("<Q", data, pos)
+
+            return size, compressed_size
+
+        raise ZipStreamError("missing zip64 extra field")
+
+    def _read_data(self, member: _Member) -> bool:
+        if not self._buffer:
+            return False
+
+        if member.discard:
+            skipped = min(member.remaining, len(self._buffer))
+            del self._buffer[:skipped]
+            member.remaining -= skipped
+            return True
+
+        if member.remaining is None:
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        else:
+            data = bytes(self._buffer[:member.remaining])
+            del self._buffer[:len(data)]
+            member.remaining -= len(data)
+
+        if member.decompressor is None:
+            self._write(member, data)
+            return True
+
+        self._write(member, member.decompressor.decompress(data))
+
+        if member.decompressor.eof:
+            # anything past the deflate stream belongs to the next record
+            self._buffer[:0] = member.decompressor.unused_data
+            member.remaining = 0
+
+        return True
+
+    def _read_descriptor(self, member: _Member) -> bool:
+        size_len = 8 if member.zip64 else 4
+        body_len = 4 + 2 * size_len
+
+        if len(self._buffer) < 4:
+            return False
+
+        (signature,) = struct.unpack_from("<I", self._buffer)
+        offset = 4 if signature == DESCRIPTOR_SIG else 0
+
+        if len(self._buffer) < offset + body_len:
+            return False
+
+        (crc,) = struct.unpack_from("<I", self._buffer, offset)
+        del self._buffer[:offset + body_len]
+
+        member.flags &= ~FLAG_DESCRIPTOR
+        self._finish_member(member, crc)
+        return True
+
+    def _open_output(self, member: _Member):
+        rel = safe_member_path(member.name)
+        sizes_known = not member.has_descriptor
+
+        if rel is None:
+            member.discard = sizes_known
+            return
+
+        target = self.dest / rel
+
+        if member.name.endswith("/"):
+            target.mkdir(parents=True, exist_ok=True)
+            return
+
+        if sizes_known and self.is_unchanged(member.name, member.crc, member.expected_size):
+            member.discard = True
+            return
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        member.target = target
+        member.tmp_path = target.with_name(f".{target.name}.part")
+        member.output = open(member.tmp_path, "wb")
+
+    def _write(self, member: _Member, data: bytes):
+        if not data:
+            return
+
+        member.running_crc = zlib.crc32(data, member.running_crc)
+        member.size += len(data)
+
+        if member.output:
+            member.output.write(data)
+
+    def _finish_member(self, member: _Member, expected_crc: int):
+        if member.discard:
+            if not member.name.endswith("/"):
+                self.members[member.name] = (expected_crc, member.expected_size)
+            self._member = None
+            return
+
+        if member.decompressor is not None and not member.decompressor.eof:
+            raise ZipStreamError(f"{member.name}: truncated deflate stream")
+
+        if member.running_crc != expected_crc:
+            raise ZipStreamError(f"{member.name}: crc mismatch")
+
+        self._member = None
+
+        if not member.name.endswith("/"):
+            self.members[member.name] = (expected_crc, member.size)
+
+        if not (member.output and member.target and member.tmp_path):
+            return
+
+        member.output.close()
+
+        # with a data descriptor the crc is only known now
+        if self.is_unchanged(member.name, expected_crc, member.size):
+            member.tmp_path.unlink()
+            return
+
+        os.replace(member.tmp_path, member.target)
+
+        if self.on_member:
+            self.on_member(member.name)
+
+    def _abort_member(self):
+        member = self._member
+        self._member = None
+
+        if member and member.output and member.tmp_path:
+            member.output.close()
+            member.tmp_path.unlink(missing_ok=True)
+
+def load_install_index(path: Path) -> InstallIndex:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+    return {name: (entry[0], entry[1]) for name, entry in data.items()}
+
+def save_install_index(path: Path, index: InstallIndex) -> None:
+    write_atomic(path, json.dumps(index, separators=(",", ":")))
@@ -0,0 +1,236 @@
+import os
+import threading
+import time
+
+from typing import NamedTuple
+
+# the renderer dlls show up in the game's mappings once it is past the
+# early loading stage, injecting before that fails with codes 2/3
+READY_MODULES = ("d3d11.dll", "dxgi.dll")
+
+POLL_INTERVAL = 0.5
+# consecutive samples with a stable thread count and settled cpu usage
+STABLE_SAMPLES = 4
+# cpu usage (in cores) may change this much between samples and still count as settled
+CPU_SETTLE_DELTA = 0.25
+# never inject into a process younger than this
+MIN_PROCESS_AGE = 3.0
+# inject anyway if the signals never line up
+READY_TIMEOUT = 90.0
+
+# injector exit codes worth retrying: process not found / inject failed
+TRANSIENT_INJECT_CODES = (2, 3)
+MAX_ATTEMPTS = 4
+RETRY_BACKOFF = 2.0
+RETRY_BACKOFF_MAX = 15.0
+
+HISTORY_KEY = "inject_history"
+HISTORY_SIZE = 20
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+class ProcSample(NamedTuple):
+    threads: int
+    cpu_ticks: int
+    starttime: int
+    taken_at: float
+
+def read_sample(pid: int, proc_root: str = "/proc") -> ProcSample | None:
+    try:
+        with open(f"{proc_root}/{pid}/stat", "rb") as f:
+            data = f.read().decode("utf-8", errors="ignore")
+    except OSError:
+        return None
+
+    fields = data[data.rfind(")") + 2:].split()
+
+    try:
+        # fields after comm: utime=11 stime=12 num_threads=17 starttime=19
+        return ProcSample(int(fields[17]), int(fields[11]) + int(fields[12]), int(fields[19]), time.monotonic())
+    except (IndexError, ValueError):
+        return None
+
+def process_age(starttime: int) -> float:
+    # starttime is in clock ticks since boot
+    try:
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+    return max(0.0, uptime - starttime / CLOCK_TICKS)
+
+class ReadinessProbe:
+    # polls /proc/<pid> until the game looks ready to be injected
+    def __init__(self, pid: int, proc_root: str = "/proc"):
+        self.pid = pid
+        self.proc_root = proc_root
+        self.modules_loaded = False
+        self._stable = 0
+        self._last: ProcSample | None = None
+        self._last_cpu: float | None = None
+
+    def _check_modules(self) -> bool:
+        if self.modules_loaded:
+            return True
+
+        missing = set(READY_MODULES)
+
+        try:
+            with open(f"{self.proc_root}/{self.pid}/maps", "r", encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    name = line.rsplit("/", 1)[-1].strip().lower()
+                    missing.discard(name)
+
+                    if not missing:
+                        break
+        except OSError:
+            return False
+
+        self.modules_loaded = not missing
+        return self.modules_loaded
+
+    def poll(self) -> bool | None:
+        # True when ready, False when not yet, None when the process is gone
+        sample = read_sample(self.pid, self.proc_root)
+
+        if sample is None:
+            return None
+
+        last, self._last = self._last, sample
+
+        if last is None:
+            return False
+
+        elapsed = max(sample.taken_at - last.taken_at, 1e-3)
+        cpu = (sample.cpu_ticks - last.cpu_ticks) / CLOCK_TICKS / elapsed
+        last_cpu, self._last_cpu = self._last_cpu, cpu
+
+        settled = (
+            sample.threads == last.threads
+            and last_cpu is not None
+            and abs(cpu - last_cpu) <= CPU_SETTLE_DELTA
+        )
+
+        self._stable = self._stable + 1 if settled else 0
+
+        if process_age(sample.starttime) < MIN_PROCESS_AGE:
+            return False
+
+        return self._check_modules() and self._stable >= STABLE_SAMPLES
+
+    def wait(self, stop: threading.Event, timeout: float = READY_TIMEOUT) -> str | None:
+        # returns why we stopped waiting, None if the process went away
+        deadline = time.monotonic() + timeout
+
+        while not stop.is_set():
+            ready = self.poll()
+
+            if ready is None:
+                return None
+
+            if ready:
+                return "ready"
+
+            if time.monotonic() >= deadline:
+                return "timeout"
+
+            stop.wait(POLL_INTERVAL)
+
+        return None
+
+class _AttemptProgress:
+    # holds back errors so a failed attempt that gets retried doesn't
+    # mark the whole run as failed
+    def __init__(self, progress):
+        self._progress = progress
+        self.error_message: str | None = None
+
+    def error(self, message):
+        self.error_message = message
+
+    def __getattr__(self, name):
+        return getattr(self._progress, name)
+
+class AutoInjector:
+    # injects as soon as the game is ready, retrying transient failures
+    def __init__(self, helper, stop: threading.Event | None = None):
+        self.helper = helper
+        self.stop = stop or threading.Event()
+
+    def _alive(self, session) -> bool:
+        return not self.stop.is_set() and self.helper.sessions.get(session.pid) is session
+
+    def run(self, pid: int, progress) -> bool:
+        session = self.helper.sessions.get(pid)
+
+        if session is None:
+            progress.done("game exited before injecting")
+            return False
+
+        progress.status("waiting for rocket league to load...")
+        probe = ReadinessProbe(pid)
+        reason = probe.wait(self.stop)
+
+        if reason is None or not self._alive(session):
+            progress.done("auto inject cancelled" if self.stop.is_set() else "game exited before injecting")
+            return False
+
+        ready_age = self._age(pid)
+        print(f"auto inject: game {reason} after {ready_age:.1f}s (modules loaded: {probe.modules_loaded})")
+
+        attempt = 0
+
+        while True:
+            attempt += 1
+            attempt_progress = _AttemptProgress(progress)
+            self.helper.inject(attempt_progress, session)
+
+            if session.injected:
+                break
+
+            code = session.last_inject_code
+
+            if code not in TRANSIENT_INJECT_CODES or attempt >= MAX_ATTEMPTS:
+                progress.error(attempt_progress.error_message or "injection failed")
+                break
+
+            delay = min(RETRY_BACKOFF * (2 ** (attempt - 1)), RETRY_BACKOFF_MAX)
+            progress.status(f"{attempt_progress.error_message}, retrying in {delay:.1f}s...")
+
+            if self.stop.wait(delay) or not self._alive(session):
+                progress.done("auto inject cancelled")
+                return False
+
+        record_injection(self.helper.config, pid, "auto", session.injected, attempt, reason, ready_age)
+        return session.injected
+
+    def _age(self, pid: int) -> float:
+        sample = read_sample(pid)
+        return process_age(sample.starttime) if sample else 0.0
+
+def record_injection(
+    config, pid: int, mode: str, success: bool, attempts: int = 1,
+    reason: str | None = None, ready_age: float | None = None
+):
+    # keeps the last few delays from process start so the readiness
+    # thresholds can be tuned against manual clicks
+    sample = read_sample(pid)
+    injected_age = process_age(sample.starttime) if sample else None
+
+    entry = {
+        "time": int(time.time()),
+        "mode": mode,
+        "success": success,
+        "attempts": attempts,
+        "reason": reason,
+        "ready_after": round(ready_age, 2) if ready_age is not None else None,
+        "injected_after": round(injected_age, 2) if injected_age is not None else None
+    }
+
+    if injected_age is not None:
+        print(f"{mode} inject {'succeeded' if success else 'failed'} {injected_age:.1f}s after game start")
+
+    history = list(config.get(HISTORY_KEY, []))
+    history.append(entry)
+    config.set(HISTORY_KEY, history[-HISTORY_SIZE:])
@@ -1,94 +1,337 @@
+import hashlib
 import os
 import shutil
+import tempfile
+import threading
 import zipfile
-import requests
 
 from pathlib import Path
-from typing import Callable
-from bakkesmod_linux.config import ConfigManager
+from typing import TYPE_CHECKING, Callable, NamedTuple
+from bakkesmod_linux.archive import INSTALL_INDEX_NAME, StreamExtractor, ZipStreamError, safe_member_path
+from bakkesmod_linux.config import RELEASE_CACHE_TTL, ConfigManager
 from bakkesmod_linux.constants import (
     BAKKESMOD_LOCATION,
     PROTECTED_PATHS
 )
+from bakkesmod_linux.injector_session import (
+    INJECT_TIMEOUT,
+    REQUEST_TIMEOUT,
+    START_TIMEOUT,
+    InjectorError,
+    InjectorSession,
+    ProcessTransport,
+    StagedInjector
+)
+from bakkesmod_linux.process import run_process
+from bakkesmod_linux.procscan import get_scanner
+from bakkesmod_linux.sessions import GameSession, PrefixState, SessionRegistry
+from bakkesmod_linux.store import (
+    BUDGET_MB,
+    KEEP_VERSIONS,
+    KIND_BAKKESMOD,
+    KIND_INJECTOR,
+    POINTERS,
+    StoreError,
+    VersionStore
+)
+from bakkesmod_linux.sync import (
+    DEPLOY_LINK,
+    DEPLOY_MODES,
+    MANIFEST_NAME,
+    Deployer,
+    prepare_manifest,
+    sync_tree
+)
+from bakkesmod_linux.tasks import TASK_OK, TaskGraph
+from bakkesmod_linux.timing import span, timed
 from bakkesmod_linux.utils import (
-    copy_tree,
     filter_game_env,
     get_file_content,
-    get_process_env,
-    run,
     win_path_to_linux
 )
+from bakkesmod_linux.winereg import get_appdata_path, windows_to_prefix_path
+from bakkesmod_linux.watcher import (
+    PROCESS_EXITED,
+    PROCESS_STARTED,
+    ProcessEvent,
+    ProcessWatcher
+)
+
+if TYPE_CHECKING:
+    from bakkesmod_linux.download import Downloader
 
 SYMLINK_DIRS = ["cfg", "plugins"]
-WATCHER_INTERVAL_MS = 3000
+RL_PROCESS_NAME = "RocketLeague.exe"
 CUSTOM_INJECTOR_ENV = "BAKKESLINUX_CUSTOM_INJECTOR"
+INSTALL_SPOOL_SIZE = 32 * 1024 * 1024
+
+def _log_injector_line(stream: str, line: str):
+    # wine is chatty on stderr, keep it in the log as it happens
+    if line.strip():
+        print(f"injector: {line}")
+
+def _describe_result(result) -> str:
+    if result.timed_out:
+        return "timed out"
+
+    if result.cancelled:
+        return "cancelled"
+
+    return f"exit code {result.code}"
+
+def _same_copy(source: Path, target: Path) -> bool:
+    # copies keep the source mtime, so a file nobody wrote to matches it
+    try:
+        a, b = source.stat(), target.stat()
+    except OSError:
+        return False
+
+    return a.st_size == b.st_size and a.st_mtime_ns == b.st_mtime_ns
+
+class HelperState(NamedTuple):
+    # a copy of the session state, safe to hand to another thread
+    running: bool
+    injected: bool
+    # pids of the games that still need an inject
+    pending: tuple[int, ...]
+    instances: tuple[str, ...]
 
 class BakkesHelper:
     def __init__(self, config: ConfigManager | None = None):
         self.config = config or ConfigManager()
-        self.injected = False
-        self.wine_prefix: str | None = None
-        self.rl_process = None
-        self.loader: str | None = None
+        self._downloader: "Downloader | None" = None
+        # one entry per running game, several instances may share a prefix
+        self.sessions = SessionRegistry()
+        # exit code of the last injector run, None if it never ran
+        self.last_inject_code: int | None = None
         self.cache_updated = False
-        self.rl_running = False
-        self.bakkesmod_path: Path | None = None
-        self.game_env: dict | None = None
-        self._on_process_change: Callable[[bool], None] | None = None
+        # every downloaded release, BAKKESMOD_LOCATION/current points at the active one
+        self.store = VersionStore()
+        self._on_process_change: Callable[[ProcessEvent], None] | None = None
+        self._watcher: ProcessWatcher | None = None
+        self._manifest_lock = threading.Lock()
+        # guards the injection results and cache_updated, which injects on
+        # worker threads write while the ui and the watcher read them
+        self._state_lock = threading.RLock()
+        # set on shutdown, kills wine commands that are still running
+        self.cancel_event = threading.Event()
+
+    # the single game view, kept for callers that only care about one instance
+
+    @property
+    def rl_running(self) -> bool:
+        return bool(self.sessions.all())
+
+    @property
+    def rl_process(self) -> int | None:
+        session = self.sessions.first()
+        return session.pid if session else None
+
+    @property
+    def wine_prefix(self) -> str | None:
+        session = self.sessions.first()
+        return session.wine_prefix if session else None
+
+    @property
+    def bakkesmod_path(self) -> Path | None:
+        session = self.sessions.first()
+        return session.bakkesmod_path if session else None
+
+    @property
+    def injected(self) -> bool:
+        return self.snapshot().injected
+
+    def pending_sessions(self) -> list[GameSession]:
+        with self._state_lock:
+            return [session for session in self.sessions.all() if not session.injected]
+
+    def snapshot(self) -> HelperState:
+        with self._state_lock:
+            sessions = self.sessions.all()
+
+            return HelperState(
+                bool(sessions),
+                bool(sessions) and all(session.injected for session in sessions),
+                tuple(session.pid for session in sessions if not session.injected),
+                tuple(session.describe() for session in sessions)
+            )
+
+    @property
+    def downloader(self) -> "Downloader":
+        # pulls in requests, so only load it once something is downloaded
+        if self._downloader is None:
+            from bakkesmod_linux.download import Downloader
+            self._downloader = Downloader()
 
-    def set_process_callback(self, callback: Callable[[bool], None]) -> None:
+        return self._downloader
+
+    def set_process_callback(self, callback: Callable[[ProcessEvent], None]) -> None:
         self._on_process_change = callback
 
+    def start_watcher(self):
+        if self._watcher is None:
+            self._watcher = ProcessWatcher(RL_PROCESS_NAME, self._handle_process_event)
+
+        self._watcher.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def stop_watcher(self):
+        if self._watcher:
+            self._watcher.stop()
+
+        self.sessions.close()
+
     def check_rl_process(self):
-        result = get_process_env("RocketLeague.exe")
-        was_running = self.rl_running
-        self.rl_running = result is not None
+        # one shot check, the watcher does this on its own
+        found = dict(get_scanner().find_all(RL_PROCESS_NAME))
+
+        for session in self.sessions.all():
+            if session.pid not in found:
+                self._handle_process_event(ProcessEvent(PROCESS_EXITED, session.pid))
+
+        for pid, env in found.items():
+            if self.sessions.get(pid) is None:
+                self._handle_process_event(ProcessEvent(PROCESS_STARTED, pid, env))
 
-        if self.rl_running and result:
-            _, env = result
-            self.wine_prefix = env["WINEPREFIX"]
-            self.loader = self._resolve_wine_loader(env["WINELOADER"])
-            self.game_env = filter_game_env(env)
+    def _handle_process_event(self, event: ProcessEvent):
+        if event.kind == PROCESS_STARTED and event.env is not None:
+            if "WINEPREFIX" not in event.env or "WINELOADER" not in event.env:
+                print(f"ignoring pid {event.pid}, it has no wine environment")
+                return
 
-            if not self.bakkesmod_path:
-                self.resolve_install_path()
+            # path resolution can start wine, that is left to
+            # prefetch_install_path so detection never waits on it
+            self.sessions.add(
+                event.pid,
+                event.env["WINEPREFIX"],
+                self._resolve_wine_loader(event.env["WINELOADER"]),
+                filter_game_env(event.env)
+            )
 
-        # reset injection state when process dies
-        if was_running and not self.rl_running:
-            self.injected = False
+        elif event.kind == PROCESS_EXITED:
+            # drops the injection state, and the prefix helper with the last game in it
+            if self.sessions.remove(event.pid) is None:
+                return
 
         # notify ui about state change
-        if self._on_process_change and was_running != self.rl_running:
-            self._on_process_change(self.rl_running)
+        if self._on_process_change:
+            self._on_process_change(event)
+
+    def prefetch_install_path(self, pid: int) -> bool:
+        # resolves the path while the game is still loading. an inject
+        # running in this prefix resolves it on its own, so dont wait on it
+        session = self.sessions.get(pid)
+
+        if session is None or session.bakkesmod_path:
+            return False
+
+        if not session.prefix.lock.acquire(blocking=False):
+            return False
+
+        try:
+            return self.resolve_install_path(session=session)
+        finally:
+            session.prefix.lock.release()
 
-    def resolve_install_path(self, progress=None):
-        if not self.wine_prefix or not self.loader:
+    @timed("resolve_install_path")
+    def resolve_install_path(self, progress=None, session: GameSession | None = None):
+        session = session or self.sessions.first()
+
+        if session is None:
             return False
 
+        if session.bakkesmod_path:
+            return True
+
+        # reading the prefix registry avoids starting wine at all
+        with span("resolve_install_path.registry") as fields:
+            appdata = get_appdata_path(session.wine_prefix)
+            fields["hit"] = appdata is not None
+
+        if appdata is not None:
+            session.prefix.bakkesmod_path = appdata / "bakkesmod/bakkesmod"
+            print(f"resolved bakkesmod path: {session.bakkesmod_path}")
+            return True
+
+        print("couldnt resolve appdata from the wine registry, asking the injector")
+        return self._resolve_install_path_with_injector(session, progress)
+
+    def _stage_injector(self, prefix: PrefixState) -> StagedInjector | None:
         injector_path, _ = self._resolve_injector_path()
 
         if not injector_path.exists():
+            return None
+
+        if prefix.staged is None or prefix.staged.source != injector_path:
+            prefix.close_injector_session()
+            prefix.staged = StagedInjector(Path(prefix.path), injector_path)
+
+        prefix.staged.ensure()
+        return prefix.staged
+
+    def _get_injector_session(self, session: GameSession) -> InjectorSession | None:
+        prefix = session.prefix
+
+        if prefix.injector_session is not None:
+            return prefix.injector_session
+
+        staged = self._stage_injector(prefix)
+
+        if staged is None or not staged.serve:
+            return None
+
+        argv = [session.loader, str(staged.path), "--serve"]
+        env = session.game_env
+        prefix.injector_session = InjectorSession(lambda: ProcessTransport(argv, env))
+        return prefix.injector_session
+
+    def _resolve_install_path_with_injector(self, session: GameSession, progress=None):
+        try:
+            staged = self._stage_injector(session.prefix)
+        except OSError as e:
+            staged = None
+            print(f"failed to stage injector: {e}")
+
+        if staged is None:
             if progress:
                 progress.error("injector not found...")
             return False
 
-        injector_target = Path(self.wine_prefix) / "drive_c/simple_injector_tmp.exe"
-        output_file = Path(self.wine_prefix) / "drive_c/bakkesmod_path.txt"
+        helper = self._get_injector_session(session)
+
+        if helper is not None:
+            try:
+                win_path = helper.get_path()
+                appdata = windows_to_prefix_path(Path(session.wine_prefix), win_path)
+
+                if appdata is not None:
+                    session.prefix.bakkesmod_path = appdata / "bakkesmod/bakkesmod"
+                    print(f"resolved bakkesmod path: {session.bakkesmod_path}")
+                    return True
+            except InjectorError as e:
+                print(f"injector helper failed ({e}), falling back to --get-path")
+
+        return self._resolve_install_path_oneshot(session, staged.path, progress)
+
+    def _resolve_install_path_oneshot(self, session: GameSession, injector_target: Path, progress=None):
+        # injectors without --serve write the path to a file and exit
+        output_file = Path(session.wine_prefix) / "drive_c/bakkesmod_path.txt"
 
         try:
             output_file.unlink(missing_ok=True)
-            shutil.copy2(injector_path, injector_target)
-
-            code, _ = run(
-                f'{self.loader} "{injector_target}" --get-path',
-                wait=True,
-                check=False,
-                capture=True,
-                env=self.game_env
+
+            result = run_process(
+                [session.loader, str(injector_target), "--get-path"],
+                env=session.game_env,
+                timeout=START_TIMEOUT + REQUEST_TIMEOUT,
+                cancel=self.cancel_event,
+                on_line=_log_injector_line
             )
 
-            if code != 0:
-                error_msg = f"failed to run injector --get-path (exit code {code})"
+            if not result.ok:
+                error_msg = f"failed to run injector --get-path ({_describe_result(result)})"
                 if progress:
                     progress.error(error_msg)
                 print(error_msg)
@@ -105,8 +348,8 @@ class BakkesHelper:
             output_file.unlink()
             rel_path = win_path_to_linux(win_path)
 
-            self.bakkesmod_path = Path(self.wine_prefix) / "drive_c" / rel_path / "bakkesmod/bakkesmod"
-            print(f"resolved bakkesmod path: {self.bakkesmod_path}")
+            session.prefix.bakkesmod_path = Path(session.wine_prefix) / "drive_c" / rel_path / "bakkesmod/bakkesmod"
+            print(f"resolved bakkesmod path: {session.bakkesmod_path}")
             return True
 
         except Exception as e:
@@ -114,13 +357,35 @@ class BakkesHelper:
             if progress:
                 progress.error(f"error resolving path: {e}")
             return False
-        finally:
-            injector_target.unlink(missing_ok=True)
 
-    def download_bakkesmod(self, progress):
-        progress.status("downloading latest bakkesmod version...")
-        temp_location = "/tmp/bakkesmod.zip"
+    def _run_injector(self, session: GameSession, injector_path: Path) -> int:
+        try:
+            helper = self._get_injector_session(session)
+        except OSError as e:
+            helper = None
+            print(f"failed to stage injector: {e}")
+
+        if helper is not None:
+            try:
+                return helper.inject()
+            except InjectorError as e:
+                print(f"injector helper failed ({e}), running the injector directly")
+                session.prefix.close_injector_session()
+
+        result = run_process(
+            [session.loader, str(injector_path)],
+            env=session.game_env,
+            timeout=START_TIMEOUT + INJECT_TIMEOUT,
+            cancel=self.cancel_event,
+            on_line=_log_injector_line
+        )
+
+        if result.timed_out or result.cancelled:
+            print(f"injector did not finish ({_describe_result(result)})")
 
+        return result.code
+
+    def _get_bakkesmod_release(self):
         release_info = self.config.check_bakkesmod_update()
         if not release_info:
             release_info = self.config.get_github_release_info(
@@ -130,56 +395,293 @@ class BakkesHelper:
         if not release_info:
             raise RuntimeError("failed to get bakkesmod release info")
 
-        try:
-            self._download_file(
-                release_info["download_url"],
-                temp_location,
-                progress,
-                "downloading..."
-            )
-
-            self.config.set_bakkesmod_version(release_info["version"])
-            return temp_location
-        except Exception as e:
-            raise RuntimeError(f"download failed: {e}")
+        return release_info
 
     def install(self, progress):
-        try:
-            zip_path = self.download_bakkesmod(progress)
+        with span("install") as phase:
+            try:
+                with span("install.release"):
+                    release_info = self._get_bakkesmod_release()
+
+                version = release_info["version"]
+                name = self.store.find(KIND_BAKKESMOD, version)
+
+                if name is None:
+                    progress.status("downloading latest bakkesmod version...")
+
+                    with span("install.download"):
+                        name = self._stream_install(
+                            release_info["download_url"], version, progress, release_info.get("sha256")
+                        )
+                else:
+                    # installed before and still stored, switching back is a rename
+                    print(f"bakkesmod {version} is already in the store")
+                    phase["stored"] = True
+
+                self._activate(KIND_BAKKESMOD, name)
+                self._evict()
+                progress.done("bakkesmod updated")
+
+            except Exception as e:
+                phase["ok"] = False
+                progress.error(str(e))
+
+    def _stream_install(self, url, version, progress, expected_sha256: str | None = None) -> str:
+        percentage = 0
+        digest = hashlib.sha256()
+        previous = self.store.current_path(KIND_BAKKESMOD)
+        previous_index = self.store.index(previous.name) if previous else {}
+        staging = self.store.begin(KIND_BAKKESMOD, version)
+
+        def on_member(name):
+            progress.progress(f"extracting {name}", percentage)
+
+        def is_unchanged(name, crc, size):
+            # skipped members are hardlinked from the previous version afterwards
+            if previous is None or previous_index.get(name) != (crc, size):
+                return False
 
-            progress.status("extracting files...")
-            BAKKESMOD_LOCATION.mkdir(parents=True, exist_ok=True)
+            rel = safe_member_path(name)
+            return rel is not None and (previous / rel).is_file()
 
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                for member in zip_ref.namelist():
-                    is_protected = any(member.startswith(path) for path in PROTECTED_PATHS)
-                    target_path = BAKKESMOD_LOCATION / member
+        extractor = StreamExtractor(staging, on_member, is_unchanged)
+        streaming = True
 
-                    if is_protected and target_path.exists():
+        try:
+            # the spool keeps a copy so we can still fall back to zipfile
+            with tempfile.SpooledTemporaryFile(max_size=INSTALL_SPOOL_SIZE) as spool:
+                for chunk, percentage in self._iter_download(url, progress, "downloading..."):
+                    digest.update(chunk)
+                    spool.write(chunk)
+
+                    if not streaming:
                         continue
 
-                    zip_ref.extract(member, BAKKESMOD_LOCATION)
+                    try:
+                        extractor.feed(chunk)
+                    except ZipStreamError as e:
+                        print(f"streaming extraction failed ({e}), extracting after download")
+                        streaming = False
+
+                # checked before anything is committed, the staging dir is dropped
+                if expected_sha256 and digest.hexdigest() != expected_sha256:
+                    raise RuntimeError(
+                        f"bakkesmod.zip sha256 is {digest.hexdigest()}, the release says {expected_sha256}"
+                    )
+
+                print(f"bakkesmod.zip sha256 {digest.hexdigest()}{' (verified)' if expected_sha256 else ''}")
+                members = None
+
+                if streaming:
+                    try:
+                        extractor.finish()
+                        members = extractor.members
+                    except ZipStreamError as e:
+                        print(f"streaming extraction failed ({e}), extracting after download")
+
+                if members is None:
+                    spool.seek(0)
+                    members = self._extract_zip(spool, staging, is_unchanged, progress)
+
+            if previous is not None:
+                names = [rel for rel in map(safe_member_path, members) if rel is not None]
+                self.store.link_unchanged(staging, previous, names)
+
+            return self.store.commit(KIND_BAKKESMOD, version, staging, members, previous=previous)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def _extract_zip(self, file, dest: Path, is_unchanged, progress):
+        progress.status("extracting files...")
+        members = {}
+
+        with zipfile.ZipFile(file, "r") as zip_ref:
+            infos = zip_ref.infolist()
+
+            for index, info in enumerate(infos):
+                if not info.is_dir():
+                    members[info.filename] = (info.CRC, info.file_size)
+
+                if is_unchanged(info.filename, info.CRC, info.file_size):
+                    continue
+
+                rel = safe_member_path(info.filename)
+
+                if rel is None:
+                    continue
+
+                target = dest / rel
+
+                if info.is_dir():
+                    target.mkdir(parents=True, exist_ok=True)
+                    continue
+
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = target.with_name(f".{target.name}.part")
+
+                with zip_ref.open(info) as source, open(tmp_path, "wb") as output:
+                    shutil.copyfileobj(source, output)
+
+                os.replace(tmp_path, target)
+                progress.progress(f"extracting {info.filename}", int((index + 1) / len(infos) * 100))
+
+        return members
+
+    def _activate(self, kind: str, name: str, pin: bool = False) -> str:
+        with span("store.activate", kind=kind):
+            previous = self.store.current_path(kind)
+            path = self.store.activate(kind, name)
+            info = self.store.info(name)
+            version = info.version if info else name
+
+            if kind == KIND_BAKKESMOD:
+                self._seed_shared_dirs(path, previous)
+                self._remove_legacy_install(path)
+                self.config.set_bakkesmod_version(version)
+
+                with self._state_lock:
+                    self.cache_updated = True
+            else:
+                self.config.set_injector_version(version)
+
+            # a version picked by hand stays until the next manual update
+            self.config.set(f"{kind}_pinned", version if pin else None)
+            return version
+
+    def _seed_shared_dirs(self, version_path: Path, previous: Path | None):
+        # cfg and plugins are shared by every version and prefix so settings
+        # and user plugins survive a switch, a release only adds its defaults.
+        # bakkesmod and its plugin manager write there, so these are real
+        # copies, a hardlink would let an in place write reach the blob store
+        deployer = Deployer()
+        protected = tuple(PROTECTED_PATHS)
+        shipped = set()
+
+        for rel_dir in SYMLINK_DIRS:
+            for current, _, files in os.walk(version_path / rel_dir):
+                for file in files:
+                    source = Path(current) / file
+                    rel = source.relative_to(version_path).as_posix()
+                    target = BAKKESMOD_LOCATION / rel
+                    shipped.add(rel)
+
+                    if target.exists():
+                        # older builds seeded hardlinks into the store, give
+                        # those their own inode before anything else
+                        if target.stat().st_nlink > 1:
+                            deployer.copy(target, target)
+
+                        if rel.startswith(protected) or _same_copy(source, target):
+                            continue
+
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    deployer.copy(source, target)
 
-            progress.status("cleaning up...")
-            self.cache_updated = True
-            os.remove(zip_path)
+        if previous is None or previous == version_path:
+            return
 
-        except Exception as e:
-            progress.error(str(e))
+        # defaults the previous version shipped and this one dropped
+        for name in self.store.index(previous.name).keys() - shipped:
+            rel = safe_member_path(name)
 
-    def update(self, progress):
-        if not BAKKESMOD_LOCATION.exists() or not self.config.get_bakkesmod_version():
-            print("updater: bakkesmod cache not found, installing")
-            self.install(progress)
+            if rel is None or rel.split("/", 1)[0] not in SYMLINK_DIRS or rel.startswith(protected):
+                continue
+
+            target = BAKKESMOD_LOCATION / rel
+
+            # only the untouched default, not something the user changed
+            if _same_copy(previous / rel, target):
+                target.unlink()
+
+    def _remove_legacy_install(self, version_path: Path):
+        # releases used to be extracted straight into BAKKESMOD_LOCATION,
+        # the store has its own copy now
+        keep = {*SYMLINK_DIRS, self.store.root.name, *(pointer for pointer, _ in POINTERS.values())}
+
+        for name in {INSTALL_INDEX_NAME, MANIFEST_NAME, *os.listdir(version_path)} - keep:
+            path = BAKKESMOD_LOCATION / name
+
+            if path.is_symlink() or not path.exists():
+                continue
+
+            print(f"store: removing unversioned {name}")
+
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+
+    def _evict(self):
+        try:
+            self.store.evict(
+                int(self.config.get("store_keep_versions", KEEP_VERSIONS)),
+                float(self.config.get("store_budget_mb", BUDGET_MB))
+            )
+        except (OSError, ValueError) as e:
+            print(f"store: eviction failed: {e}")
+
+    def use_version(self, progress, version: str, kind: str = KIND_BAKKESMOD):
+        name = self.store.find(kind, version)
+
+        if name is None:
+            available = ", ".join(info.version for info in self.store.versions(kind)) or "none"
+            progress.error(f"{kind} {version} is not in the store (stored: {available})")
             return
 
-        progress.set_status_msg("checking for updates...")
+        self._switch(progress, kind, name)
 
-        if not self.config.check_bakkesmod_update():
-            progress.done("already on latest version")
+    def rollback(self, progress, kind: str = KIND_BAKKESMOD):
+        name = self.store.previous(kind)
+
+        if name is None:
+            progress.error(f"no previous {kind} version in the store")
             return
 
-        self.install(progress)
+        self._switch(progress, kind, name)
+
+    def _switch(self, progress, kind: str, name: str):
+        with span("store.switch", kind=kind) as phase:
+            try:
+                version = self._activate(kind, name, pin=True)
+            except (OSError, StoreError) as e:
+                phase["ok"] = False
+                progress.error(f"failed to switch {kind}: {e}")
+                return
+
+        progress.done(f"{kind} switched to {version}, pinned until the next manual update")
+
+    def update(self, progress, force=False):
+        with span("update", force=force) as phase:
+            if self.store.current(KIND_BAKKESMOD) is None:
+                print("updater: no bakkesmod version in the store, installing")
+                self.install(progress)
+                phase["installed"] = True
+                return
+
+            pinned = self.config.get(f"{KIND_BAKKESMOD}_pinned")
+
+            # a manual update lifts the pins left by rollback and --use-version
+            if force:
+                self.config.set(f"{KIND_INJECTOR}_pinned", None)
+            elif pinned:
+                progress.done(f"bakkesmod pinned to {pinned}")
+                return
+
+            progress.set_status_msg("checking for updates...")
+
+            # a manual check always revalidates, a 304 is cheap anyway
+            max_age = 0 if force else RELEASE_CACHE_TTL
+
+            with span("update.check"):
+                release = self.config.check_bakkesmod_update(max_age)
+
+            if not release:
+                progress.done("already on latest version")
+                return
+
+            self.install(progress)
+            phase["installed"] = True
 
     def _get_version(self, location: Path) -> int | None:
         version_path = location / "version.txt"
@@ -194,41 +696,33 @@ class BakkesHelper:
             return loader_path.replace("/run/host/", "/", 1)
         return loader_path
 
-    def _get_prefix_bakkesmod_path(self):
-        if self.bakkesmod_path is None:
-            # try to resolve if we have prefix info
-            if self.wine_prefix and self.loader:
-                self.resolve_install_path()
+    def _get_prefix_bakkesmod_path(self, session: GameSession):
+        if session.bakkesmod_path is None:
+            self.resolve_install_path(session=session)
 
-            if self.bakkesmod_path is None:
+            if session.bakkesmod_path is None:
                 raise RuntimeError("bakkesmod path not resolved (is rocket league running?)")
 
-        return self.bakkesmod_path
+        return session.bakkesmod_path
 
-    def _download_file(self, url, destination, progress=None, progress_label="downloading..."):
-        try:
-            res = requests.get(url, stream=True)
-            res.raise_for_status()
+    def _iter_download(self, url, progress=None, progress_label="downloading..."):
+        return self.downloader.iter_stream(url, progress, progress_label)
 
-            total_size = int(res.headers.get("content-length", 0))
-            downloaded = 0
-
-            with open(destination, "wb") as f:
-                for chunk in res.iter_content(chunk_size=8192):
-                    downloaded += len(chunk)
-                    f.write(chunk)
-
-                    if progress and total_size > 0:
-                        percentage = int((downloaded / total_size) * 100)
-                        progress.progress(progress_label, percentage)
-
-            return True
+    def _download_file(self, url, destination, progress=None, progress_label="downloading...", digest=None) -> str:
+        try:
+            return self.downloader.download(url, destination, progress, progress_label, digest)
         except Exception as e:
             raise RuntimeError(f"download failed: {e}")
 
     def _check_and_download_injector(self, progress):
         BAKKESMOD_LOCATION.mkdir(parents=True, exist_ok=True)
-        injector_path = BAKKESMOD_LOCATION / "simple_injector.exe"
+        injector_path = self.store.pointer(KIND_INJECTOR)
+
+        pinned = self.config.get(f"{KIND_INJECTOR}_pinned")
+
+        if pinned and injector_path.exists():
+            print(f"injector pinned to {pinned}")
+            return True
 
         release_info = self.config.check_injector_update()
 
@@ -244,15 +738,24 @@ class BakkesHelper:
         # download new version
         progress.status("downloading latest injector...")
         try:
-            self._download_file(
-                release_info["download_url"],
-                injector_path,
-                progress,
-                "downloading injector..."
-            )
-
-            self.config.set_injector_version(release_info["version"])
-            print(f"injector updated to {release_info['version']}")
+            version = release_info["version"]
+            name = self.store.find(KIND_INJECTOR, version)
+
+            if name is None:
+                # resumed, a half finished download is picked up where it stopped
+                staging = self.store.begin(KIND_INJECTOR, version, resume=True)
+                sha256 = self._download_file(
+                    release_info["download_url"],
+                    staging / injector_path.name,
+                    progress,
+                    "downloading injector...",
+                    release_info.get("sha256")
+                )
+                name = self.store.commit(KIND_INJECTOR, version, staging, known={injector_path.name: sha256})
+
+            self._activate(KIND_INJECTOR, name)
+            self._evict()
+            print(f"injector updated to {version}")
             return True
 
         except Exception as e:
@@ -279,16 +782,22 @@ class BakkesHelper:
         if custom_path:
             return custom_path, True
 
-        return BAKKESMOD_LOCATION / "simple_injector.exe", False
+        return self.store.pointer(KIND_INJECTOR), False
 
-    def _ensure_prefix_files(self, progress):
+    def _ensure_prefix_files(self, session: GameSession, progress, cache_manifest=None, cache_root: Path | None = None):
         try:
-            prefix_path = self._get_prefix_bakkesmod_path()
+            prefix_path = self._get_prefix_bakkesmod_path(session)
         except RuntimeError as e:
             progress.error(str(e))
             return False
 
-        cache_version = self._get_version(BAKKESMOD_LOCATION)
+        cache_root = cache_root or self.store.current_path(KIND_BAKKESMOD)
+
+        if cache_root is None:
+            progress.error("bakkesmod is not installed, please run update")
+            return False
+
+        cache_version = self._get_version(cache_root)
 
         if cache_version is None:
             progress.error("invalid cached bakkesmod version")
@@ -296,7 +805,7 @@ class BakkesHelper:
 
         if not prefix_path.exists():
             progress.set_status_msg("installing bakkesmod into prefix...")
-            copy_tree(BAKKESMOD_LOCATION, prefix_path, SYMLINK_DIRS)
+            self._sync_prefix(cache_root, prefix_path, cache_manifest, progress)
             return True
 
         prefix_version = self._get_version(prefix_path)
@@ -308,74 +817,199 @@ class BakkesHelper:
         if prefix_version != cache_version:
             print(f"bakkesmod version mismatch: prefix={prefix_version}, cache={cache_version}")
 
-            # wait until the user manually updates (just click the button bruh)
-            if not self.cache_updated:
+            # wait until the user manually updates (just click the button bruh),
+            # a prefix we deployed follows the active version, rollbacks included
+            with self._state_lock:
+                cache_updated = self.cache_updated
+
+            if not cache_updated and not (prefix_path / MANIFEST_NAME).exists():
                 progress.error("bakkesmod version mismatch, please run update")
                 return False
 
             # user updated so lets update the prefix files
             progress.set_status_msg("syncing updated bakkesmod into prefix...")
-            copy_tree(BAKKESMOD_LOCATION, prefix_path, SYMLINK_DIRS)
+            self._sync_prefix(cache_root, prefix_path, cache_manifest, progress)
             return True
 
         return True
 
-    def inject(self, progress):
-        if self.injected:
-            progress.done("already injected")
-            return
+    def _deploy_mode(self) -> str:
+        mode = self.config.get("deploy_mode", DEPLOY_LINK)
 
-        if not self.rl_running:
-            progress.error("rocket league process not found")
-            return
+        if mode not in DEPLOY_MODES:
+            print(f"unknown deploy_mode {mode!r}, using {DEPLOY_LINK}")
+            return DEPLOY_LINK
 
-        if not self.loader:
-            progress.error("wine loader not found")
-            return
+        return mode
+
+    def _sync_prefix(self, cache_root: Path, prefix_path: Path, cache_manifest=None, progress=None):
+        mode = self._deploy_mode()
+
+        with span("prefix.sync", mode=mode, version=cache_root.name) as fields:
+            result = sync_tree(
+                cache_root, prefix_path, SYMLINK_DIRS, cache_manifest, mode, BAKKESMOD_LOCATION, progress
+            )
+            fields["copied"] = result.copied
+            fields["linked"] = result.linked
+
+        # remembered so --verify can check prefixes of games that aren't running
+        prefixes = self.config.get("prefixes", [])
+
+        if str(prefix_path) not in prefixes:
+            self.config.set("prefixes", [*prefixes, str(prefix_path)])
 
-        # verify injector exists before doing anything
+    def known_prefixes(self) -> list[str]:
+        prefixes = self.config.get("prefixes", [])
+        running = [str(session.bakkesmod_path) for session in self.sessions.all() if session.bakkesmod_path]
+        return list(dict.fromkeys([*prefixes, *running]))
+
+    def _prepare_injector(self, progress):
         injector_path, using_custom_injector = self._resolve_injector_path()
 
         if using_custom_injector:
-            progress.progress("using custom injector...", 10)
-        elif not injector_path.exists():
-            progress.progress("downloading injector...", 10)
+            progress.done("using custom injector...")
+            return True
+
+        if not injector_path.exists():
+            progress.status("downloading injector...")
             if not self._check_and_download_injector(progress):
                 progress.error("injector not available")
-                return
-            injector_path, _ = self._resolve_injector_path()
-        else:
-            # check for updates in background
-            progress.progress("checking injector...", 10)
-            self._check_and_download_injector(progress)
-            injector_path, _ = self._resolve_injector_path()
+                return False
+            return True
+
+        # an update failure is reported but the current injector still works
+        progress.status("checking injector...")
+        self._check_and_download_injector(progress)
+        return True
+
+    def _resolve_install_path_task(self, session: GameSession, progress):
+        if session.bakkesmod_path:
+            return True
+
+        progress.status("resolving bakkesmod path...")
+        return self.resolve_install_path(progress, session)
 
-        if not self.bakkesmod_path and not self.resolve_install_path(progress):
+    def startup(self, progress):
+        graph = TaskGraph(progress, name="startup")
+        graph.add("bakkesmod", self.update, weight=3)
+
+        if not self._get_custom_injector_path():
+            graph.add("injector", self._check_and_download_injector)
+
+        if graph.run():
+            progress.done(graph.message("bakkesmod"))
+            return
+
+        # failed steps report their own error, only fill in for one that didn't
+        if not progress._has_error:
+            failed = next(name for name in ("bakkesmod", "injector") if graph.state(name) != TASK_OK)
+            progress.error(graph.message(failed) or f"{failed} setup failed")
+
+    def inject_all(self, progress):
+        sessions = self.pending_sessions()
+
+        if not sessions:
+            if self.rl_running:
+                progress.done("already injected")
+            else:
+                progress.error("rocket league process not found")
+            return
+
+        if len(sessions) == 1:
+            self.inject(progress, sessions[0])
+            return
+
+        # instances in different prefixes don't share anything, the prefix
+        # lock serializes the ones that do
+        graph = TaskGraph(progress, max_workers=len(sessions))
+
+        for session in sessions:
+            graph.add(f"pid {session.pid}", lambda task_progress, session=session: self.inject(task_progress, session))
+
+        if graph.run():
+            progress.done(f"injected {len(sessions)} instances")
+
+    def inject(self, progress, session: GameSession | None = None):
+        session = session or next(iter(self.pending_sessions()), None) or self.sessions.first()
+
+        with self._state_lock:
+            self.last_inject_code = None
+
+            if session is not None:
+                session.last_inject_code = None
+
+        if session is None:
+            progress.error("rocket league process not found")
+            return
+
+        if session.injected:
+            progress.done("already injected")
             return
 
         # extra validation before injecting
-        if not self.wine_prefix or not Path(self.loader).exists():
+        if not session.loader or not Path(session.loader).exists():
             progress.error("invalid wine configuration")
             return
 
-        progress.progress("copying bakkesmod files...", 40)
+        with span("inject") as phase:
+            with session.prefix.lock:
+                self._inject_locked(progress, session)
 
-        if not self._ensure_prefix_files(progress):
+            phase["ok"] = session.injected
+            phase["code"] = session.last_inject_code
+
+    def _inject_locked(self, progress, session: GameSession):
+        injector_path, _ = self._resolve_injector_path()
+        cache_manifest = {}
+        # resolved once so a switch mid inject can't mix two versions
+        cache_root = self.store.current_path(KIND_BAKKESMOD)
+
+        def build_cache_manifest(task_progress):
+            if cache_root is None:
+                return
+
+            with self._manifest_lock:
+                cache_manifest.update(prepare_manifest(cache_root, SYMLINK_DIRS))
+
+        # network, wine and disk work dont depend on each other, the prefix
+        # sync only needs the resolved path and the cache manifest
+        graph = TaskGraph(progress, name="inject")
+        graph.add("injector", self._prepare_injector, weight=2)
+        graph.add("manifest", build_cache_manifest)
+        graph.add(
+            "resolve",
+            lambda task_progress: self._resolve_install_path_task(session, task_progress),
+            # --get-path needs the injector binary on a first run
+            deps=[] if injector_path.exists() else ["injector"],
+            weight=2
+        )
+        graph.add(
+            "prefix",
+            lambda task_progress: self._ensure_prefix_files(session, task_progress, cache_manifest, cache_root),
+            deps=["resolve", "manifest"],
+            weight=2
+        )
+
+        if not graph.run():
             return
 
+        injector_path, _ = self._resolve_injector_path()
+
         if not injector_path.exists():
             progress.error("injector binary missing")
             return
 
-        progress.progress("injecting...", 70)
+        progress.progress("injecting...", 90)
 
-        code, _ = run(
-            cmd=f'{self.loader} "{injector_path}"',
-            capture=True,
-            wait=True,
-            check=False,
-            env=self.game_env
-        )
+        with span("inject.run") as fields:
+            code = self._run_injector(session, injector_path)
+            fields["code"] = code
+            fields["ok"] = code == 0
+
+        with self._state_lock:
+            session.last_inject_code = code
+            self.last_inject_code = code
+            session.injected = code == 0
 
         # EXIT_OK = 0,
         # ERR_DLL_NOT_FOUND = 1,
@@ -383,8 +1017,6 @@ class BakkesHelper:
         # ERR_INJECT_FAILED = 3,
         if code == 0:
             progress.done("injected")
-            self.injected = True
-            self.cache_updated = False
         elif code == 1:
             progress.error("failed to inject (dll not found)")
         elif code == 2:
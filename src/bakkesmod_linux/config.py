@@ -1,14 +1,29 @@
+import atexit
 import json
-import requests
+import os
+import threading
+import time
 
+from contextlib import contextmanager
 from typing import Any
 from bakkesmod_linux.constants import (
     BAKKESMOD_GITHUB_API,
     BAKKESMOD_LOCATION,
     INJECTOR_GITHUB_LATEST
 )
+from bakkesmod_linux.net import get_session
+from bakkesmod_linux.utils import write_atomic
 
 DATA_FILE = BAKKESMOD_LOCATION / "data.json"
+RELEASE_CACHE_FILE = BAKKESMOD_LOCATION / "release_cache.json"
+
+# how long release metadata is trusted without asking github again
+RELEASE_CACHE_TTL = 15 * 60
+# fallback backoff when github rate limits us without a reset header
+RATE_LIMIT_BACKOFF = 15 * 60
+# writes from worker threads are coalesced for this long
+SAVE_DEBOUNCE = 0.5
+
 ReleaseInfo = dict[str, str]
 
 class ConfigManager:
@@ -16,27 +31,110 @@ class ConfigManager:
     INJECTOR_API = INJECTOR_GITHUB_LATEST
 
     def __init__(self):
-        self._data: dict[str, Any] = self._load()
+        # install and injector checks may run concurrently
+        self._lock = threading.RLock()
+        self._data: dict[str, Any] = {}
+        self._file_state: tuple[int, int, int] | None = None
+        self._dirty: set[str] = set()
+        self._batch_depth = 0
+        self._save_timer: threading.Timer | None = None
+        self._releases: dict[str, Any] | None = None
+
+        self._data = self._load()
+        atexit.register(self.flush)
+
+    def _stat_file(self) -> tuple[int, int, int] | None:
+        try:
+            stat = DATA_FILE.stat()
+        except OSError:
+            return None
+
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
 
     def _load(self) -> dict[str, Any]:
-        if not DATA_FILE.exists():
+        self._file_state = self._stat_file()
+
+        if self._file_state is None:
             return {}
 
         try:
-            return json.loads(DATA_FILE.read_text(encoding="utf-8"))
-        except (json.JSONDecodeError, IOError):
+            data = json.loads(DATA_FILE.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, IOError) as e:
+            # keep the broken file around instead of silently starting over
+            broken = DATA_FILE.with_name(f"{DATA_FILE.name}.corrupt")
+            print(f"config: {DATA_FILE} is unreadable ({e}), moved to {broken}")
+            os.replace(DATA_FILE, broken)
+            self._file_state = None
             return {}
 
+        return data if isinstance(data, dict) else {}
+
+    def _refresh(self) -> None:
+        # another instance may have written the file, a stat is enough to know
+        if self._stat_file() == self._file_state:
+            return
+
+        pending = {key: self._data[key] for key in self._dirty if key in self._data}
+        self._data = self._load()
+        self._data.update(pending)
+
     def _save(self) -> None:
-        BAKKESMOD_LOCATION.mkdir(parents=True, exist_ok=True)
-        DATA_FILE.write_text(json.dumps(self._data, indent=2), encoding="utf-8")
+        with self._lock:
+            if self._save_timer:
+                self._save_timer.cancel()
+                self._save_timer = None
+
+            if not self._dirty:
+                return
+
+            self._refresh()
+
+            BAKKESMOD_LOCATION.mkdir(parents=True, exist_ok=True)
+            write_atomic(DATA_FILE, json.dumps(self._data, indent=2))
+
+            self._file_state = self._stat_file()
+            self._dirty.clear()
+
+    def _schedule_save(self) -> None:
+        if threading.current_thread() is threading.main_thread():
+            self._save()
+            return
+
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(SAVE_DEBOUNCE, self._save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self) -> None:
+        self._save()
+
+    @contextmanager
+    def transaction(self):
+        # batch several set() calls into a single write
+        with self._lock:
+            self._batch_depth += 1
+
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+
+                if self._batch_depth == 0:
+                    self._save()
 
     def get(self, key: str, default: Any = None) -> Any:
-        return self._data.get(key, default)
+        with self._lock:
+            self._refresh()
+            return self._data.get(key, default)
 
     def set(self, key: str, value: Any) -> None:
-        self._data[key] = value
-        self._save()
+        with self._lock:
+            self._refresh()
+            self._data[key] = value
+            self._dirty.add(key)
+
+            if self._batch_depth == 0:
+                self._schedule_save()
 
     def get_bakkesmod_version(self) -> str | None:
         return self.get("bakkesmod_version")
@@ -50,28 +148,137 @@ class ConfigManager:
     def set_injector_version(self, version: str) -> None:
         self.set("injector_version", version)
 
-    def get_github_release_info(self, api_url: str, asset_name: str) -> ReleaseInfo | None:
+    def _load_release_cache(self) -> dict[str, Any]:
+        with self._lock:
+            if self._releases is None:
+                try:
+                    self._releases = json.loads(RELEASE_CACHE_FILE.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    self._releases = {}
+
+            return self._releases
+
+    def _update_release_cache(self, changes: dict[str, Any]) -> None:
+        with self._lock:
+            cache = self._load_release_cache()
+
+            for key, value in changes.items():
+                if value is None:
+                    cache.pop(key, None)
+                else:
+                    cache[key] = value
+
+            BAKKESMOD_LOCATION.mkdir(parents=True, exist_ok=True)
+            # only a cache, losing it on power loss is fine
+            write_atomic(RELEASE_CACHE_FILE, json.dumps(cache, indent=2), durable=False)
+
+    def _fetch_release(self, api_url: str, max_age: float, cached_only: bool = False) -> dict[str, Any] | None:
+        cache = self._load_release_cache()
+        entry = cache.get(api_url)
+        now = time.time()
+
+        if cached_only or (entry and now - entry.get("fetched_at", 0) < max_age):
+            return entry["data"] if entry else None
+
+        rate_limited_until = cache.get("rate_limited_until", 0)
+
+        if now < rate_limited_until:
+            print(f"github rate limit active for {int(rate_limited_until - now)}s, using cached release info")
+            return entry["data"] if entry else None
+
+        # only pay for importing requests when the cache can't answer
+        import requests
+
+        headers = {"Accept": "application/vnd.github+json"}
+
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        elif entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            res = get_session().get(api_url, headers=headers, timeout=10)
+        except requests.RequestException as e:
+            print(f"failed to get release info from {api_url}: {e}")
+            return entry["data"] if entry else None
+
+        if res.status_code == 304 and entry:
+            self._update_release_cache({api_url: dict(entry, fetched_at=now)})
+            return entry["data"]
+
+        reset = res.headers.get("x-ratelimit-reset")
+        retry_after = res.headers.get("retry-after")
+        exhausted = res.headers.get("x-ratelimit-remaining") == "0"
+
+        if res.status_code == 429 or (res.status_code == 403 and (exhausted or retry_after)):
+            if retry_after and retry_after.isdigit():
+                until = now + int(retry_after)
+            elif reset and reset.isdigit():
+                until = int(reset)
+            else:
+                until = now + RATE_LIMIT_BACKOFF
+
+            self._update_release_cache({"rate_limited_until": until})
+            print(f"github rate limited release lookups ({res.status_code}), backing off")
+            return entry["data"] if entry else None
+
         try:
-            res = requests.get(api_url, timeout=10)
             res.raise_for_status()
             data = res.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"failed to get release info from {api_url}: {e}")
+            return entry["data"] if entry else None
 
-            tag_name = data.get("tag_name", "")
-
-            for asset in data.get("assets", []):
-                if asset["name"] == asset_name:
-                    return {
-                        "version": tag_name,
-                        "download_url": asset["browser_download_url"]
+        # only keep what we actually use, release payloads are large
+        entry = {
+            "etag": res.headers.get("etag"),
+            "last_modified": res.headers.get("last-modified"),
+            "fetched_at": now,
+            "data": {
+                "tag_name": data.get("tag_name", ""),
+                "assets": [
+                    {
+                        "name": asset["name"],
+                        "browser_download_url": asset["browser_download_url"],
+                        # "sha256:<hex>", github only has it for newer uploads
+                        "digest": asset.get("digest")
                     }
+                    for asset in data.get("assets", [])
+                ]
+            }
+        }
+        self._update_release_cache({api_url: entry, "rate_limited_until": None})
+
+        return entry["data"]
+
+    def get_github_release_info(
+        self, api_url: str, asset_name: str, max_age: float = RELEASE_CACHE_TTL, cached_only: bool = False
+    ) -> ReleaseInfo | None:
+        data = self._fetch_release(api_url, max_age, cached_only)
+
+        if data is None:
             return None
-        except requests.RequestException as e:
-            print(f"failed to get release info from {api_url}: {e}")
-            return None
 
-    def check_bakkesmod_update(self) -> ReleaseInfo | None:
+        tag_name = data.get("tag_name", "")
+
+        for asset in data.get("assets", []):
+            if asset["name"] == asset_name:
+                info = {
+                    "version": tag_name,
+                    "download_url": asset["browser_download_url"]
+                }
+
+                digest = asset.get("digest") or ""
+
+                if digest.startswith("sha256:"):
+                    info["sha256"] = digest.split(":", 1)[1].lower()
+
+                return info
+        return None
+
+    def check_bakkesmod_update(self, max_age: float = RELEASE_CACHE_TTL) -> ReleaseInfo | None:
         current = self.get_bakkesmod_version()
-        release_info = self.get_github_release_info(BAKKESMOD_GITHUB_API, "bakkesmod.zip")
+        release_info = self.get_github_release_info(BAKKESMOD_GITHUB_API, "bakkesmod.zip", max_age)
 
         if not release_info:
             print("couldnt fetch bakkesmod release info")
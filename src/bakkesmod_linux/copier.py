@@ -0,0 +1,216 @@
+import errno
+import fcntl
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+from bakkesmod_linux.timing import span
+
+# linux/fs.h FICLONE, _IOW(0x94, 9, int): share the source extents copy on write
+FICLONE = 0x40049409
+
+METHOD_REFLINK = "reflink"
+METHOD_COPY_FILE_RANGE = "copy_file_range"
+METHOD_BUFFERED = "buffered"
+# tried in this order, the first one the filesystem supports wins
+METHODS = (METHOD_REFLINK, METHOD_COPY_FILE_RANGE, METHOD_BUFFERED)
+
+# bytes per copy_file_range call, the kernel loops inside it
+COPY_RANGE_CHUNK = 8 * 1024 * 1024
+BUFFER_SIZE = 1024 * 1024
+
+# spinning disks seek themselves to death with more than a couple of writers
+ROTATIONAL_WORKERS = 2
+MAX_WORKERS = 16
+PROGRESS_INTERVAL = 0.2
+
+# errors that mean "this method doesn't work here", not "the copy failed"
+_UNSUPPORTED_ERRNOS = {errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS}
+
+# (source device, target device) -> methods that failed there, so a whole
+# tree doesn't pay for a failing ioctl on every file
+_unsupported: dict[tuple[int, int], set[str]] = {}
+_unsupported_lock = threading.Lock()
+
+class CopyStats(NamedTuple):
+    files: int
+    bytes: int
+    seconds: float
+    # files copied per method
+    methods: dict[str, int]
+
+    @property
+    def rate(self) -> float:
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+def _reflink(src_fd: int, dst_fd: int, size: int):
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+
+def _copy_file_range(src_fd: int, dst_fd: int, size: int):
+    copied = 0
+
+    while copied < size:
+        count = os.copy_file_range(src_fd, dst_fd, min(COPY_RANGE_CHUNK, size - copied))
+
+        if count == 0:
+            # some filesystems report success without copying anything
+            if copied == 0:
+                raise OSError(errno.ENOSYS, "copy_file_range copied nothing")
+            break
+
+        copied += count
+
+def _buffered(src_fd: int, dst_fd: int, size: int):
+    buffer = bytearray(min(BUFFER_SIZE, max(size, 1)))
+    view = memoryview(buffer)
+
+    while count := os.readv(src_fd, [buffer]):
+        written = 0
+
+        while written < count:
+            written += os.write(dst_fd, view[written:count])
+
+_IMPLEMENTATIONS = {
+    METHOD_REFLINK: _reflink,
+    METHOD_COPY_FILE_RANGE: _copy_file_range,
+    METHOD_BUFFERED: _buffered,
+}
+
+def _copy_data(src_fd: int, dst_fd: int, size: int, devices: tuple[int, int], methods: tuple[str, ...]) -> str:
+    with _unsupported_lock:
+        skip = set(_unsupported.get(devices, ()))
+
+    for method in methods:
+        if method in skip and method != METHOD_BUFFERED:
+            continue
+
+        try:
+            _IMPLEMENTATIONS[method](src_fd, dst_fd, size)
+            return method
+        except OSError as e:
+            if method == METHOD_BUFFERED or e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+
+            with _unsupported_lock:
+                _unsupported.setdefault(devices, set()).add(method)
+
+            # start over cleanly if the failed method got partway
+            os.ftruncate(dst_fd, 0)
+            os.lseek(src_fd, 0, os.SEEK_SET)
+            os.lseek(dst_fd, 0, os.SEEK_SET)
+
+    raise OSError(errno.ENOTSUP, f"no copy method available (tried {', '.join(methods)})")
+
+def copy_file(src: Path, dst: Path, replace: bool = False, methods: tuple[str, ...] = METHODS) -> tuple[str, int]:
+    # copies data, permission bits and timestamps like shutil.copy2 and
+    # returns the method used and the size. with replace the data goes to
+    # a temp name first, so readers never see a half written dst
+    target = dst.with_name(f".{dst.name}.copy") if replace else dst
+    src_fd = os.open(src, os.O_RDONLY | os.O_CLOEXEC)
+
+    try:
+        stat = os.fstat(src_fd)
+        dst_fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o600)
+
+        try:
+            devices = (stat.st_dev, os.fstat(dst_fd).st_dev)
+            method = _copy_data(src_fd, dst_fd, stat.st_size, devices, methods)
+            os.fchmod(dst_fd, stat.st_mode & 0o7777)
+            os.utime(dst_fd, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        finally:
+            os.close(dst_fd)
+    except BaseException:
+        if replace:
+            target.unlink(missing_ok=True)
+        raise
+    finally:
+        os.close(src_fd)
+
+    if replace:
+        os.replace(target, dst)
+
+    return method, stat.st_size
+
+@lru_cache(maxsize=None)
+def _is_rotational(device: int) -> bool | None:
+    # partitions have no queue of their own, their parent disk does
+    base = f"/sys/dev/block/{os.major(device)}:{os.minor(device)}"
+
+    for candidate in ("queue/rotational", "../queue/rotational"):
+        try:
+            return Path(base, candidate).read_text().strip() == "1"
+        except OSError:
+            continue
+
+    # tmpfs, btrfs and other filesystems without a single backing disk
+    return None
+
+def default_workers(path: Path) -> int:
+    try:
+        device = os.stat(path).st_dev
+    except OSError:
+        device = None
+
+    if device is not None and _is_rotational(device):
+        return ROTATIONAL_WORKERS
+
+    # flash keeps many requests in flight, more threads keep its queue busy.
+    # with a single cpu the copies just take turns on it
+    cpus = len(os.sched_getaffinity(0))
+    return min(MAX_WORKERS, cpus * 2) if cpus > 1 else 1
+
+class CopyEngine:
+    # copies many files on a bounded thread pool, the copy syscalls release
+    # the gil so the pool really runs in parallel
+    def __init__(self, workers: int | None = None, progress=None, label: str = "copying files", methods: tuple[str, ...] = METHODS):
+        self.workers = workers
+        self.progress = progress
+        self.label = label
+        self.methods = methods
+        self._lock = threading.Lock()
+
+    def copy(self, jobs: list[tuple[Path, Path]], replace: bool = False) -> CopyStats:
+        if not jobs:
+            return CopyStats(0, 0, 0.0, {})
+
+        workers = min(self.workers or default_workers(jobs[0][1].parent), len(jobs))
+        methods: dict[str, int] = {}
+        total = copied = 0
+        started = time.monotonic()
+        last_report = started
+
+        def run(job: tuple[Path, Path]):
+            nonlocal copied, last_report
+            method, size = copy_file(job[0], job[1], replace, self.methods)
+
+            with self._lock:
+                methods[method] = methods.get(method, 0) + 1
+                copied += size
+                now = time.monotonic()
+
+                if self.progress and now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    rate = copied / max(now - started, 1e-6) / (1024 * 1024)
+                    done = sum(methods.values())
+                    self.progress.progress(f"{self.label} ({rate:.1f} MiB/s)", int(done / len(jobs) * 100))
+
+            return size
+
+        with span("copy", files=len(jobs), workers=workers) as fields:
+            if workers <= 1:
+                total = sum(run(job) for job in jobs)
+            else:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="copy") as pool:
+                    total = sum(pool.map(run, jobs))
+
+            stats = CopyStats(len(jobs), total, time.monotonic() - started, methods)
+            fields["bytes"] = total
+            fields.update(methods)
+
+        summary = ", ".join(f"{count} {method}" for method, count in sorted(methods.items()))
+        print(f"copy: {stats.files} files, {total / (1024 * 1024):.1f} MiB at {stats.rate / (1024 * 1024):.1f} MiB/s ({summary})")
+        return stats
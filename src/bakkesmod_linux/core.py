@@ -4,10 +4,8 @@ import argparse
 import fcntl
 import os
 
-from bakkesmod_linux.desktop import create_desktop_entry, remove_desktop_entry
-from PySide6.QtWidgets import QApplication
-from bakkesmod_linux.gui import BakkesWindow
-from bakkesmod_linux.utils import run
+# keep this module light: Qt and requests are only imported once we know
+# this process is going to show a window
 
 def main():
     parser = argparse.ArgumentParser(description="BakkesMod injector for Linux")
@@ -21,38 +19,154 @@ def main():
         action="store_true",
         help="remove .desktop for BakkesMod"
     )
+    parser.add_argument(
+        "--create-autostart",
+        action="store_true",
+        help="start BakkesMod in the tray when you log in"
+    )
+    parser.add_argument(
+        "--remove-autostart",
+        action="store_true",
+        help="stop starting BakkesMod when you log in"
+    )
+    parser.add_argument(
+        "--tray",
+        action="store_true",
+        help="start in the tray, the window is only created once it is opened"
+    )
+
+    headless = parser.add_mutually_exclusive_group()
+    headless.add_argument(
+        "--daemon",
+        action="store_const",
+        const="daemon",
+        dest="command",
+        help="run without a window and inject when rocket league starts"
+    )
+    headless.add_argument(
+        "--inject",
+        action="store_const",
+        const="inject",
+        dest="command",
+        help="inject into the running game and exit"
+    )
+    headless.add_argument(
+        "--update",
+        action="store_const",
+        const="update",
+        dest="command",
+        help="update the bakkesmod files and exit"
+    )
+    headless.add_argument(
+        "--status",
+        action="store_const",
+        const="status",
+        dest="command",
+        help="print versions and game state and exit"
+    )
+    headless.add_argument(
+        "--stats",
+        action="store_const",
+        const="stats",
+        dest="command",
+        help="print p50/p95 timings per phase from recent runs and exit"
+    )
+    headless.add_argument(
+        "--verify",
+        action="store_const",
+        const="verify",
+        dest="command",
+        help="check the cached and deployed files against their recorded hashes and exit"
+    )
+    headless.add_argument(
+        "--rollback",
+        action="store_const",
+        const="rollback",
+        dest="command",
+        help="switch back to the previously used version and exit"
+    )
+    headless.add_argument(
+        "--use-version",
+        metavar="VERSION",
+        help="switch to a version kept in the local store and exit"
+    )
+    parser.add_argument(
+        "--component",
+        choices=["bakkesmod", "injector"],
+        default="bakkesmod",
+        help="what --rollback and --use-version switch (default: bakkesmod)"
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="print headless progress as json lines"
+    )
 
     args = parser.parse_args()
 
-    from pathlib import Path
+    if args.use_version:
+        args.command = "use-version"
 
     if args.create_desktop:
+        from pathlib import Path
+        from bakkesmod_linux.desktop import create_desktop_entry
+
         exec_path = str(Path(sys.argv[0]).resolve())
         success = create_desktop_entry(exec_path)
         sys.exit(0 if success else 1)
 
     if args.remove_desktop:
+        from bakkesmod_linux.desktop import remove_desktop_entry
+
         success = remove_desktop_entry()
         sys.exit(0 if success else 1)
 
+    if args.create_autostart:
+        from pathlib import Path
+        from bakkesmod_linux.desktop import create_autostart_entry
+
+        exec_path = str(Path(sys.argv[0]).resolve())
+        success = create_autostart_entry(exec_path)
+        sys.exit(0 if success else 1)
+
+    if args.remove_autostart:
+        from bakkesmod_linux.desktop import remove_autostart_entry
+
+        success = remove_autostart_entry()
+        sys.exit(0 if success else 1)
+
+    # read only, fine to run next to a running instance
+    if args.command in ("status", "stats", "verify"):
+        from bakkesmod_linux.headless import run_headless
+
+        sys.exit(run_headless(args.command, args.json, args.component, args.use_version))
+
     # check if another instance is running
     lock_file = open(f"/tmp/bakkesmod_{os.getuid()}.lock", "w")
 
     try:
         fcntl.lockf(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
     except IOError:
-        run("notify-send 'BakkesMod' 'BakkesMod is already running!!!'", wait=False)
+        if args.command:
+            print("another bakkesmod instance is already running", file=sys.stderr)
+            sys.exit(1)
+
+        from bakkesmod_linux.process import spawn_detached
+
+        spawn_detached(["notify-send", "BakkesMod", "BakkesMod is already running!!!"])
         sys.exit(1)
 
-    app = QApplication(sys.argv)
-    app.setQuitOnLastWindowClosed(False)
+    # headless modes never load qt
+    if args.command:
+        from bakkesmod_linux.headless import run_headless
 
-    signal.signal(signal.SIGINT, signal.SIG_DFL)
+        sys.exit(run_headless(args.command, args.json, args.component, args.use_version))
 
-    window = BakkesWindow()
-    window.show()
+    from bakkesmod_linux.gui import run_app
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
 
-    sys.exit(app.exec())
+    sys.exit(run_app(tray_only=args.tray))
 
 if __name__ == "__main__":
     main()
@@ -1,3 +1,4 @@
+import os
 import shutil
 
 from pathlib import Path
@@ -14,8 +15,20 @@ Categories=Game;Utility;
 Keywords=bakkesmod;rocket league;mod;
 """
 
+# started by the session at login, tray first so nothing pops up
+AUTOSTART_ENTRY = """[Desktop Entry]
+Name=BakkesMod
+Comment=BakkesMod injector for Linux
+Exec={exec_path} --tray
+Icon={icon_path}
+Terminal=false
+Type=Application
+X-GNOME-Autostart-enabled=true
+"""
+
 ICON_DEST = Path.home() / ".local/share/icons/bakkesmod.png"
 DESKTOP_DEST = Path.home() / ".local/share/applications/bakkesmod.desktop"
+AUTOSTART_DEST = Path(os.getenv("XDG_CONFIG_HOME") or Path.home() / ".config") / "autostart/bakkesmod.desktop"
 
 def ensure_icon() -> Path:
     if ICON_DEST.exists():
@@ -28,23 +41,34 @@ def ensure_icon() -> Path:
 
     return ICON_DEST
 
-def create_desktop_entry(exec_path: str) -> bool:
-    try:
-        icon_path = ensure_icon()
-        content = DESKTOP_ENTRY.format(
-            icon_path=icon_path,
-            exec_path=exec_path
-        )
+def _write_entry(template: str, dest: Path, exec_path: str):
+    icon_path = ensure_icon()
+    content = template.format(
+        icon_path=icon_path,
+        exec_path=exec_path
+    )
 
-        DESKTOP_DEST.parent.mkdir(parents=True, exist_ok=True)
-        DESKTOP_DEST.write_text(content, encoding="utf-8")
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    dest.write_text(content, encoding="utf-8")
 
+def create_desktop_entry(exec_path: str) -> bool:
+    try:
+        _write_entry(DESKTOP_ENTRY, DESKTOP_DEST, exec_path)
         print(f"created desktop entry at: {DESKTOP_DEST}")
         return True
     except Exception as e:
         print(f"failed to create desktop entry: {e}")
         return False
 
+def create_autostart_entry(exec_path: str) -> bool:
+    try:
+        _write_entry(AUTOSTART_ENTRY, AUTOSTART_DEST, exec_path)
+        print(f"created autostart entry at: {AUTOSTART_DEST}")
+        return True
+    except Exception as e:
+        print(f"failed to create autostart entry: {e}")
+        return False
+
 def desktop_entry_exists() -> bool:
     return DESKTOP_DEST.exists()
 
@@ -54,11 +78,29 @@ def remove_desktop_entry() -> bool:
             DESKTOP_DEST.unlink()
             print(f"removed desktop entry: {DESKTOP_DEST}")
 
-        if ICON_DEST.exists():
-            ICON_DEST.unlink()
-            print(f"removed icon: {ICON_DEST}")
-
+        _remove_unused_icon()
         return True
     except Exception as e:
         print(f"failed to remove desktop entry: {e}")
         return False
+
+def remove_autostart_entry() -> bool:
+    try:
+        if AUTOSTART_DEST.exists():
+            AUTOSTART_DEST.unlink()
+            print(f"removed autostart entry: {AUTOSTART_DEST}")
+
+        _remove_unused_icon()
+        return True
+    except Exception as e:
+        print(f"failed to remove autostart entry: {e}")
+        return False
+
+def _remove_unused_icon():
+    # both entries point at the same icon
+    if DESKTOP_DEST.exists() or AUTOSTART_DEST.exists():
+        return
+
+    if ICON_DEST.exists():
+        ICON_DEST.unlink()
+        print(f"removed icon: {ICON_DEST}")
@@ -0,0 +1,374 @@
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import requests
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from bakkesmod_linux.net import get_session
+from bakkesmod_linux.progress import TransferMeter
+
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 30
+MAX_CONNECTIONS = 4
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.5
+
+# assets smaller than two segments are not worth splitting
+SEGMENT_MIN_SIZE = 4 * 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024
+# ranges hashed out of order are read back from the part file in these steps
+READ_BACK_SIZE = 1024 * 1024
+
+class DownloadError(Exception):
+    pass
+
+class IntegrityError(DownloadError):
+    pass
+
+class _StreamHasher:
+    # sha256 of a file that may be written out of order. bytes landing at
+    # the hash position are hashed from memory as they arrive, ranges other
+    # segments wrote ahead of it are read back from the part file (still in
+    # the page cache) once the gap before them is closed
+    def __init__(self, fd: int | None = None):
+        self.position = 0
+        self._digest = hashlib.sha256()
+        self._fd = fd
+        # start -> end of ranges on disk past the hash position
+        self._ahead: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def update(self, offset: int, data):
+        with self._lock:
+            if offset != self.position:
+                self._add_range(offset, offset + len(data))
+                return
+
+            self._digest.update(data)
+            self.position += len(data)
+            self._catch_up()
+
+    def written(self, start: int, end: int):
+        # bytes already on disk, e.g. what a previous attempt downloaded
+        with self._lock:
+            self._add_range(start, end)
+            self._catch_up()
+
+    def _add_range(self, start: int, end: int):
+        # a segment writes sequentially, so a new range usually extends one
+        for range_start, range_end in self._ahead.items():
+            if range_end == start:
+                self._ahead[range_start] = end
+                return
+
+        self._ahead[start] = end
+
+    def _catch_up(self):
+        while (end := self._ahead.pop(self.position, None)) is not None:
+            while self.position < end:
+                data = os.pread(self._fd, min(READ_BACK_SIZE, end - self.position), self.position)
+
+                if not data:
+                    raise DownloadError(f"part file ends at {self.position}, expected {end} bytes")
+
+                self._digest.update(data)
+                self.position += len(data)
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+class _RemoteInfo:
+    def __init__(self, size: int, ranges: bool, validator: str):
+        self.size = size
+        self.ranges = ranges
+        self.validator = validator
+
+class _Transfer(TransferMeter):
+    # shared progress state between segment workers
+    def __init__(self, total: int, done: int, progress, label: str):
+        super().__init__(total, done)
+        self.progress = progress
+        self.label = label
+        self.hasher = _StreamHasher()
+        self._lock = threading.Lock()
+
+    def add(self, amount: int) -> bool:
+        with self._lock:
+            # the message is only built when the bar actually moves
+            moved = super().add(amount)
+
+            if moved and self.progress and self.total > 0:
+                self.progress.progress(self.describe(self.label), self.percentage)
+
+            return moved
+
+class Downloader:
+    def __init__(self, session: requests.Session | None = None, connections: int = MAX_CONNECTIONS):
+        self.session = session or get_session()
+        self.connections = connections
+
+    def download(self, url: str, destination, progress=None, label: str = "downloading...", digest: str | None = None) -> str:
+        # returns the sha256 of the file, hashed while it downloads. with a
+        # digest from the release a mismatch raises and nothing is kept
+        destination = Path(destination)
+        part_path = destination.with_name(f"{destination.name}.part")
+        state_path = destination.with_name(f"{destination.name}.part.json")
+
+        info = self._probe(url)
+
+        if info.ranges and info.size >= 2 * SEGMENT_MIN_SIZE and self.connections > 1:
+            transfer = self._download_segmented(url, info, part_path, state_path, progress, label)
+        else:
+            transfer = self._download_single(url, info, part_path, state_path, progress, label)
+
+        actual = transfer.hasher.hexdigest()
+        problem = None
+
+        if info.size and transfer.hasher.position != info.size:
+            problem = f"got {transfer.hasher.position} of {info.size} bytes"
+        elif digest and actual != digest.lower():
+            problem = f"sha256 is {actual}, the release says {digest.lower()}"
+
+        if problem:
+            # a resume would only build on the bad bytes
+            part_path.unlink(missing_ok=True)
+            state_path.unlink(missing_ok=True)
+            raise IntegrityError(f"{destination.name}: {problem}")
+
+        os.replace(part_path, destination)
+        state_path.unlink(missing_ok=True)
+
+        mib = (transfer.done - transfer.start_bytes) / (1024 * 1024)
+        print(f"downloaded {destination.name}: {mib:.1f} MiB at {transfer.rate() / (1024 * 1024):.1f} MiB/s, sha256 {actual}")
+        return actual
+
+    def iter_stream(self, url: str, progress=None, label: str = "downloading...", start: int = 0):
+        # sequential download for consumers that need bytes in order,
+        # reconnects with a Range request from the current offset on errors
+        offset = start
+        total = 0
+        attempt = 0
+        meter: TransferMeter | None = None
+
+        while True:
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+            try:
+                with self.session.get(
+                    url, stream=True, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+                ) as res:
+                    res.raise_for_status()
+
+                    if offset and res.status_code != 206:
+                        raise DownloadError("server does not support resuming this download")
+
+                    if not total:
+                        total = offset + int(res.headers.get("content-length", 0))
+                        meter = TransferMeter(total, offset) if total > offset else None
+
+                    for chunk in res.iter_content(chunk_size=CHUNK_SIZE):
+                        offset += len(chunk)
+                        attempt = 0
+                        percentage = int(offset / total * 100) if total > 0 else 0
+
+                        if progress and meter and meter.add(len(chunk)):
+                            progress.progress(meter.describe(label), meter.percentage)
+
+                        yield chunk, percentage
+
+                if total and offset < total:
+                    raise requests.ConnectionError(f"connection closed at {offset}/{total} bytes")
+
+                return
+            except requests.RequestException as e:
+                attempt += 1
+
+                if attempt > MAX_RETRIES:
+                    raise DownloadError(f"download failed after {MAX_RETRIES} retries: {e}")
+
+                print(f"download interrupted ({e}), retrying in {self._backoff(attempt):.1f}s")
+                time.sleep(self._backoff(attempt))
+
+    def _backoff(self, attempt: int) -> float:
+        return RETRY_BACKOFF * (2 ** (attempt - 1))
+
+    def _probe(self, url: str) -> _RemoteInfo:
+        try:
+            res = self.session.head(url, allow_redirects=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+            res.raise_for_status()
+        except requests.RequestException:
+            return _RemoteInfo(0, False, "")
+
+        size = int(res.headers.get("content-length", 0))
+        ranges = res.headers.get("accept-ranges", "").lower() == "bytes" and size > 0
+        validator = res.headers.get("etag") or res.headers.get("last-modified") or ""
+        return _RemoteInfo(size, ranges, validator)
+
+    def _load_state(self, state_path: Path, url: str, info: _RemoteInfo, segment_size: int) -> set[int] | None:
+        try:
+            state = json.loads(state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+        expected = {
+            "url": url,
+            "size": info.size,
+            "validator": info.validator,
+            "segment_size": segment_size
+        }
+
+        # the remote file changed, previous parts are useless
+        if any(state.get(key) != value for key, value in expected.items()):
+            return None
+
+        return set(state.get("done", []))
+
+    def _save_state(self, state_path: Path, url: str, info: _RemoteInfo, segment_size: int, done):
+        tmp_path = state_path.with_name(f"{state_path.name}.tmp")
+        state = {
+            "url": url,
+            "size": info.size,
+            "validator": info.validator,
+            "segment_size": segment_size,
+            "done": sorted(done)
+        }
+
+        tmp_path.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp_path, state_path)
+
+    def _download_segmented(self, url, info: _RemoteInfo, part_path: Path, state_path: Path, progress, label):
+        segment_size = max(SEGMENT_MIN_SIZE, math.ceil(info.size / (self.connections * 4)))
+        segments = [
+            (index, start, min(start + segment_size, info.size) - 1)
+            for index, start in enumerate(range(0, info.size, segment_size))
+        ]
+
+        done = self._load_state(state_path, url, info, segment_size) if part_path.exists() else None
+        done = done or set()
+
+        if done:
+            print(f"resuming download: {len(done)}/{len(segments)} segments already done")
+
+        done_bytes = sum(end - start + 1 for index, start, end in segments if index in done)
+        transfer = _Transfer(info.size, done_bytes, progress, label)
+        state_lock = threading.Lock()
+
+        fd = os.open(part_path, os.O_RDWR | os.O_CREAT, 0o644)
+        transfer.hasher = _StreamHasher(fd)
+
+        try:
+            os.ftruncate(fd, info.size)
+
+            for index, start, end in segments:
+                if index in done:
+                    transfer.hasher.written(start, end + 1)
+
+            def fetch(segment):
+                index, start, end = segment
+                self._fetch_segment(url, fd, start, end, transfer)
+
+                with state_lock:
+                    done.add(index)
+                    self._save_state(state_path, url, info, segment_size, done)
+
+            pending = [segment for segment in segments if segment[0] not in done]
+
+            with ThreadPoolExecutor(max_workers=self.connections) as pool:
+                for future in [pool.submit(fetch, segment) for segment in pending]:
+                    future.result()
+        finally:
+            os.close(fd)
+
+        return transfer
+
+    def _fetch_segment(self, url, fd: int, start: int, end: int, transfer: _Transfer):
+        offset = start
+        attempt = 0
+
+        while offset <= end:
+            buffer = bytearray()
+            buffer_offset = offset
+
+            try:
+                with self.session.get(
+                    url,
+                    stream=True,
+                    headers={"Range": f"bytes={offset}-{end}"},
+                    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+                ) as res:
+                    res.raise_for_status()
+
+                    if res.status_code != 206:
+                        raise DownloadError("server ignored the range request")
+
+                    for chunk in res.iter_content(chunk_size=CHUNK_SIZE):
+                        buffer += chunk
+                        offset += len(chunk)
+                        transfer.add(len(chunk))
+
+                        if len(buffer) >= WRITE_BUFFER_SIZE:
+                            os.pwrite(fd, buffer, buffer_offset)
+                            transfer.hasher.update(buffer_offset, buffer)
+                            buffer_offset += len(buffer)
+                            buffer.clear()
+
+                    if buffer:
+                        os.pwrite(fd, buffer, buffer_offset)
+                        transfer.hasher.update(buffer_offset, buffer)
+                        buffer.clear()
+
+                if offset <= end:
+                    raise requests.ConnectionError(f"segment closed early at {offset}/{end}")
+            except requests.RequestException as e:
+                # keep whatever arrived, the retry continues from there
+                if buffer:
+                    os.pwrite(fd, buffer, buffer_offset)
+                    transfer.hasher.update(buffer_offset, buffer)
+
+                attempt += 1
+
+                if attempt > MAX_RETRIES:
+                    raise DownloadError(f"segment {start}-{end} failed after {MAX_RETRIES} retries: {e}")
+
+                time.sleep(self._backoff(attempt))
+
+    def _download_single(self, url, info: _RemoteInfo, part_path: Path, state_path: Path, progress, label):
+        offset = 0
+
+        # a single stream can still resume if the server allows ranges
+        if info.ranges and part_path.exists() and self._load_state(state_path, url, info, 0) is not None:
+            offset = min(part_path.stat().st_size, info.size)
+
+            if offset:
+                print(f"resuming download at {offset}/{info.size} bytes")
+
+        if info.ranges:
+            self._save_state(state_path, url, info, 0, set())
+
+        transfer = _Transfer(info.size, offset, progress, label)
+
+        with open(part_path, "r+b" if offset else "wb", buffering=WRITE_BUFFER_SIZE) as f:
+            transfer.hasher = _StreamHasher(f.fileno())
+
+            # what a previous attempt got is hashed once from disk
+            if offset:
+                transfer.hasher.written(0, offset)
+
+            if info.ranges and offset == info.size:
+                return transfer
+
+            f.seek(offset)
+            f.truncate()
+
+            for chunk, _ in self.iter_stream(url, start=offset):
+                transfer.hasher.update(offset, chunk)
+                f.write(chunk)
+                offset += len(chunk)
+                transfer.add(len(chunk))
+
+        return transfer
@@ -1,47 +1,43 @@
+import os
+import sys
+import threading
+import time
+
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout,
     QWidget, QSystemTrayIcon, QMenu, QLabel, QProgressBar, QFrame
 )
-from PySide6.QtGui import QIcon, QAction, QDesktopServices
-from PySide6.QtCore import QThread, Signal, Qt, QUrl, QTimer
+from PySide6.QtGui import QIcon, QAction, QDesktopServices, QPixmap
+from PySide6.QtCore import QObject, QThread, QTimer, Signal, Slot, Qt, QUrl
 
-from bakkesmod_linux.bakkesmod import BakkesHelper, WATCHER_INTERVAL_MS
-from bakkesmod_linux.utils import get_resource_path
+from bakkesmod_linux.autoinject import AutoInjector, record_injection
+from bakkesmod_linux.bakkesmod import BakkesHelper, HelperState
+from bakkesmod_linux.utils import read_resource
 from bakkesmod_linux.constants import BAKKESMOD_LOCATION
+from bakkesmod_linux.progress import INDETERMINATE, STATUS_ONLY, ProgressReporter
+from bakkesmod_linux.tasks import TaskGraph
+from bakkesmod_linux.timing import record, span
+from bakkesmod_linux.watcher import PROCESS_STARTED
+
+# event loop blocks longer than this are logged, 0 turns the check off
+STALL_THRESHOLD_MS = 50
+STALL_ENV = "BAKKESLINUX_STALL_MS"
+
+# seconds a hidden window is kept around before its widgets are freed
+WINDOW_RELEASE_DELAY = 60
+
+_app_icon: QIcon | None = None
 
-class ProgressReporter:
-    def __init__(self, callback):
-        self._callback = callback
-        self._has_error = False
-        self._last_message = ""
-
-    def set_status_msg(self, message):
-        print(f"[status] {message}")
-        self._last_message = message
-        self._callback(message, -2)
-
-    def status(self, message):
-        print(f"[progress] {message}")
-        self._last_message = message
-        self._callback(message, -1)
-
-    def progress(self, message, percentage):
-        if message != "":
-            print(f"[progress] {message} ({percentage}%)")
-        self._last_message = message
-        self._callback(message, percentage)
-
-    def done(self, message):
-        if message != "":
-            print(f"[done] {message}")
-        self._last_message = message
-        self._callback(message, 100)
-
-    def error(self, message):
-        print(f"[error] {message}")
-        self._has_error = True
-        self._last_message = message
-        self._callback(message, 100)
+def get_app_icon() -> QIcon:
+    # shared by the window and the tray, decoded once from the package data
+    global _app_icon
+
+    if _app_icon is None:
+        pixmap = QPixmap()
+        pixmap.loadFromData(read_resource("bakkesmod.png"))
+        _app_icon = QIcon(pixmap)
+
+    return _app_icon
 
 class WorkerThread(QThread):
     finished = Signal(bool, str)
@@ -64,61 +60,426 @@ class WorkerThread(QThread):
         except Exception as e:
             self.finished.emit(False, str(e))
 
-class BakkesWindow(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("BakkesMod")
-        self.setFixedSize(360, 200)
+class GameStateWorker(QObject):
+    # lives on its own thread and owns process detection and install path
+    # resolution, the window only sees HelperState copies through state_changed
+    state_changed = Signal(object, bool)
+    _event_received = Signal(object)
+    _refresh_requested = Signal(bool)
 
-        with get_resource_path("bakkesmod.png") as file:
-            self.setWindowIcon(QIcon(str(file)))
+    def __init__(self, helper: BakkesHelper):
+        super().__init__()
+        self.helper = helper
+        # emitted from the watcher and ui threads, handled on ours
+        self._event_received.connect(self._handle_event)
+        self._refresh_requested.connect(self._publish)
+
+    @Slot()
+    def start(self):
+        self.helper.set_process_callback(self._event_received.emit)
+        self.helper.start_watcher()
+
+    def refresh(self, check_auto_inject: bool = False):
+        self._refresh_requested.emit(check_auto_inject)
+
+    @Slot(object)
+    def _handle_event(self, event):
+        started = event.kind == PROCESS_STARTED
+        self._publish(started)
+
+        # can start wine for a few seconds, detection goes on meanwhile
+        if started:
+            self.helper.prefetch_install_path(event.pid)
+
+    @Slot(bool)
+    def _publish(self, check_auto_inject: bool):
+        self.state_changed.emit(self.helper.snapshot(), check_auto_inject)
+
+class StallDetector(QObject):
+    # a heartbeat on the ui thread, a tick that arrives late means the event
+    # loop was blocked for about that long
+    def __init__(self, threshold_ms: int, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000
+        self.interval_ms = max(threshold_ms // 2, 10)
+        self.stalls = 0
+        self.worst = 0.0
+        self._last = time.monotonic()
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.TimerType.CoarseTimer)
+        self._timer.timeout.connect(self._tick)
+
+    def start(self):
+        self._last = time.monotonic()
+        self._timer.start(self.interval_ms)
+
+    def stop(self):
+        self._timer.stop()
+
+        if self.stalls:
+            print(f"ui: {self.stalls} event loop stalls, worst {self.worst * 1000:.0f} ms")
+
+    def _tick(self):
+        now = time.monotonic()
+        blocked = now - self._last - self.interval_ms / 1000
+        self._last = now
+
+        if blocked < self.threshold:
+            return
 
+        self.stalls += 1
+        self.worst = max(self.worst, blocked)
+        print(f"ui: event loop blocked for {blocked * 1000:.0f} ms")
+        record("ui.stall", blocked * 1000)
+
+def _stall_threshold() -> int:
+    try:
+        return max(int(os.getenv(STALL_ENV, STALL_THRESHOLD_MS)), 0)
+    except ValueError:
+        return STALL_THRESHOLD_MS
+
+class BakkesTray(QObject):
+    # the part of the gui that lives as long as the app: tray icon, game
+    # state and tasks. the window is only a view of it, built when it is
+    # first shown and freed again after it stayed hidden for a while
+    status_changed = Signal(str, str)
+    progress_changed = Signal(str, int)
+    busy_changed = Signal(bool)
+    game_state_changed = Signal(object)
+
+    def __init__(self, show_window: bool = True):
+        super().__init__()
         self.injector = BakkesHelper()
+        # last state published by the state worker, the ui never reads the helper directly
+        self.state = HelperState(False, False, (), ())
+        self.status = ("ready", "normal")
+        self.progress = ("", INDETERMINATE)
+        self.window: "BakkesWindow | None" = None
         self.worker_thread = None
         self.is_busy = False
+        # set on quit so a pending auto inject stops waiting for the game
+        self._auto_stop = threading.Event()
+        # games auto inject already failed on, retrying them would loop
+        self._auto_failed: set[int] = set()
+
+        self._release_timer = QTimer(self)
+        self._release_timer.setSingleShot(True)
+        self._release_timer.timeout.connect(self._release_window)
 
-        self.setup_ui()
         self.setup_tray()
         self.setup_watcher()
+        self.setup_stall_detector()
 
-        with get_resource_path("main.qss") as file:
-            self.setStyleSheet(file.read_text(encoding="utf-8"))
+        if show_window:
+            self.show_window()
 
         self.start_task(
-            lambda progress: self.injector.update(progress),
-            after_fn=lambda success, msg: self.on_startup_complete()
+            lambda progress: self.injector.startup(progress),
+            after_fn=lambda success, msg: self.on_startup_complete(success, msg)
         )
 
     def setup_watcher(self):
-        self.watcher_timer = QTimer(self)
-        self.watcher_timer.timeout.connect(self.injector.check_rl_process)
-        self.injector.set_process_callback(self.on_process_state_changed)
-        self.watcher_timer.start(WATCHER_INTERVAL_MS)
+        self.state_thread = QThread(self)
+        self.state_thread.setObjectName("game-state")
+        self.state_worker = GameStateWorker(self.injector)
+        self.state_worker.moveToThread(self.state_thread)
+        self.state_worker.state_changed.connect(self.on_state_changed)
+        self.state_thread.started.connect(self.state_worker.start)
+        self.state_thread.start()
+
+    def setup_stall_detector(self):
+        threshold = _stall_threshold()
+        self.stall_detector = StallDetector(threshold, self) if threshold else None
+
+        if self.stall_detector:
+            self.stall_detector.start()
+
+    def setup_tray(self):
+        self.tray = QSystemTrayIcon(self)
+
+        self.tray.setIcon(get_app_icon())
+
+        self.tray.setToolTip("BakkesMod")
+
+        self.auto_inject_action = self.create_action("auto inject", self.toggle_auto_inject)
+        self.auto_inject_action.setCheckable(True)
+        self.auto_inject_action.setChecked(bool(self.injector.config.get("auto_inject", False)))
+
+        # QMenu only takes a widget parent, the tray keeps this one referenced
+        self.tray_menu = QMenu()
+        self.tray_menu.addAction(self.create_action("show", self.show_window))
+        self.tray_menu.addAction(self.auto_inject_action)
+        self.tray_menu.addAction(self.create_action("quit", self.quit_app))
+
+        self.tray.setContextMenu(self.tray_menu)
+        self.tray.activated.connect(self.tray_clicked)
+        self.tray.show()
+
+    def create_action(self, text, slot):
+        action = QAction(text, self)
+        action.triggered.connect(slot)
+        return action
+
+    # window lifecycle
+
+    def show_window(self):
+        self._release_timer.stop()
+
+        if self.window is None:
+            with span("gui.build_window"):
+                self.window = BakkesWindow(self)
+
+        self.window.show()
+        self.window.activateWindow()
+
+    def hide_window(self):
+        if self.window is not None:
+            self.window.hide()
+
+    def window_hidden(self):
+        # reopening it soon after is common, so it isn't freed right away
+        self._release_timer.start(int(WINDOW_RELEASE_DELAY * 1000))
+
+    def _release_window(self):
+        if self.window is None or self.window.isVisible():
+            return
+
+        # signal connections to it go away with the c++ object
+        self.window.deleteLater()
+        self.window = None
+        print("gui: window released")
+
+    def tray_clicked(self, reason):
+        if reason == QSystemTrayIcon.ActivationReason.Trigger:
+            if self.window is not None and self.window.isVisible():
+                self.hide_window()
+            else:
+                self.show_window()
+
+    def quit_app(self):
+        self._auto_stop.set()
+        # a hung wine command would otherwise block the wait below
+        self.injector.cancel()
+
+        if self.worker_thread and self.worker_thread.isRunning():
+            self.worker_thread.quit()
+            self.worker_thread.wait()
+
+        self.injector.stop_watcher()
+        self.state_thread.quit()
+        self.state_thread.wait()
+
+        if self.stall_detector:
+            self.stall_detector.stop()
+
+        self.tray.hide()
+        QApplication.quit()
+
+    # game state
+
+    def on_startup_complete(self, success, message):
+        self.set_busy(False)
+
+        if success:
+            self._sync_process_state(check_auto_inject=True)
+            return
+
+        # a refresh would replace the error with the game state, an
+        # existing install may still be good enough to inject
+        self.set_status(message or "startup failed", "error")
+        self._maybe_auto_inject()
 
+    def _sync_process_state(self, check_auto_inject: bool = False):
+        # the answer comes back through on_state_changed
+        self.state_worker.refresh(check_auto_inject)
 
-    def on_startup_complete(self):
-        self.show_idle_state()
-        # defer process check to next event loop tick to avoid blocking ui
-        QTimer.singleShot(0, self._initial_process_check)
+    def on_state_changed(self, state: HelperState, check_auto_inject: bool):
+        # other instances may still be running when one exits
+        self.state = state
+        self.game_state_changed.emit(state)
+        self.on_process_state_changed(state.running)
 
-    def _initial_process_check(self):
-        self.injector.check_rl_process()
-        # force ui update based on current state
-        self.on_process_state_changed(self.injector.rl_running)
+        if check_auto_inject:
+            self._maybe_auto_inject()
 
     def on_process_state_changed(self, running: bool):
         if not running:
             self.set_status("waiting for rocket league...", "normal")
-            self.inject_btn.setEnabled(False)
-            self.injector.injected = False
-            return
-
-        if self.injector.injected:
+        elif self.state.injected:
             self.set_status("injected", "success")
-            self.inject_btn.setEnabled(False)
         else:
             self.set_status("ready", "info")
-            self.inject_btn.setEnabled(True)
+
+    def _maybe_auto_inject(self):
+        if self.is_busy or not self.auto_inject_action.isChecked():
+            return
+
+        # forget games that exited or got injected by hand
+        self._auto_failed &= set(self.state.pending)
+        pids = [pid for pid in self.state.pending if pid not in self._auto_failed]
+
+        if not pids:
+            return
+
+        self.start_task(
+            lambda progress: self._auto_inject(progress, pids),
+            after_fn=lambda success, msg: self.finish_injection(success, msg, pids)
+        )
+
+    def _auto_inject(self, progress, pids):
+        injector = AutoInjector(self.injector, self._auto_stop)
+
+        if len(pids) == 1:
+            injector.run(pids[0], progress)
+            return
+
+        # every instance waits for its own readiness in parallel
+        graph = TaskGraph(progress, max_workers=len(pids))
+
+        for pid in pids:
+            graph.add(f"pid {pid}", lambda task_progress, pid=pid: injector.run(pid, task_progress))
+
+        graph.run()
+
+    def toggle_auto_inject(self, enabled):
+        self.injector.config.set("auto_inject", enabled)
+
+        if enabled:
+            self._maybe_auto_inject()
+
+    # actions
+
+    def check_updates(self):
+        if self.is_busy:
+            return
+
+        self.start_task(
+            lambda progress: self.injector.update(progress, force=True),
+            after_fn=lambda success, msg: self.finish_update(success, msg)
+        )
+
+    def open_folder(self):
+        if BAKKESMOD_LOCATION.exists():
+            QDesktopServices.openUrl(QUrl.fromLocalFile(str(BAKKESMOD_LOCATION)))
+        else:
+            self.set_status("bakkesmod folder not found", "error")
+
+    def inject_clicked(self):
+        if self.is_busy:
+            return
+
+        self.start_task(
+            self._manual_inject,
+            after_fn=lambda success, msg: self.finish_injection(success, msg)
+        )
+
+    def _manual_inject(self, progress):
+        sessions = self.injector.pending_sessions()
+        self.injector.inject_all(progress)
+
+        # lets the auto inject delays be compared against a human click
+        for session in sessions:
+            if session.last_inject_code is not None:
+                record_injection(self.injector.config, session.pid, "manual", session.injected)
+
+    # tasks
+
+    def start_task(self, task_fn, after_fn=None):
+        self.progress = ("", INDETERMINATE)
+        self.set_busy(True)
+
+        self.worker_thread = WorkerThread(task_fn)
+        self.worker_thread.progress_update.connect(self.update_progress)
+        self.worker_thread.finished.connect(
+            lambda success, msg: self.task_finished(success, msg, after_fn)
+        )
+        self.worker_thread.start()
+
+    def update_progress(self, message, percentage):
+        # updates arrive already coalesced to the frame budget
+        if percentage == STATUS_ONLY:
+            self.set_status(message, "info")
+            return
+
+        self.set_busy(True)
+        self.progress = (message, percentage)
+        self.progress_changed.emit(message, percentage)
+
+    def task_finished(self, success, message, after_fn):
+        if after_fn:
+            after_fn(success, message)
+        else:
+            self.set_busy(False)
+
+    def finish_update(self, success, message):
+        self.set_busy(False)
+
+        if success:
+            self.set_status(message or "up to date", "success")
+        else:
+            self.set_status(message or "update failed", "error")
+
+        # games that started during the update were skipped while busy
+        self._sync_process_state(check_auto_inject=True)
+
+    def finish_injection(self, success, message, pids=()):
+        self.set_busy(False)
+
+        if success:
+            self._sync_process_state(check_auto_inject=True)
+            return
+
+        # a refresh would replace the error, the last published state
+        # already has the games that started during the inject
+        self._auto_failed.update(pids)
+        self.set_status(message or "injection failed", "error")
+        self._maybe_auto_inject()
+
+    def set_busy(self, busy: bool):
+        if busy != self.is_busy:
+            self.is_busy = busy
+            self.busy_changed.emit(busy)
+
+    def set_status(self, text, state="normal"):
+        self.status = (text, state)
+        self.status_changed.emit(text, state)
+
+class BakkesWindow(QMainWindow):
+    # a view of BakkesTray, everything it shows is rebuilt from the tray's
+    # state so it can be thrown away and recreated at any time
+    def __init__(self, tray: BakkesTray):
+        super().__init__()
+        self.tray = tray
+        self.setWindowTitle("BakkesMod")
+        self.setFixedSize(360, 200)
+
+        self.setWindowIcon(get_app_icon())
+
+        self.setup_ui()
+
+        self.setStyleSheet(read_resource("main.qss").decode("utf-8"))
+
+        tray.status_changed.connect(self.set_status)
+        tray.progress_changed.connect(self.update_progress)
+        tray.busy_changed.connect(self.on_busy_changed)
+        tray.game_state_changed.connect(self.on_game_state_changed)
+
+        self.set_status(*tray.status)
+        self.on_game_state_changed(tray.state)
+        self.on_busy_changed(tray.is_busy)
+
+    def on_busy_changed(self, busy: bool):
+        if busy:
+            self.update_progress(*self.tray.progress)
+            self.show_loading_state()
+        else:
+            self.show_idle_state()
+
+    def on_game_state_changed(self, state: HelperState):
+        self.inject_btn.setEnabled(state.running and not state.injected)
+        # a single game is already covered by the status line
+        self.instances_label.setText("\n".join(state.instances))
+        self.instances_label.setVisible(len(state.instances) > 1)
 
     def setup_ui(self):
         central = QWidget()
@@ -134,11 +495,11 @@ class BakkesWindow(QMainWindow):
 
         self.update_btn = QPushButton("check for updates")
         self.update_btn.setObjectName("headerBtn")
-        self.update_btn.clicked.connect(self.check_updates)
+        self.update_btn.clicked.connect(self.tray.check_updates)
 
         self.folder_btn = QPushButton("open folder")
         self.folder_btn.setObjectName("headerBtn")
-        self.folder_btn.clicked.connect(self.open_folder)
+        self.folder_btn.clicked.connect(self.tray.open_folder)
 
         header_layout.addWidget(self.update_btn)
         header_layout.addWidget(self.folder_btn)
@@ -169,14 +530,20 @@ class BakkesWindow(QMainWindow):
         self.inject_btn = QPushButton("inject")
         self.inject_btn.setObjectName("mainBtn")
         self.inject_btn.setFixedSize(140, 40)
-        self.inject_btn.clicked.connect(self.inject_clicked)
+        self.inject_btn.clicked.connect(self.tray.inject_clicked)
 
         self.status_label = QLabel("ready")
         self.status_label.setObjectName("statusLabel")
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
+        self.instances_label = QLabel("")
+        self.instances_label.setObjectName("instancesLabel")
+        self.instances_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.instances_label.hide()
+
         idle_layout.addWidget(self.inject_btn, 0, Qt.AlignmentFlag.AlignHCenter)
         idle_layout.addWidget(self.status_label, 0, Qt.AlignmentFlag.AlignHCenter)
+        idle_layout.addWidget(self.instances_label, 0, Qt.AlignmentFlag.AlignHCenter)
 
         self.idle_widget.setLayout(idle_layout)
 
@@ -200,19 +567,22 @@ class BakkesWindow(QMainWindow):
         self.loading_widget.setLayout(loading_layout)
 
     def show_idle_state(self):
-        self.clear_content()
-        self.content_layout.addWidget(self.idle_widget)
-        self.idle_widget.show()
-        self.is_busy = False
+        self.show_content(self.idle_widget)
         self.toggle_header_buttons(True)
 
     def show_loading_state(self):
-        self.clear_content()
-        self.content_layout.addWidget(self.loading_widget)
-        self.loading_widget.show()
-        self.is_busy = True
+        self.show_content(self.loading_widget)
         self.toggle_header_buttons(False)
 
+    def show_content(self, widget):
+        # swapping widgets relayouts the window, only do it on a real change
+        if self.content_layout.indexOf(widget) >= 0:
+            return
+
+        self.clear_content()
+        self.content_layout.addWidget(widget)
+        widget.show()
+
     def clear_content(self):
         # remove all widgets from the central thing
         while self.content_layout.count():
@@ -225,124 +595,40 @@ class BakkesWindow(QMainWindow):
         self.update_btn.setEnabled(enabled)
         self.folder_btn.setEnabled(enabled)
 
-    def setup_tray(self):
-        self.tray = QSystemTrayIcon(self)
-
-        with get_resource_path("bakkesmod.png") as icon_path:
-            self.tray.setIcon(QIcon(str(icon_path)))
-
-        self.tray.setToolTip("BakkesMod")
-
-        menu = QMenu()
-        menu.addAction(self.create_action("show", self.show_window))
-        menu.addAction(self.create_action("quit", self.quit_app))
-
-        self.tray.setContextMenu(menu)
-        self.tray.activated.connect(self.tray_clicked)
-        self.tray.show()
-
-    def create_action(self, text, slot):
-        action = QAction(text, self)
-        action.triggered.connect(slot)
-        return action
-
-    def show_window(self):
-        self.show()
-        self.activateWindow()
-
-    def quit_app(self):
-        if self.worker_thread and self.worker_thread.isRunning():
-            self.worker_thread.quit()
-            self.worker_thread.wait()
-
-        self.tray.hide()
-        QApplication.quit()
-
-    def tray_clicked(self, reason):
-        if reason == QSystemTrayIcon.ActivationReason.Trigger:
-            if self.isVisible():
-                self.hide()
-            else:
-                self.show_window()
-
     def closeEvent(self, event):
         event.ignore()
         self.hide()
 
-    def check_updates(self):
-        if self.is_busy:
-            return
-
-        self.start_task(
-            lambda progress: self.injector.update(progress),
-            after_fn=lambda success, msg: self.finish_update(success, msg)
-        )
-
-    def open_folder(self):
-        if BAKKESMOD_LOCATION.exists():
-            QDesktopServices.openUrl(QUrl.fromLocalFile(str(BAKKESMOD_LOCATION)))
-        else:
-            self.set_status("bakkesmod folder not found", "error")
-
-    def inject_clicked(self):
-        if self.is_busy:
-            return
-
-        self.start_task(
-            lambda progress: self.injector.inject(progress),
-            after_fn=lambda success, msg: self.finish_injection(success, msg)
-        )
-
-    def start_task(self, task_fn, after_fn=None):
-        self.show_loading_state()
-
-        self.worker_thread = WorkerThread(task_fn)
-        self.worker_thread.progress_update.connect(self.update_progress)
-        self.worker_thread.finished.connect(
-            lambda success, msg: self.task_finished(success, msg, after_fn)
-        )
-        self.worker_thread.start()
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.tray.window_hidden()
 
     def update_progress(self, message, percentage):
-        if percentage == -2:
-            self.set_status(message, "info")
-            return
-
-        self.show_loading_state()
-        self.progress_text.setText(message)
+        # only touches the label and the bar
+        if self.progress_text.text() != message:
+            self.progress_text.setText(message)
 
-        if percentage == -1:
+        if percentage == INDETERMINATE:
             self.progress_bar.setRange(0, 0)
-        else:
-            self.progress_bar.setRange(0, 100)
-            self.progress_bar.setValue(percentage)
-
-    def task_finished(self, success, message, after_fn):
-        if after_fn:
-            after_fn(success, message)
-        else:
-            self.show_idle_state()
-
-    def finish_update(self, success, message):
-        self.show_idle_state()
-        if success:
-            self.set_status(message or "up to date", "success")
-        else:
-            self.set_status(message or "update failed", "error")
+            return
 
-        self._initial_process_check()
+        if self.progress_bar.maximum() != 100:
+            self.progress_bar.setRange(0, 100)
 
-    def finish_injection(self, success, message):
-        self.injector.injected = success
-        self.show_idle_state()
-
-        if success:
-            self.on_process_state_changed(self.injector.rl_running)
-        else:
-            self.set_status(message or "injection failed", "error")
+        self.progress_bar.setValue(percentage)
 
     def set_status(self, text, state="normal"):
         self.status_label.setText(text)
         self.status_label.setProperty("state", state)
         self.status_label.style().unpolish(self.status_label)
         self.status_label.style().polish(self.status_label)
+
+def run_app(tray_only: bool = False) -> int:
+    app = QApplication.instance() or QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)
+
+    # the local keeps the tray alive for as long as the event loop runs
+    tray = BakkesTray(show_window=not tray_only)
+    code = app.exec()
+    tray.deleteLater()
+    return code
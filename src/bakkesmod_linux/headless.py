@@ -0,0 +1,243 @@
+import queue
+import signal
+import sys
+import threading
+
+from contextlib import redirect_stdout
+from bakkesmod_linux.autoinject import AutoInjector
+from bakkesmod_linux.bakkesmod import RL_PROCESS_NAME, BakkesHelper
+from bakkesmod_linux.constants import BAKKESMOD_GITHUB_API, BAKKESMOD_LOCATION
+from bakkesmod_linux.progress import JsonProgressReporter, ProgressReporter
+from bakkesmod_linux.store import KIND_BAKKESMOD
+from bakkesmod_linux.timing import STATS_RECENT, TIMINGS_FILE, load_history, summarize
+from bakkesmod_linux.watcher import PROCESS_EXITED, PROCESS_STARTED
+
+class HeadlessRunner:
+    # drives BakkesHelper without qt, for scripts and the systemd service
+    def __init__(self, json_lines: bool = False, component: str = KIND_BAKKESMOD, version: str | None = None):
+        self.json_lines = json_lines
+        # what --rollback and --use-version act on
+        self.component = component
+        self.version = version
+        self.helper = BakkesHelper()
+        self._events: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._out = sys.stdout
+        self._workers: list[threading.Thread] = []
+
+    def _reporter(self) -> ProgressReporter:
+        return JsonProgressReporter(self._out) if self.json_lines else ProgressReporter()
+
+    def _run_task(self, task) -> bool:
+        progress = self._reporter()
+
+        # a failed attempt must not take the daemon down with it
+        try:
+            task(progress)
+        except Exception as e:
+            progress.error(str(e))
+
+        return not progress._has_error
+
+    def _report(self, kind: str, message: str, **fields):
+        if self.json_lines:
+            JsonProgressReporter(self._out).write_event(kind, message=message, **fields)
+        else:
+            print(f"[{kind}] {message}")
+
+    def run(self, command: str) -> int:
+        # in json mode stdout carries only events, helper logs go to stderr
+        if not self.json_lines:
+            return self._dispatch(command)
+
+        with redirect_stdout(sys.stderr):
+            return self._dispatch(command)
+
+    def _dispatch(self, command: str) -> int:
+        if command == "status":
+            return self.status()
+
+        if command == "stats":
+            return self.stats()
+
+        if command == "verify":
+            return self.verify()
+
+        if command == "update":
+            return 0 if self._run_task(lambda progress: self.helper.update(progress, force=True)) else 1
+
+        if command == "rollback":
+            return 0 if self._run_task(lambda progress: self.helper.rollback(progress, self.component)) else 1
+
+        if command == "use-version" and self.version:
+            version = self.version
+            return 0 if self._run_task(lambda progress: self.helper.use_version(progress, version, self.component)) else 1
+
+        if command == "inject":
+            return self.inject_once()
+
+        return self.daemon()
+
+    def status(self) -> int:
+        self.helper.check_rl_process()
+        config = self.helper.config
+        current = config.get_bakkesmod_version()
+        # status runs without the instance lock, so it only reads what the
+        # last update check cached instead of hitting github and writing
+        latest = config.get_github_release_info(BAKKESMOD_GITHUB_API, "bakkesmod.zip", cached_only=True)
+
+        info = {
+            "bakkesmod_version": current,
+            "injector_version": config.get_injector_version(),
+            "update_available": latest["version"] if latest and latest["version"] != current else None,
+            "pinned": config.get(f"{KIND_BAKKESMOD}_pinned"),
+            "cache": str(BAKKESMOD_LOCATION),
+            "game_running": self.helper.rl_running
+        }
+
+        instances = [
+            {
+                "pid": session.pid,
+                "wine_prefix": session.wine_prefix,
+                "prefix_path": str(session.bakkesmod_path) if session.bakkesmod_path else None
+            }
+            for session in self.helper.sessions.all()
+        ]
+
+        versions = [
+            {"kind": version.kind, "version": version.version, "current": version.current, "last_used": round(version.last_used)}
+            for version in self.helper.store.versions()
+        ]
+
+        if self.json_lines:
+            JsonProgressReporter(self._out).write_event("state", **info, instances=instances, versions=versions)
+        else:
+            for key, value in info.items():
+                print(f"{key}: {value if value is not None else '-'}")
+
+            for instance in instances:
+                print(f"instance {instance['pid']}: {instance['wine_prefix']} -> {instance['prefix_path'] or '-'}")
+
+            for version in versions:
+                print(f"stored {version['kind']}: {version['version']}{' (active)' if version['current'] else ''}")
+
+        return 0
+
+    def stats(self) -> int:
+        records = load_history(STATS_RECENT)
+        summary = summarize(records)
+
+        if self.json_lines:
+            JsonProgressReporter(self._out).write_event("stats", records=len(records), phases=summary)
+            return 0
+
+        if not summary:
+            print(f"no timings recorded yet ({TIMINGS_FILE})")
+            return 0
+
+        print(f"last {len(records)} timings from {TIMINGS_FILE}\n")
+        print(f"{'phase':<32} {'count':>6} {'failed':>6} {'p50 (ms)':>10} {'p95 (ms)':>10} {'max (ms)':>10}")
+
+        for phase in summary:
+            print(
+                f"{phase['span']:<32} {phase['count']:>6} {phase['failed']:>6} "
+                f"{phase['p50_ms']:>10.1f} {phase['p95_ms']:>10.1f} {phase['max_ms']:>10.1f}"
+            )
+
+        return 0
+
+    def verify(self) -> int:
+        from bakkesmod_linux.verify import verify_install
+
+        report = verify_install(self.helper.store, self.helper.known_prefixes())
+        problems = [problem._asdict() for problem in report.problems]
+
+        if self.json_lines:
+            JsonProgressReporter(self._out).write_event(
+                "verify",
+                ok=report.ok,
+                checked=report.checked,
+                hashed=report.hashed,
+                ms=round(report.seconds * 1000, 3),
+                problems=problems
+            )
+        else:
+            print(
+                f"verified {report.checked} files in {report.seconds * 1000:.1f} ms "
+                f"({report.hashed} hashed, the rest unchanged since the last check)"
+            )
+
+            for problem in report.problems:
+                print(f"{problem.area}: {problem.path}: {problem.problem}")
+
+            print("everything intact" if report.ok else f"{len(report.problems)} problems found")
+
+        return 0 if report.ok else 1
+
+    def inject_once(self) -> int:
+        self.helper.check_rl_process()
+
+        if not self.helper.rl_running:
+            self._report("error", f"{RL_PROCESS_NAME} is not running")
+            return 1
+
+        if not self._run_task(self.helper.startup):
+            return 1
+
+        return 0 if self._run_task(self.helper.inject_all) else 1
+
+    def daemon(self) -> int:
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: self.stop())
+
+        self._run_task(self.helper.startup)
+
+        self.helper.set_process_callback(self._events.put)
+        self.helper.start_watcher()
+        self._report("status", f"waiting for {RL_PROCESS_NAME}...")
+
+        try:
+            while not self._stop.is_set():
+                try:
+                    event = self._events.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+
+                if event.kind == PROCESS_STARTED:
+                    self._report("status", f"game detected (pid {event.pid})", pid=event.pid)
+                    self._auto_inject(event.pid)
+                elif event.kind == PROCESS_EXITED:
+                    self._report("status", f"game exited (pid {event.pid})", pid=event.pid)
+        finally:
+            for worker in self._workers:
+                worker.join(timeout=5)
+
+            self.helper.stop_watcher()
+
+        return 0
+
+    def _auto_inject(self, pid: int):
+        # each instance waits for its own readiness, so one slow game
+        # doesn't hold up the others
+        injector = AutoInjector(self.helper, self._stop)
+        thread = threading.Thread(
+            target=self._run_task,
+            args=(lambda progress: self._inject_when_ready(injector, pid, progress),),
+            name=f"auto-inject-{pid}",
+            daemon=True
+        )
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        self._workers.append(thread)
+        thread.start()
+
+    def _inject_when_ready(self, injector: AutoInjector, pid: int, progress):
+        # the path lookup can start wine, the game is still loading meanwhile
+        self.helper.prefetch_install_path(pid)
+        injector.run(pid, progress)
+
+    def stop(self):
+        self._stop.set()
+        self.helper.cancel()
+
+def run_headless(command: str, json_lines: bool = False, component: str = KIND_BAKKESMOD, version: str | None = None) -> int:
+    return HeadlessRunner(json_lines, component, version).run(command)
@@ -3,6 +3,8 @@
 #include <cwchar>
 #include <filesystem>
 #include <fstream>
+#include <iostream>
+#include <string>
 #include <processthreadsapi.h>
 #include <shlobj.h>
 #include <tlhelp32.h>
@@ -10,6 +12,13 @@
 
 namespace fs = std::filesystem;
 
+// the python side greps the binary for this before using --serve,
+// older injectors would treat an unknown argument as "inject"
+static const char* SERVE_PROTOCOL = "bkl-serve/1";
+
+// message boxes block until clicked, never show them while serving
+static bool interactive = true;
+
 enum exit_code : int {
     EXIT_OK = 0,
     ERR_DLL_NOT_FOUND = 1,
@@ -18,9 +27,39 @@ enum exit_code : int {
 };
 
 void show_msgbox(const char* title, const char* message) {
+    if (!interactive) {
+        return;
+    }
+
     MessageBoxA(NULL, message, title, MB_OK | MB_ICONERROR);
 }
 
+bool has_module(DWORD pid, const char* module_name) {
+    HANDLE snapshot = CreateToolhelp32Snapshot(TH32CS_SNAPMODULE | TH32CS_SNAPMODULE32, pid);
+    if (snapshot == INVALID_HANDLE_VALUE) {
+        return false;
+    }
+
+    MODULEENTRY32 entry = {};
+    entry.dwSize = sizeof(MODULEENTRY32);
+
+    bool found = false;
+
+    if (Module32First(snapshot, &entry)) {
+        do {
+            if (_stricmp(module_name, entry.szModule) == 0) {
+                found = true;
+                break;
+            }
+        } while (Module32Next(snapshot, &entry));
+    }
+
+    CloseHandle(snapshot);
+    return found;
+}
+
+// several instances can share a prefix (and its wineserver), so pick the
+// first one that doesn't have bakkesmod loaded yet
 DWORD find_process_id(const char* process_name) {
     HANDLE snapshot = CreateToolhelp32Snapshot(TH32CS_SNAPPROCESS, 0);
     if (snapshot == INVALID_HANDLE_VALUE) {
@@ -36,7 +75,7 @@ DWORD find_process_id(const char* process_name) {
     }
 
     do {
-        if (strcmp(process_name, entry.szExeFile) == 0) {
+        if (strcmp(process_name, entry.szExeFile) == 0 && !has_module(entry.th32ProcessID, "bakkesmod.dll")) {
             DWORD pid = entry.th32ProcessID;
             CloseHandle(snapshot);
             return pid;
@@ -121,7 +160,66 @@ exit_code inject_dll(const std::wstring& dll_path) {
     return exit_status != 0 ? EXIT_OK : ERR_INJECT_FAILED;
 }
 
+fs::path get_dll_path() {
+    return get_app_data() / "bakkesmod/bakkesmod/dll/bakkesmod.dll";
+}
+
+exit_code inject_bakkesmod() {
+    fs::path dll_path = get_dll_path();
+
+    if (!fs::exists(dll_path)) {
+        show_msgbox("DLL nt found", "could not find bakkesmod.dll...");
+        return ERR_DLL_NOT_FOUND;
+    }
+
+    return inject_dll(dll_path.wstring());
+}
+
+void reply(int code, const std::string& payload) {
+    std::cout << code << " " << payload << "\n";
+    std::cout.flush();
+}
+
+// one request per line on stdin, one "<code> <payload>" line back on stdout,
+// so a single wine process can serve a whole game session
+int serve() {
+    interactive = false;
+    std::string line;
+
+    while (std::getline(std::cin, line)) {
+        if (!line.empty() && line.back() == '\r') {
+            line.pop_back();
+        }
+
+        if (line == "ping") {
+            reply(EXIT_OK, SERVE_PROTOCOL);
+        } else if (line == "get-path") {
+            fs::path app_data = get_app_data();
+
+            if (app_data.empty()) {
+                reply(ERR_DLL_NOT_FOUND, "appdata not found");
+            } else {
+                reply(EXIT_OK, app_data.string());
+            }
+        } else if (line == "inject") {
+            exit_code code = inject_bakkesmod();
+            reply(code, code == EXIT_OK ? "injected" : "failed");
+        } else if (line == "quit") {
+            reply(EXIT_OK, "bye");
+            break;
+        } else {
+            reply(ERR_INJECT_FAILED, "unknown command");
+        }
+    }
+
+    return EXIT_OK;
+}
+
 int main(int argc, char* argv[]) {
+    if (argc > 1 && strcmp(argv[1], "--serve") == 0) {
+        return serve();
+    }
+
     if (argc > 1 && strcmp(argv[1], "--get-path") == 0) {
         fs::path app_data = get_app_data();
 
@@ -139,12 +237,5 @@ int main(int argc, char* argv[]) {
         return 0;
     }
 
-    fs::path dll_path = get_app_data() / "bakkesmod/bakkesmod/dll/bakkesmod.dll";
-
-    if (!fs::exists(dll_path)) {
-        show_msgbox("DLL nt found", "could not find bakkesmod.dll...");
-        return ERR_DLL_NOT_FOUND;
-    }
-
-    return inject_dll(dll_path.wstring());
+    return inject_bakkesmod();
 }
@@ -0,0 +1,232 @@
+import os
+import select
+import shutil
+import subprocess
+import threading
+import time
+
+from pathlib import Path
+from bakkesmod_linux.sync import hash_file
+from bakkesmod_linux.timing import span
+
+# must match SERVE_PROTOCOL in injector/main.cpp
+SERVE_PROTOCOL = "bkl-serve/1"
+
+# the first reply has to wait for wine to boot inside the prefix
+START_TIMEOUT = 60.0
+REQUEST_TIMEOUT = 30.0
+# LoadLibrary in the game can take a while on a cold cache
+INJECT_TIMEOUT = 120.0
+
+STAGED_DIR = "drive_c/bakkesmod_linux"
+
+class InjectorError(Exception):
+    pass
+
+class InjectorTransport:
+    # a line based request/response channel to an injector helper
+    def request(self, command: str, timeout: float = REQUEST_TIMEOUT) -> tuple[int, str]:
+        raise NotImplementedError
+
+    @property
+    def alive(self) -> bool:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+class ProcessTransport(InjectorTransport):
+    # talks to "<argv> --serve" over its stdin/stdout
+    def __init__(self, argv: list[str], env: dict[str, str] | None = None):
+        self.argv = argv
+        self._lock = threading.Lock()
+        self._buffer = b""
+        self._process = subprocess.Popen(
+            argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+            start_new_session=True
+        )
+
+    @property
+    def alive(self) -> bool:
+        return self._process.poll() is None
+
+    def request(self, command: str, timeout: float = REQUEST_TIMEOUT) -> tuple[int, str]:
+        with self._lock:
+            if not self.alive:
+                raise InjectorError(f"injector exited with code {self._process.returncode}")
+
+            try:
+                self._process.stdin.write(f"{command}\n".encode())
+                self._process.stdin.flush()
+            except OSError as e:
+                raise InjectorError(f"injector stopped accepting commands: {e}")
+
+            deadline = time.monotonic() + timeout
+
+            while True:
+                try:
+                    line = self._read_line(deadline)
+                except InjectorError:
+                    # a late reply would be taken as the answer to the next command
+                    self._kill()
+                    raise
+
+                # wine and the game libraries may print their own noise on stdout
+                code, _, payload = line.partition(" ")
+
+                if code.lstrip("-").isdigit():
+                    return int(code), payload
+
+                print(f"injector: {line}")
+
+    def _read_line(self, deadline: float) -> str:
+        fd = self._process.stdout.fileno()
+
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                raise InjectorError("injector did not answer in time")
+
+            ready, _, _ = select.select([fd], [], [], remaining)
+
+            if not ready:
+                continue
+
+            data = os.read(fd, 4096)
+
+            if not data:
+                raise InjectorError("injector closed its output")
+
+            self._buffer += data
+
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line.decode("utf-8", errors="replace").rstrip("\r")
+
+    def _kill(self):
+        if self.alive:
+            self._process.kill()
+            self._process.wait()
+
+    def close(self) -> None:
+        if not self.alive:
+            return
+
+        try:
+            self._process.stdin.close()
+            self._process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self._kill()
+
+def supports_serve(path: Path) -> bool:
+    # injectors from before --serve would inject on any unknown argument
+    try:
+        return SERVE_PROTOCOL.encode() in path.read_bytes()
+    except OSError:
+        return False
+
+class StagedInjector:
+    # keeps one copy of the injector inside the prefix instead of copying
+    # and deleting it for every call, refreshed only when the hash differs
+    def __init__(self, prefix: Path, source: Path):
+        self.source = source
+        self.path = prefix / STAGED_DIR / source.name
+        self.serve = False
+        self._verified: tuple[int, int, int, int] | None = None
+
+    def _stat_key(self) -> tuple[int, int, int, int]:
+        src = self.source.stat()
+        dst = self.path.stat()
+        return src.st_size, src.st_mtime_ns, dst.st_size, dst.st_mtime_ns
+
+    def ensure(self) -> Path:
+        try:
+            if self._verified == self._stat_key():
+                return self.path
+        except OSError:
+            pass
+
+        if not self.path.exists() or hash_file(self.path) != hash_file(self.source):
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+            shutil.copy2(self.source, tmp_path)
+            os.replace(tmp_path, self.path)
+            print(f"staged injector at {self.path}")
+
+        self.serve = supports_serve(self.path)
+        self._verified = self._stat_key()
+        return self.path
+
+class InjectorSession:
+    # one long lived injector per game session, commands reuse the same
+    # wine process instead of paying wine startup every time
+    def __init__(self, transport_factory):
+        self._factory = transport_factory
+        self._transport: InjectorTransport | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> InjectorTransport:
+        if self._transport is not None and self._transport.alive:
+            return self._transport
+
+        if self._transport is not None:
+            print("injector helper exited, restarting it")
+
+        started = time.monotonic()
+
+        # wine startup inside the prefix, usually the slowest part
+        with span("injector.start"):
+            try:
+                transport = self._factory()
+            except OSError as e:
+                raise InjectorError(f"failed to start injector: {e}")
+
+            try:
+                code, payload = transport.request("ping", START_TIMEOUT)
+            except InjectorError:
+                transport.close()
+                raise
+
+            if code != 0 or payload != SERVE_PROTOCOL:
+                transport.close()
+                raise InjectorError(f"unexpected injector handshake: {code} {payload}")
+
+        print(f"injector helper ready in {time.monotonic() - started:.2f}s")
+        self._transport = transport
+        return transport
+
+    def request(self, command: str, timeout: float = REQUEST_TIMEOUT) -> tuple[int, str]:
+        with self._lock:
+            transport = self._connect()
+
+            with span(f"injector.{command}") as fields:
+                code, payload = transport.request(command, timeout)
+                fields["code"] = code
+                fields["ok"] = code == 0
+                return code, payload
+
+    def ping(self) -> bool:
+        try:
+            return self.request("ping")[0] == 0
+        except InjectorError:
+            return False
+
+    def get_path(self) -> str:
+        code, payload = self.request("get-path")
+
+        if code != 0:
+            raise InjectorError(f"get-path failed (exit code {code}): {payload}")
+
+        return payload
+
+    def inject(self) -> int:
+        return self.request("inject", INJECT_TIMEOUT)[0]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._transport is not None:
+                self._transport.close()
+                self._transport = None
@@ -0,0 +1,46 @@
+import threading
+
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+from bakkesmod_linux.timing import record
+
+# requests is imported on first use, most launches never touch the network
+if TYPE_CHECKING:
+    import requests
+
+USER_AGENT = "bakkesmod-linux"
+POOL_SIZE = 8
+
+_session: "requests.Session | None" = None
+_session_lock = threading.Lock()
+
+def _record_response(response, *args, **kwargs):
+    # elapsed covers sending the request until the headers arrived,
+    # streamed bodies are timed by the phase that reads them
+    record(
+        "http",
+        response.elapsed.total_seconds() * 1000,
+        ok=response.status_code < 400,
+        host=urlsplit(response.url).hostname,
+        method=response.request.method,
+        status=response.status_code
+    )
+
+def get_session() -> "requests.Session":
+    # one keep-alive session for the github api and asset downloads
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            session.hooks["response"].append(_record_response)
+            _session = session
+
+        return _session
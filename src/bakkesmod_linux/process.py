@@ -0,0 +1,199 @@
+import os
+import selectors
+import shlex
+import signal
+import subprocess
+import threading
+import time
+
+from collections import deque
+from typing import Callable, NamedTuple
+from bakkesmod_linux.timing import span
+
+# lines of output kept per call, older lines are dropped
+OUTPUT_LINES = 200
+# a line without a newline is cut at this size so a chatty child can't grow memory
+MAX_LINE_BYTES = 64 * 1024
+# how long a process group gets to exit after SIGTERM before SIGKILL
+KILL_GRACE = 3.0
+# how often the timeout and cancel event are checked while waiting on output
+POLL_INTERVAL = 0.1
+# output still read after the process exited, before the pipes are abandoned
+DRAIN_TIMEOUT = 0.5
+
+STDOUT = "stdout"
+STDERR = "stderr"
+
+LineCallback = Callable[[str, str], None]
+
+class ProcessResult(NamedTuple):
+    code: int
+    # the last OUTPUT_LINES lines of stdout and stderr, interleaved as they arrived
+    output: list[str]
+    timed_out: bool = False
+    cancelled: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.code == 0 and not self.timed_out and not self.cancelled
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.output)
+
+class _LineReader:
+    def __init__(self, name: str, on_line: Callable[[str, str], None]):
+        self.name = name
+        self._on_line = on_line
+        self._partial = b""
+
+    def feed(self, data: bytes):
+        self._partial += data
+
+        while True:
+            end = self._partial.find(b"\n")
+
+            if end < 0:
+                break
+
+            line, self._partial = self._partial[:end], self._partial[end + 1:]
+            self._emit(line)
+
+        if len(self._partial) >= MAX_LINE_BYTES:
+            line, self._partial = self._partial[:MAX_LINE_BYTES], self._partial[MAX_LINE_BYTES:]
+            self._emit(line)
+
+    def close(self):
+        if self._partial:
+            self._emit(self._partial)
+            self._partial = b""
+
+    def _emit(self, line: bytes):
+        self._on_line(self.name, line.decode("utf-8", errors="replace").rstrip("\r"))
+
+def _kill_group(process: subprocess.Popen, grace: float):
+    # the child leads its own session, so this takes wine's helpers with it
+    # without touching the game or anything else we didn't start
+    for sig, wait in ((signal.SIGTERM, grace), (signal.SIGKILL, None)):
+        try:
+            os.killpg(process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            return
+
+        try:
+            process.wait(timeout=wait)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+def run_process(
+    argv: list[str],
+    env: dict[str, str] | None = None,
+    timeout: float | None = None,
+    cancel: threading.Event | None = None,
+    on_line: LineCallback | None = None,
+    max_lines: int = OUTPUT_LINES,
+) -> ProcessResult:
+    # runs argv without a shell and streams its output line by line,
+    # the whole process group is killed on timeout or cancellation
+    print(f"exec: {shlex.join(argv)}")
+    output: deque[str] = deque(maxlen=max_lines)
+
+    def handle_line(stream: str, line: str):
+        output.append(line)
+
+        if on_line:
+            on_line(stream, line)
+
+    with span("subprocess", program=os.path.basename(argv[0])) as fields:
+        try:
+            process = subprocess.Popen(
+                argv,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env,
+                start_new_session=True
+            )
+        except OSError as e:
+            fields["ok"] = False
+            fields["error"] = type(e).__name__
+            print(f"failed to start {argv[0]}: {e}")
+            return ProcessResult(127, [str(e)])
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        timed_out = cancelled = False
+
+        with selectors.DefaultSelector() as selector:
+            selector.register(process.stdout, selectors.EVENT_READ, _LineReader(STDOUT, handle_line))
+            selector.register(process.stderr, selectors.EVENT_READ, _LineReader(STDERR, handle_line))
+
+            stopped_at = None
+
+            while selector.get_map():
+                if stopped_at is None:
+                    if cancel is not None and cancel.is_set():
+                        cancelled = True
+                    elif deadline is not None and time.monotonic() >= deadline:
+                        timed_out = True
+
+                    if timed_out or cancelled:
+                        _kill_group(process, KILL_GRACE)
+
+                    if process.poll() is not None:
+                        stopped_at = time.monotonic()
+                elif time.monotonic() - stopped_at >= DRAIN_TIMEOUT:
+                    # wineserver or another grandchild can inherit the pipes and
+                    # keep them open long after the process we ran is gone
+                    for key in list(selector.get_map().values()):
+                        key.data.close()
+                        selector.unregister(key.fileobj)
+                        key.fileobj.close()
+
+                    break
+
+                for key, _ in selector.select(POLL_INTERVAL):
+                    data = os.read(key.fd, 65536)
+
+                    if data:
+                        key.data.feed(data)
+                        continue
+
+                    key.data.close()
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+
+        code = process.wait()
+
+        fields["code"] = code
+        fields["ok"] = code == 0 and not timed_out and not cancelled
+
+        if timed_out:
+            fields["timed_out"] = True
+            print(f"{argv[0]} timed out after {timeout:g}s, killed")
+        elif cancelled:
+            fields["cancelled"] = True
+            print(f"{argv[0]} cancelled, killed")
+
+    return ProcessResult(code, list(output), timed_out, cancelled)
+
+def spawn_detached(argv: list[str], env: dict[str, str] | None = None) -> bool:
+    # fire and forget, the child outlives us and its output goes nowhere
+    print(f"exec: {shlex.join(argv)}")
+
+    with span("subprocess.spawn", program=os.path.basename(argv[0])) as fields:
+        try:
+            subprocess.Popen(
+                argv,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                env=env,
+                start_new_session=True
+            )
+        except OSError as e:
+            fields["ok"] = False
+            print(f"failed to start {argv[0]}: {e}")
+            return False
+
+    return True
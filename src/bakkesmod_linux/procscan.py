@@ -0,0 +1,176 @@
+import os
+import threading
+
+from typing import NamedTuple
+
+# comm is truncated by the kernel to 15 chars (TASK_COMM_LEN - 1)
+COMM_LEN = 15
+
+class ProcInfo(NamedTuple):
+    pid: int
+    ppid: int
+    starttime: int
+    comm: str
+
+class _CacheEntry:
+    __slots__ = ("info", "matches", "env")
+
+    def __init__(self, info: ProcInfo):
+        self.info = info
+        self.matches: dict[str, bool] = {}
+        self.env: dict[str, str] | None = None
+
+def parse_environ(data: bytes) -> dict[str, str]:
+    env: dict[str, str] = {}
+
+    for entry in data.decode("utf-8", errors="ignore").split("\0"):
+        if "=" in entry:
+            key, value = entry.split("=", 1)
+            env[key] = value
+
+    return env
+
+class ProcessScanner:
+    def __init__(self, proc_root: str = "/proc"):
+        self.proc_root = proc_root
+        self._cache: dict[int, _CacheEntry] = {}
+        self._lock = threading.Lock()
+
+    def find_all(self, process_name: str) -> list[tuple[int, dict[str, str]]]:
+        with self._lock:
+            procs = self._read_all()
+            matched = self._match(procs, process_name)
+
+            if not matched:
+                return []
+
+            results = []
+
+            for pid in self._leaves(procs, matched):
+                env = self._read_env(pid)
+                if env is not None:
+                    results.append((pid, env))
+
+            # game processes carry the wine env, wrappers without it are noise
+            wine = [result for result in results if "WINEPREFIX" in result[1]]
+            return wine or results
+
+    def find(self, process_name: str) -> tuple[int, dict[str, str]] | None:
+        results = self.find_all(process_name)
+        return results[0] if results else None
+
+    def _read_all(self) -> dict[int, ProcInfo]:
+        procs: dict[int, ProcInfo] = {}
+        cache: dict[int, _CacheEntry] = {}
+
+        try:
+            entries = os.scandir(self.proc_root)
+        except OSError:
+            return procs
+
+        with entries:
+            for entry in entries:
+                if not entry.name.isdigit():
+                    continue
+
+                info = self._read_stat(int(entry.name))
+
+                if info is None:
+                    continue
+
+                procs[info.pid] = info
+                cached = self._cache.get(info.pid)
+
+                # pid reuse changes starttime, exec changes comm
+                if cached is None or cached.info != info:
+                    cached = _CacheEntry(info)
+
+                cache[info.pid] = cached
+
+        # drop pids that went away
+        self._cache = cache
+        return procs
+
+    def _read_stat(self, pid: int) -> ProcInfo | None:
+        try:
+            with open(f"{self.proc_root}/{pid}/stat", "rb") as f:
+                data = f.read().decode("utf-8", errors="ignore")
+        except OSError:
+            return None
+
+        # comm may contain spaces and parens, it ends at the last ")"
+        start = data.find("(")
+        end = data.rfind(")")
+
+        if start == -1 or end == -1:
+            return None
+
+        fields = data[end + 2:].split()
+
+        try:
+            return ProcInfo(pid, int(fields[1]), int(fields[19]), data[start + 1:end])
+        except (IndexError, ValueError):
+            return None
+
+    def _match(self, procs: dict[int, ProcInfo], process_name: str) -> list[int]:
+        # cheap pass: wine renames the game process, so comm usually matches
+        comm = process_name[:COMM_LEN]
+        candidates = [pid for pid, info in procs.items() if info.comm == comm]
+
+        # otherwise fall back to pgrep -f semantics on the full cmdline
+        if not candidates:
+            candidates = list(procs)
+
+        return [pid for pid in candidates if self._cmdline_matches(pid, process_name)]
+
+    def _cmdline_matches(self, pid: int, process_name: str) -> bool:
+        cached = self._cache[pid]
+        result = cached.matches.get(process_name)
+
+        if result is None:
+            try:
+                with open(f"{self.proc_root}/{pid}/cmdline", "rb") as f:
+                    result = process_name.encode() in f.read()
+            except OSError:
+                return False
+
+            cached.matches[process_name] = result
+
+        return result
+
+    def _leaves(self, procs: dict[int, ProcInfo], matched: list[int]) -> list[int]:
+        # wrappers (umu-run, proton, pv-adverb...) are ancestors of the real game,
+        # so any match with a matching descendant is not the process we want
+        matched_set = set(matched)
+        wrappers: set[int] = set()
+
+        for pid in matched:
+            seen = {pid}
+            parent = procs[pid].ppid
+
+            while parent in procs and parent not in seen:
+                if parent in matched_set:
+                    wrappers.add(parent)
+                seen.add(parent)
+                parent = procs[parent].ppid
+
+        leaves = [pid for pid in matched if pid not in wrappers]
+        leaves.sort(key=lambda pid: procs[pid].starttime)
+        return leaves
+
+    def _read_env(self, pid: int) -> dict[str, str] | None:
+        cached = self._cache[pid]
+
+        if cached.env is None:
+            try:
+                with open(f"{self.proc_root}/{pid}/environ", "rb") as f:
+                    cached.env = parse_environ(f.read())
+            except OSError:
+                return None
+
+        return dict(cached.env)
+
+_scanner = ProcessScanner()
+
+def get_scanner() -> ProcessScanner:
+    return _scanner
@@ -0,0 +1,175 @@
+import json
+import sys
+import threading
+import time
+
+from typing import Callable, TextIO
+
+# percentage values the gui treats specially
+STATUS_ONLY = -2
+INDETERMINATE = -1
+
+# progress updates reach the callback at most this often (30 Hz), status,
+# done and error always go through
+FRAME_INTERVAL = 1 / 30
+# progress lines are logged at most this often, the rest is coalesced
+LOG_INTERVAL = 1.0
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+
+    if seconds < 60:
+        return f"{seconds}s"
+
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+
+    return f"{seconds // 3600}h{seconds // 60 % 60:02d}m"
+
+class TransferMeter:
+    # throughput and eta for one transfer, averaged since it started so a
+    # resumed download doesn't count the bytes that were already there
+    def __init__(self, total: int, done: int = 0):
+        self.total = total
+        self.done = done
+        self.start_bytes = done
+        self.started = time.monotonic()
+        self._percentage: int | None = None
+
+    @property
+    def percentage(self) -> int:
+        return min(int(self.done / self.total * 100), 100) if self.total > 0 else 0
+
+    def add(self, amount: int) -> bool:
+        # true when the whole percentage moved, only then is it worth reporting
+        self.done += amount
+        percentage = self.percentage
+
+        if percentage == self._percentage:
+            return False
+
+        self._percentage = percentage
+        return True
+
+    def rate(self) -> float:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return (self.done - self.start_bytes) / elapsed
+
+    def eta(self) -> float | None:
+        rate = self.rate()
+        return (self.total - self.done) / rate if rate > 0 and self.total > 0 else None
+
+    def describe(self, label: str) -> str:
+        mib = 1024 * 1024
+        details = f"{self.done / mib:.1f}/{self.total / mib:.1f} MiB, {self.rate() / mib:.1f} MiB/s"
+        eta = self.eta()
+
+        if eta is not None and self.done < self.total:
+            details += f", {format_duration(eta)} left"
+
+        return f"{label} ({details})"
+
+class ProgressReporter:
+    def __init__(self, callback: Callable[[str, int], None] | None = None):
+        self._callback = callback
+        self._has_error = False
+        self._last_message = ""
+        # what the last emitted progress update showed, for coalescing
+        self._shown: tuple[str, int] | None = None
+        self._shown_at = 0.0
+        self._logged_at = 0.0
+        self._lock = threading.Lock()
+
+    def _format(self, kind: str, message: str, percentage: int) -> str | None:
+        if kind == "progress" and percentage == INDETERMINATE:
+            return f"[progress] {message}"
+
+        if kind == "progress":
+            return f"[progress] {message} ({percentage}%)" if message else None
+
+        if kind == "done":
+            return f"[done] {message}" if message else None
+
+        return f"[{kind}] {message}"
+
+    def _should_log(self, kind: str, percentage: int) -> bool:
+        # a busy progress bar would otherwise log a line per frame
+        if kind != "progress" or percentage < 0:
+            return True
+
+        now = time.monotonic()
+
+        if percentage < 100 and now - self._logged_at < LOG_INTERVAL:
+            return False
+
+        self._logged_at = now
+        return True
+
+    def _emit(self, kind: str, message: str, percentage: int):
+        text = self._format(kind, message, percentage)
+
+        if text is not None and self._should_log(kind, percentage):
+            print(text)
+
+        if self._callback:
+            self._callback(message, percentage)
+
+    def _coalesce(self, message: str, percentage: int) -> bool:
+        # drops updates that change nothing or come faster than the frame budget
+        now = time.monotonic()
+
+        with self._lock:
+            if self._shown == (message, percentage):
+                return False
+
+            # the last frame of a bar is never dropped
+            throttled = self._shown is not None and self._shown[1] >= 0 and percentage < 100
+
+            if throttled and now - self._shown_at < FRAME_INTERVAL:
+                return False
+
+            self._shown = (message, percentage)
+            self._shown_at = now
+            return True
+
+    def set_status_msg(self, message):
+        self._last_message = message
+        self._emit("status", message, STATUS_ONLY)
+
+    def status(self, message):
+        self._last_message = message
+
+        with self._lock:
+            self._shown = (message, INDETERMINATE)
+
+        self._emit("progress", message, INDETERMINATE)
+
+    def progress(self, message, percentage):
+        self._last_message = message
+
+        if self._coalesce(message, percentage):
+            self._emit("progress", message, percentage)
+
+    def done(self, message):
+        self._last_message = message
+        self._emit("done", message, 100)
+
+    def error(self, message):
+        self._has_error = True
+        self._last_message = message
+        self._emit("error", message, 100)
+
+class JsonProgressReporter(ProgressReporter):
+    # one json object per line, for scripts and service logs
+    def __init__(self, stream: TextIO | None = None):
+        super().__init__()
+        self._stream = stream or sys.stdout
+
+    def _emit(self, kind: str, message: str, percentage: int):
+        if self._should_log(kind, percentage):
+            self.write_event(kind, message=message, percentage=percentage if percentage >= 0 else None)
+
+    def write_event(self, kind: str, **fields):
+        record = {"time": round(time.time(), 3), "event": kind, **fields}
+        self._stream.write(json.dumps(record) + "\n")
+        self._stream.flush()
@@ -0,0 +1,125 @@
+import threading
+import time
+
+from pathlib import Path
+from bakkesmod_linux.injector_session import InjectorSession, StagedInjector
+
+class PrefixState:
+    # everything that belongs to a wine prefix rather than to a single game
+    # process, shared by all instances running in it
+    def __init__(self, path: str):
+        self.path = path
+        # serializes path resolution, prefix sync and injection in this prefix
+        self.lock = threading.RLock()
+        self.bakkesmod_path: Path | None = None
+        self.staged: StagedInjector | None = None
+        self.injector_session: InjectorSession | None = None
+
+    @property
+    def name(self) -> str:
+        return Path(self.path).name
+
+    def close_injector_session(self):
+        if self.injector_session is not None:
+            self.injector_session.close()
+            self.injector_session = None
+
+class GameSession:
+    # one running game process
+    def __init__(self, pid: int, prefix: PrefixState, loader: str, game_env: dict[str, str]):
+        self.pid = pid
+        self.prefix = prefix
+        self.loader = loader
+        self.game_env = game_env
+        self.injected = False
+        # exit code of the last injector run, None if it never ran
+        self.last_inject_code: int | None = None
+        self.started_at = time.monotonic()
+
+    @property
+    def wine_prefix(self) -> str:
+        return self.prefix.path
+
+    @property
+    def bakkesmod_path(self) -> Path | None:
+        return self.prefix.bakkesmod_path
+
+    def describe(self) -> str:
+        state = "injected" if self.injected else "ready"
+        return f"pid {self.pid} ({self.prefix.name}): {state}"
+
+class SessionRegistry:
+    def __init__(self):
+        self._sessions: dict[int, GameSession] = {}
+        self._prefixes: dict[str, PrefixState] = {}
+        self._lock = threading.Lock()
+
+    def add(self, pid: int, wine_prefix: str, loader: str, game_env: dict[str, str]) -> GameSession:
+        with self._lock:
+            session = self._sessions.get(pid)
+
+            if session is not None:
+                return session
+
+            prefix = self._prefixes.get(wine_prefix)
+
+            if prefix is None:
+                prefix = self._prefixes[wine_prefix] = PrefixState(wine_prefix)
+
+            session = self._sessions[pid] = GameSession(pid, prefix, loader, game_env)
+            return session
+
+    def remove(self, pid: int) -> GameSession | None:
+        with self._lock:
+            session = self._sessions.pop(pid, None)
+
+            if session is None:
+                return None
+
+            last_in_prefix = not self._in_use(session.prefix)
+
+        # the injector helper lives as long as a game runs in its prefix.
+        # this runs on the watcher thread, which must not wait for an
+        # inject that still holds the prefix lock
+        if last_in_prefix:
+            threading.Thread(
+                target=self._close_prefix,
+                args=(session.prefix,),
+                name=f"close-{session.prefix.name}",
+                daemon=True
+            ).start()
+
+        return session
+
+    def _in_use(self, prefix: PrefixState) -> bool:
+        return any(session.prefix is prefix for session in self._sessions.values())
+
+    def _close_prefix(self, prefix: PrefixState):
+        with prefix.lock:
+            # a game may have started in the prefix again meanwhile
+            with self._lock:
+                if self._in_use(prefix):
+                    return
+
+            prefix.close_injector_session()
+
+    def get(self, pid: int | None) -> GameSession | None:
+        with self._lock:
+            return self._sessions.get(pid) if pid is not None else None
+
+    def all(self) -> list[GameSession]:
+        with self._lock:
+            return sorted(self._sessions.values(), key=lambda session: session.started_at)
+
+    def first(self) -> GameSession | None:
+        sessions = self.all()
+        return sessions[0] if sessions else None
+
+    def prefixes(self) -> list[PrefixState]:
+        with self._lock:
+            return list(self._prefixes.values())
+
+    def close(self):
+        for prefix in self.prefixes():
+            with prefix.lock:
+                prefix.close_injector_session()
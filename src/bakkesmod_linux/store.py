@@ -0,0 +1,400 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+from collections import Counter
+from pathlib import Path
+from typing import Any, NamedTuple
+from bakkesmod_linux.archive import INSTALL_INDEX_NAME, InstallIndex, load_install_index, save_install_index
+from bakkesmod_linux.constants import BAKKESMOD_LOCATION
+from bakkesmod_linux.sync import FILE_HASHES_NAME, hash_file
+from bakkesmod_linux.utils import write_atomic
+
+STORE_DIR = BAKKESMOD_LOCATION / "store"
+
+KIND_BAKKESMOD = "bakkesmod"
+KIND_INJECTOR = "injector"
+
+# pointer name under BAKKESMOD_LOCATION -> file inside the version it points
+# at, None for the whole version directory. the pointers are symlinks that
+# are swapped with a rename, readers never see a half switched version
+POINTERS = {
+    KIND_BAKKESMOD: ("current", None),
+    KIND_INJECTOR: ("simple_injector.exe", "simple_injector.exe"),
+}
+
+# eviction defaults, overridable with the store_keep_versions and
+# store_budget_mb config keys
+KEEP_VERSIONS = 3
+BUDGET_MB = 1024
+
+STATE_VERSION = 1
+PARTIAL_PREFIX = ".partial-"
+
+class StoreError(Exception):
+    pass
+
+class VersionInfo(NamedTuple):
+    name: str
+    kind: str
+    version: str
+    installed_at: float
+    last_used: float
+    current: bool
+
+def version_name(kind: str, version: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9._-]", "_", version) or "unknown"
+    return f"{kind}-{safe}"
+
+def _same_file(a: Path, b: Path) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+class VersionStore:
+    # every release lives in versions/<kind>-<version>, its files are
+    # hardlinks into blobs/ keyed by sha256 so unchanged files between
+    # releases are stored once
+    def __init__(self, root: Path = STORE_DIR, live_root: Path = BAKKESMOD_LOCATION):
+        self.root = root
+        self.live_root = live_root
+        self.blobs = root / "blobs"
+        self.versions_dir = root / "versions"
+        self.state_path = root / "state.json"
+        self._lock = threading.RLock()
+
+    # state
+
+    def _load_state(self) -> dict[str, Any]:
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"version": STATE_VERSION, "versions": {}}
+
+        if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+            return {"version": STATE_VERSION, "versions": {}}
+
+        return state
+
+    def _save_state(self, state: dict[str, Any]):
+        self.root.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.state_path, json.dumps(state, indent=2))
+
+    # pointers
+
+    def pointer(self, kind: str) -> Path:
+        return self.live_root / POINTERS[kind][0]
+
+    def current(self, kind: str) -> str | None:
+        try:
+            target = os.readlink(self.pointer(kind))
+        except OSError:
+            return None
+
+        # versions/<name> or versions/<name>/<file>
+        parts = Path(target).parts
+        index = len(parts) - (2 if POINTERS[kind][1] else 1)
+        return parts[index] if index >= 0 and self.has(parts[index]) else None
+
+    def current_path(self, kind: str) -> Path | None:
+        name = self.current(kind)
+        return self.versions_dir / name if name else None
+
+    def has(self, name: str) -> bool:
+        return (self.versions_dir / name).is_dir()
+
+    def versions(self, kind: str | None = None) -> list[VersionInfo]:
+        state = self._load_state()["versions"]
+        current = {key: self.current(key) for key in POINTERS}
+        result = []
+
+        for name, entry in state.items():
+            if (kind and entry["kind"] != kind) or not self.has(name):
+                continue
+
+            result.append(VersionInfo(
+                name, entry["kind"], entry["version"], entry["installed_at"],
+                entry.get("last_used", entry["installed_at"]), current.get(entry["kind"]) == name
+            ))
+
+        return sorted(result, key=lambda info: info.last_used, reverse=True)
+
+    def info(self, name: str) -> VersionInfo | None:
+        return next((info for info in self.versions() if info.name == name), None)
+
+    def find(self, kind: str, version: str) -> str | None:
+        name = version_name(kind, version)
+
+        if self.has(name):
+            return name
+
+        # accept the directory name as well
+        return version if version.startswith(f"{kind}-") and self.has(version) else None
+
+    # installing
+
+    def begin(self, kind: str, version: str, resume: bool = False) -> Path:
+        # a private directory for one install, an interrupted install only
+        # ever leaves this behind. the instance lock keeps installs serial,
+        # so any other partial directory is garbage by now
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+        staging = self.versions_dir / f"{PARTIAL_PREFIX}{version_name(kind, version)}"
+
+        for entry in self.versions_dir.iterdir():
+            if entry.name.startswith(PARTIAL_PREFIX) and entry != staging:
+                shutil.rmtree(entry, ignore_errors=True)
+
+        # resuming keeps what the last attempt left, e.g. a .part download
+        if not resume:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        staging.mkdir(exist_ok=True)
+        return staging
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blobs / digest[:2] / digest[2:]
+
+    def _ingest(self, path: Path, digest: str | None = None) -> str:
+        # moves a file into the blob store, or drops it for the stored copy
+        digest = digest or hash_file(path)
+        blob = self._blob_path(digest)
+
+        if blob.exists():
+            tmp_path = path.with_name(f".{path.name}.link")
+            os.link(blob, tmp_path)
+            os.replace(tmp_path, path)
+            return digest
+
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        os.link(path, blob)
+        return digest
+
+    def link_unchanged(self, staging: Path, previous: Path, names: list[str]):
+        # members the extractor skipped because the previous version has them
+        for name in names:
+            source = previous / name
+            target = staging / name
+
+            if target.exists() or not source.is_file():
+                continue
+
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.link(source, target)
+
+    def commit(
+        self,
+        kind: str,
+        version: str,
+        staging: Path,
+        index: InstallIndex | None = None,
+        known: dict[str, str] | None = None,
+        previous: Path | None = None
+    ) -> str:
+        # known holds sha256s of the staged files computed on the way in,
+        # e.g. while downloading. files link_unchanged took from previous
+        # reuse the hash recorded there, everything else is hashed here
+        name = version_name(kind, version)
+        final = self.versions_dir / name
+        known = known or {}
+        previous_hashes = self.hashes(previous.name) if previous is not None else {}
+        hashes: dict[str, str] = {}
+
+        with self._lock:
+            for current, _, files in os.walk(staging):
+                for file in files:
+                    path = Path(current) / file
+                    rel = path.relative_to(staging).as_posix()
+
+                    if rel in known:
+                        hashes[rel] = self._ingest(path, known[rel])
+                    elif rel in previous_hashes and _same_file(path, previous / rel):
+                        # the very same inode, so already a blob
+                        hashes[rel] = previous_hashes[rel]
+                    else:
+                        hashes[rel] = self._ingest(path)
+
+            if index is not None:
+                save_install_index(staging / INSTALL_INDEX_NAME, index)
+
+            write_atomic(staging / FILE_HASHES_NAME, json.dumps(hashes, separators=(",", ":")), durable=False)
+
+            # reinstalling a version replaces it, unless it is in use
+            if final.exists():
+                if any(self.current(key) == name for key in POINTERS):
+                    shutil.rmtree(staging)
+                    return name
+
+                shutil.rmtree(final)
+
+            os.rename(staging, final)
+
+            state = self._load_state()
+            now = time.time()
+            state["versions"][name] = {"kind": kind, "version": version, "installed_at": now, "last_used": now}
+            self._save_state(state)
+
+        return name
+
+    def index(self, name: str) -> InstallIndex:
+        return load_install_index(self.versions_dir / name / INSTALL_INDEX_NAME)
+
+    def hashes(self, name: str) -> dict[str, str]:
+        try:
+            data = json.loads((self.versions_dir / name / FILE_HASHES_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+        return data if isinstance(data, dict) else {}
+
+    # switching
+
+    def activate(self, kind: str, name: str) -> Path:
+        with self._lock:
+            if not self.has(name):
+                raise StoreError(f"{name} is not in the store")
+
+            pointer = self.pointer(kind)
+            member = POINTERS[kind][1]
+            target = Path(os.path.relpath(self.versions_dir / name, self.live_root))
+
+            if member:
+                target = target / member
+
+            if pointer.is_dir() and not pointer.is_symlink():
+                raise StoreError(f"{pointer} is a directory, refusing to replace it")
+
+            if pointer.exists() and not pointer.is_symlink():
+                # a file from before the store, the new version replaces it
+                print(f"store: replacing unversioned {pointer.name}")
+
+            tmp_path = pointer.with_name(f".{pointer.name}.switch")
+            tmp_path.unlink(missing_ok=True)
+            tmp_path.symlink_to(target)
+            os.replace(tmp_path, pointer)
+
+            state = self._load_state()
+            entry = state["versions"].get(name)
+
+            if entry is not None:
+                entry["last_used"] = time.time()
+                self._save_state(state)
+
+            print(f"store: {kind} now at {name}")
+            return self.versions_dir / name
+
+    def previous(self, kind: str) -> str | None:
+        # the most recently used version that isn't the current one
+        for info in self.versions(kind):
+            if not info.current:
+                return info.name
+
+        return None
+
+    # eviction
+
+    def evict(self, keep: int = KEEP_VERSIONS, budget_mb: float = BUDGET_MB) -> list[str]:
+        # least recently used versions go first, the current ones never
+        with self._lock:
+            removed = []
+            state = self._load_state()
+
+            for kind in POINTERS:
+                for info in self.versions(kind)[max(keep, 1):]:
+                    if not info.current:
+                        self._remove_version(info.name, state)
+                        removed.append(info.name)
+
+            self.collect_garbage()
+            candidates = [info for info in reversed(self.versions()) if not info.current]
+            budget = budget_mb * 1024 * 1024
+            usage = self.blob_usage()
+
+            for info in candidates:
+                if usage <= budget:
+                    break
+
+                # blobs the current versions or a prefix link stay, a
+                # version that frees nothing costs nothing to keep
+                if not self._exclusive_size(info.name):
+                    continue
+
+                usage -= self._remove_version(info.name, state)
+                removed.append(info.name)
+
+            if removed:
+                self._save_state(state)
+                print(f"store: evicted {', '.join(removed)}")
+
+            return removed
+
+    def _version_blobs(self, name: str) -> Counter[Path]:
+        # blob -> how many files of the version link it
+        return Counter(self._blob_path(digest) for digest in self.hashes(name).values())
+
+    def _exclusive_size(self, name: str) -> int:
+        # bytes only this version holds, the blob itself is one more link
+        size = 0
+
+        for blob, links in self._version_blobs(name).items():
+            try:
+                stat = blob.stat()
+            except OSError:
+                continue
+
+            if stat.st_nlink == links + 1:
+                size += stat.st_size
+
+        return size
+
+    def _remove_version(self, name: str, state: dict[str, Any]) -> int:
+        blobs = self._version_blobs(name)
+        shutil.rmtree(self.versions_dir / name, ignore_errors=True)
+        state["versions"].pop(name, None)
+        freed = 0
+
+        for blob in blobs:
+            try:
+                stat = blob.stat()
+            except OSError:
+                continue
+
+            if stat.st_nlink == 1:
+                blob.unlink()
+                freed += stat.st_size
+
+        return freed
+
+    def collect_garbage(self) -> int:
+        # a blob only linked from the store itself belongs to no version and
+        # no prefix anymore, prefixes hardlinking it keep it alive
+        freed = 0
+
+        if not self.blobs.exists():
+            return 0
+
+        for current, _, files in os.walk(self.blobs):
+            for file in files:
+                path = Path(current) / file
+                stat = path.stat()
+
+                if stat.st_nlink == 1:
+                    path.unlink()
+                    freed += stat.st_size
+
+        return freed
+
+    def blob_usage(self) -> int:
+        total = 0
+
+        if not self.blobs.exists():
+            return 0
+
+        for current, _, files in os.walk(self.blobs):
+            for file in files:
+                total += (Path(current) / file).stat().st_size
+
+        return total
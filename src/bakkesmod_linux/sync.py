@@ -0,0 +1,283 @@
+import errno
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+
+from pathlib import Path
+from typing import NamedTuple
+from bakkesmod_linux.archive import INSTALL_INDEX_NAME
+from bakkesmod_linux.copier import CopyEngine, copy_file
+from bakkesmod_linux.utils import write_atomic
+
+MANIFEST_NAME = ".bakkesmod-linux-manifest.json"
+MANIFEST_VERSION = 1
+# sha256 of every file in a stored version, written when it is installed
+FILE_HASHES_NAME = "file_hashes.json"
+
+# our own bookkeeping files, never deployed into a prefix
+SYNC_IGNORE = {MANIFEST_NAME, INSTALL_INDEX_NAME, FILE_HASHES_NAME, "data.json", "release_cache.json"}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# how files get into a prefix: real copies, or links back into the cache
+DEPLOY_COPY = "copy"
+DEPLOY_LINK = "link"
+DEPLOY_MODES = (DEPLOY_COPY, DEPLOY_LINK)
+
+# what actually ended up in the prefix for a file
+KIND_COPY = "copy"
+KIND_HARDLINK = "hardlink"
+KIND_SYMLINK = "symlink"
+
+# files wine or bakkesmod write to must be real copies, a write through a
+# link would land in the cache and in every other prefix. first match wins.
+# cfg and plugins never get here, prefixes symlink the shared directories
+# and those only ever hold copies (see BakkesHelper._seed_shared_dirs)
+DEPLOY_POLICY = [
+    ("data/*.json", DEPLOY_COPY),
+    ("data/*.cfg", DEPLOY_COPY),
+    ("*.log", DEPLOY_COPY),
+    ("*.ini", DEPLOY_COPY),
+    # a symlinked version.txt would follow the cache and hide a pending update
+    ("version.txt", DEPLOY_COPY),
+    ("*", DEPLOY_LINK),
+]
+
+# errors that mean "no hardlinks here", not "something is broken"
+_NO_HARDLINK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES}
+
+# relative path -> (size, mtime_ns, sha256), a prefix manifest also
+# records the deploy kind as a fourth item (missing means copy)
+Manifest = dict[str, tuple]
+
+class SyncResult(NamedTuple):
+    copied: int
+    removed: int
+    unchanged: int
+    linked: int = 0
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+def load_manifest(path: Path) -> Manifest:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return {}
+
+    return {rel: tuple(entry) for rel, entry in data.get("files", {}).items()}
+
+def save_manifest(path: Path, manifest: Manifest) -> None:
+    payload = {"version": MANIFEST_VERSION, "files": manifest}
+    write_atomic(path, json.dumps(payload, separators=(",", ":")))
+
+def build_manifest(root: Path, skip_dirs: list[str] | None = None, previous: Manifest | None = None) -> Manifest:
+    skip_dirs = skip_dirs or []
+    previous = previous or {}
+    manifest: Manifest = {}
+
+    for current, dirs, files in os.walk(root):
+        rel_dir = os.path.relpath(current, root)
+
+        if rel_dir == ".":
+            rel_dir = ""
+            dirs[:] = [d for d in dirs if d not in skip_dirs]
+
+        for name in files:
+            rel = f"{rel_dir}/{name}" if rel_dir else name
+
+            if rel in SYNC_IGNORE:
+                continue
+
+            path = Path(current) / name
+            stat = path.stat()
+            known = previous.get(rel)
+
+            # only hash files that changed since the last manifest
+            if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+                manifest[rel] = known
+            else:
+                manifest[rel] = (stat.st_size, stat.st_mtime_ns, hash_file(path))
+
+    return manifest
+
+def link_dirs(src: Path, dst: Path, symlink_dirs: list[str]) -> None:
+    for rel in symlink_dirs:
+        source_dir = src / rel
+        target_dir = dst / rel
+
+        if not source_dir.is_dir():
+            continue
+
+        if target_dir.is_symlink():
+            if os.readlink(target_dir) == str(source_dir):
+                continue
+            target_dir.unlink()
+        elif target_dir.exists():
+            shutil.rmtree(target_dir)
+
+        target_dir.parent.mkdir(parents=True, exist_ok=True)
+        target_dir.symlink_to(source_dir, target_is_directory=True)
+
+def deploy_policy(rel: str, mode: str) -> str:
+    if mode == DEPLOY_COPY:
+        return DEPLOY_COPY
+
+    for pattern, policy in DEPLOY_POLICY:
+        if fnmatch.fnmatchcase(rel, pattern):
+            return policy
+
+    return DEPLOY_LINK
+
+def _recorded_kind(recorded: tuple) -> str:
+    return recorded[3] if len(recorded) > 3 else KIND_COPY
+
+def _is_current(path: Path, recorded: tuple | None, expected_hash: str, policy: str = DEPLOY_COPY) -> bool:
+    if recorded is None or recorded[2] != expected_hash:
+        return False
+
+    # a copy left over from copy mode gets relinked and vice versa
+    if (_recorded_kind(recorded) == KIND_COPY) != (policy == DEPLOY_COPY):
+        return False
+
+    # catch files touched or removed inside the prefix since the last sync
+    try:
+        stat = path.stat()
+    except OSError:
+        return False
+
+    return stat.st_size == recorded[0] and stat.st_mtime_ns == recorded[1]
+
+def prepare_manifest(src: Path, symlink_dirs: list[str] | None = None) -> Manifest:
+    manifest_path = src / MANIFEST_NAME
+    manifest = build_manifest(src, symlink_dirs, load_manifest(manifest_path))
+    save_manifest(manifest_path, manifest)
+    return manifest
+
+class Deployer:
+    # puts one file into the prefix, always through a temp name and a rename
+    # so a running game never sees a half written file and an old hardlink
+    # is replaced instead of written through into the cache
+    def __init__(self):
+        self.hardlinks = True
+
+    def copy(self, source: Path, target: Path) -> str:
+        copy_file(source, target, replace=True)
+        return KIND_COPY
+
+    def link(self, source: Path, target: Path) -> str:
+        if self.hardlinks:
+            try:
+                self._place(os.link, source, target)
+                return KIND_HARDLINK
+            except OSError as e:
+                if e.errno not in _NO_HARDLINK_ERRNOS:
+                    raise
+
+                # the cache and the prefix are on different filesystems,
+                # don't try again for every file
+                print(f"sync: hardlinks not possible ({e.strerror}), using symlinks")
+                self.hardlinks = False
+
+        self._place(os.symlink, source.resolve(), target)
+        return KIND_SYMLINK
+
+    def _place(self, make_link, source: Path, target: Path):
+        # a new file is linked directly, an existing one is swapped atomically
+        try:
+            make_link(source, target)
+            return
+        except FileExistsError:
+            pass
+
+        tmp_path = target.with_name(f".{target.name}.sync")
+        tmp_path.unlink(missing_ok=True)
+        make_link(source, tmp_path)
+        os.replace(tmp_path, target)
+
+def sync_tree(
+    src: Path,
+    dst: Path,
+    symlink_dirs: list[str] | None = None,
+    src_manifest: Manifest | None = None,
+    mode: str = DEPLOY_COPY,
+    shared_root: Path | None = None,
+    progress=None
+) -> SyncResult:
+    # symlink_dirs point into shared_root when given, so user data kept
+    # outside a versioned src survives switching versions
+    symlink_dirs = symlink_dirs or []
+    dst_manifest_path = dst / MANIFEST_NAME
+
+    if src_manifest is None:
+        src_manifest = prepare_manifest(src, symlink_dirs)
+
+    dst.mkdir(parents=True, exist_ok=True)
+    link_dirs(shared_root or src, dst, symlink_dirs)
+
+    dst_manifest = load_manifest(dst_manifest_path)
+    new_manifest: Manifest = {}
+    deployer = Deployer()
+    created_dirs: set[Path] = set()
+    # copies are batched for the copy engine, links are cheap enough inline
+    copies: list[tuple[str, str]] = []
+    linked = unchanged = removed = 0
+
+    for rel, (_, _, file_hash) in src_manifest.items():
+        target = dst / rel
+        recorded = dst_manifest.get(rel)
+        policy = deploy_policy(rel, mode)
+
+        if _is_current(target, recorded, file_hash, policy):
+            new_manifest[rel] = recorded
+            unchanged += 1
+            continue
+
+        if target.parent not in created_dirs:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            created_dirs.add(target.parent)
+
+        if policy != DEPLOY_LINK:
+            copies.append((rel, file_hash))
+            continue
+
+        kind = deployer.link(src / rel, target)
+        linked += 1
+        stat = target.stat()
+        new_manifest[rel] = (stat.st_size, stat.st_mtime_ns, file_hash, kind)
+
+    engine = CopyEngine(progress=progress, label="copying bakkesmod files")
+    engine.copy([(src / rel, dst / rel) for rel, _ in copies], replace=True)
+    copied = len(copies)
+
+    for rel, file_hash in copies:
+        stat = (dst / rel).stat()
+        new_manifest[rel] = (stat.st_size, stat.st_mtime_ns, file_hash, KIND_COPY)
+
+    # files we deployed before that are gone from the release
+    for rel in dst_manifest.keys() - src_manifest.keys():
+        # never delete through a directory that is now a symlink into the cache
+        if rel.split("/", 1)[0] in symlink_dirs:
+            continue
+
+        try:
+            (dst / rel).unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+
+    save_manifest(dst_manifest_path, new_manifest)
+    print(f"sync: {copied} copied, {linked} linked, {removed} removed, {unchanged} unchanged")
+
+    return SyncResult(copied, removed, unchanged, linked)
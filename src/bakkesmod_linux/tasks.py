@@ -0,0 +1,168 @@
+import threading
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable
+from bakkesmod_linux.timing import span
+
+MAX_WORKERS = 4
+
+TASK_PENDING = "pending"
+TASK_RUNNING = "running"
+TASK_OK = "ok"
+TASK_FAILED = "failed"
+TASK_SKIPPED = "skipped"
+
+class TaskProgress:
+    # per task view of the shared reporter, same interface as ProgressReporter
+    def __init__(self, graph: "TaskGraph", name: str):
+        self._graph = graph
+        self._name = name
+        self._has_error = False
+        self._last_message = ""
+
+    def set_status_msg(self, message):
+        self._last_message = message
+        self._graph._forward_status(message)
+
+    def status(self, message):
+        self._last_message = message
+        self._graph._report(self._name, message, None)
+
+    def progress(self, message, percentage):
+        self._last_message = message
+        self._graph._report(self._name, message, percentage)
+
+    def done(self, message):
+        self._last_message = message
+        self._graph._report(self._name, message, 100)
+
+    def error(self, message):
+        self._has_error = True
+        self._last_message = message
+        self._graph._error(message)
+
+class _Task:
+    def __init__(self, name: str, fn: Callable[[TaskProgress], Any], deps: list[str], weight: int):
+        self.name = name
+        self.fn = fn
+        self.deps = deps
+        self.weight = weight
+        self.state = TASK_PENDING
+        self.percentage = 0
+        self.progress: TaskProgress | None = None
+
+class TaskGraph:
+    # runs steps as soon as their dependencies succeeded, independent
+    # steps run concurrently and report into one progress reporter
+    def __init__(self, progress, max_workers: int = MAX_WORKERS, name: str | None = None):
+        self.progress = progress
+        self.max_workers = max_workers
+        # when set, every task is recorded as a "<name>.<task>" timing span
+        self.name = name
+        self._tasks: dict[str, _Task] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, fn: Callable[[TaskProgress], Any], deps: list[str] | None = None, weight: int = 1):
+        deps = deps or []
+
+        for dep in deps:
+            if dep not in self._tasks:
+                raise ValueError(f"task {name} depends on unknown task {dep}")
+
+        self._tasks[name] = _Task(name, fn, deps, weight)
+
+    def state(self, name: str) -> str:
+        return self._tasks[name].state
+
+    def message(self, name: str) -> str:
+        task = self._tasks[name]
+        return task.progress._last_message if task.progress else ""
+
+    def run(self) -> bool:
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                self._skip_blocked()
+
+                for task in self._ready():
+                    task.progress = TaskProgress(self, task.name)
+                    task.state = TASK_RUNNING
+                    running[pool.submit(self._run_task, task)] = task
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    task = running.pop(future)
+                    task.state = TASK_OK if future.result() else TASK_FAILED
+
+        return all(task.state == TASK_OK for task in self._tasks.values())
+
+    def _run_task(self, task: _Task) -> bool:
+        if self.name is None:
+            return self._call(task)
+
+        with span(f"{self.name}.{task.name}") as fields:
+            fields["ok"] = self._call(task)
+            return fields["ok"]
+
+    def _call(self, task: _Task) -> bool:
+        try:
+            result = task.fn(task.progress)
+        except Exception as e:
+            task.progress.error(str(e))
+            return False
+
+        # an explicit bool wins, so a step can report a soft error and still pass
+        if isinstance(result, bool):
+            return result
+
+        return not task.progress._has_error
+
+    def _ready(self) -> list[_Task]:
+        return [
+            task for task in self._tasks.values()
+            if task.state == TASK_PENDING and all(self._tasks[dep].state == TASK_OK for dep in task.deps)
+        ]
+
+    def _skip_blocked(self):
+        changed = True
+
+        while changed:
+            changed = False
+
+            for task in self._tasks.values():
+                if task.state != TASK_PENDING:
+                    continue
+
+                if any(self._tasks[dep].state in (TASK_FAILED, TASK_SKIPPED) for dep in task.deps):
+                    task.state = TASK_SKIPPED
+                    changed = True
+
+    def _overall(self) -> int:
+        total = sum(task.weight for task in self._tasks.values())
+        done = sum(
+            task.weight * (100 if task.state in (TASK_OK, TASK_FAILED, TASK_SKIPPED) else task.percentage)
+            for task in self._tasks.values()
+        )
+        return int(done / total) if total else 100
+
+    def _report(self, name: str, message: str, percentage: int | None):
+        with self._lock:
+            task = self._tasks[name]
+
+            if percentage is not None:
+                task.percentage = max(0, min(percentage, 100))
+
+            self.progress.progress(message, self._overall())
+
+    def _forward_status(self, message: str):
+        with self._lock:
+            self.progress.set_status_msg(message)
+
+    def _error(self, message: str):
+        with self._lock:
+            self.progress.error(message)
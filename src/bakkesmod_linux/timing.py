@@ -0,0 +1,135 @@
+import functools
+import json
+import math
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+from bakkesmod_linux.constants import BAKKESMOD_LOCATION
+
+TIMINGS_FILE = BAKKESMOD_LOCATION / "timings.jsonl"
+# rotated to timings.jsonl.1, .2 ... once it grows past this
+MAX_HISTORY_BYTES = 512 * 1024
+HISTORY_BACKUPS = 2
+# how many records --stats looks at
+STATS_RECENT = 2000
+# set to anything to stop recording
+DISABLE_ENV = "BAKKESLINUX_NO_TIMINGS"
+
+_write_lock = threading.Lock()
+_enabled = os.getenv(DISABLE_ENV, "") == ""
+
+def _backup_path(index: int):
+    return TIMINGS_FILE.with_name(f"{TIMINGS_FILE.name}.{index}")
+
+def _rotate():
+    for index in range(HISTORY_BACKUPS, 1, -1):
+        if _backup_path(index - 1).exists():
+            os.replace(_backup_path(index - 1), _backup_path(index))
+
+    os.replace(TIMINGS_FILE, _backup_path(1))
+
+def record(name: str, ms: float, **fields):
+    if not _enabled:
+        return
+
+    entry = {"time": round(time.time(), 3), "span": name, "ms": round(ms, 3), **fields}
+    line = json.dumps(entry, separators=(",", ":")) + "\n"
+
+    # timings are diagnostics, failing to write them must never break a run
+    try:
+        with _write_lock:
+            TIMINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
+
+            try:
+                if TIMINGS_FILE.stat().st_size >= MAX_HISTORY_BYTES:
+                    _rotate()
+            except FileNotFoundError:
+                pass
+
+            with open(TIMINGS_FILE, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        print(f"timing: failed to record {name}: {e}")
+
+@contextmanager
+def span(name: str, **fields) -> Iterator[dict[str, Any]]:
+    # fields can be filled in by the caller while the span is open,
+    # setting "ok" to False marks the phase as failed
+    fields.setdefault("ok", True)
+    start = time.perf_counter()
+
+    try:
+        yield fields
+    except BaseException as e:
+        fields["ok"] = False
+        fields.setdefault("error", type(e).__name__)
+        raise
+    finally:
+        record(name, (time.perf_counter() - start) * 1000, **fields)
+
+def timed(name: str) -> Callable:
+    # for functions that signal failure by returning False
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name) as fields:
+                result = fn(*args, **kwargs)
+                fields["ok"] = result is not False
+                return result
+
+        return wrapper
+
+    return decorator
+
+def load_history(limit: int = STATS_RECENT) -> list[dict[str, Any]]:
+    records: list[dict[str, Any]] = []
+
+    # oldest backup first so the newest records end up at the tail
+    for path in [_backup_path(index) for index in range(HISTORY_BACKUPS, 0, -1)] + [TIMINGS_FILE]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # a crash mid write leaves a torn last line
+                        continue
+
+                    if isinstance(entry, dict) and "span" in entry and "ms" in entry:
+                        records.append(entry)
+        except OSError:
+            continue
+
+    return records[-limit:]
+
+def percentile(values: list[float], pct: float) -> float:
+    # nearest rank, values must be sorted
+    if not values:
+        return 0.0
+
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+def summarize(records: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    by_span: dict[str, list[dict[str, Any]]] = {}
+
+    for entry in records:
+        by_span.setdefault(entry["span"], []).append(entry)
+
+    summary = []
+
+    for name, entries in sorted(by_span.items()):
+        values = sorted(entry["ms"] for entry in entries)
+        summary.append({
+            "span": name,
+            "count": len(values),
+            "failed": sum(1 for entry in entries if entry.get("ok") is False),
+            "p50_ms": round(percentile(values, 50), 3),
+            "p95_ms": round(percentile(values, 95), 3),
+            "max_ms": round(values[-1], 3),
+        })
+
+    return summary
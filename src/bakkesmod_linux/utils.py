@@ -1,11 +1,11 @@
-import subprocess
-import sys
 import os
-import shutil
+import tempfile
 
 from pathlib import Path
 from importlib.resources import files, as_file
 from contextlib import contextmanager
+from functools import lru_cache
+from bakkesmod_linux.procscan import get_scanner
 
 WINE_VARS_ALLOWED = [
     "WINEPREFIX",
@@ -36,32 +36,28 @@ WINE_VARS_ALLOWED = [
     "VDPAU_DRIVER_PATH",
 ]
 
-def copy_tree(src: Path, dst: Path, symlink_dirs: list[str] | None = None):
-    symlink_dirs = symlink_dirs or []
+def write_atomic(path: Path, content: str, durable: bool = True) -> None:
+    # readers either see the old file or the new one, never a partial write
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
 
-    for root, dirs, _files in os.walk(src):
-        rel = Path(root).relative_to(src)
-        target_dir = dst / rel
-
-        # check if current dir should be symlinked
-        if str(rel) in symlink_dirs:
-            # remove existing dir/symlink if any
-            if target_dir.exists() or target_dir.is_symlink():
-                if target_dir.is_symlink():
-                    target_dir.unlink()
-                else:
-                    shutil.rmtree(target_dir)
-
-            target_dir.symlink_to(Path(root), target_is_directory=True)
-            dirs.clear()  # dont descend into symlinked dirs
-            continue
-
-        target_dir.mkdir(parents=True, exist_ok=True)
-
-        for file in _files:
-            src_file = Path(root) / file
-            dst_file = target_dir / file
-            shutil.copy2(src_file, dst_file)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            if durable:
+                os.fsync(f.fileno())
+
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+    if durable:
+        dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
 
 @contextmanager
 def get_resource_path(filename: str):
@@ -73,6 +69,11 @@ def get_resource_path(filename: str):
     with as_file(resource) as path:
         yield path
 
+@lru_cache(maxsize=None)
+def read_resource(filename: str) -> bytes:
+    # resources never change while running, read each one once
+    return files("bakkesmod_linux").joinpath("resources", filename).read_bytes()
+
 def get_file_content(location: str) -> str:
     content = ""
 
@@ -86,93 +87,8 @@ def get_file_content(location: str) -> str:
 
     return content
 
-def run(
-    cmd: str,
-    check: bool = True,
-    env: dict[str, str] | None = None,
-    capture: bool = False,
-    wait: bool = True,
-) -> tuple[int, str]:
-    print(f"exec: {cmd}")
-
-    if wait:
-        result = subprocess.run(
-            cmd,
-            shell=True,
-            env=env,
-            capture_output=capture,
-            text=capture,
-        )
-
-        if check and result.returncode != 0:
-            print(f"command failed with exit code {result.returncode}")
-            sys.exit(result.returncode)
-
-        stdout = result.stdout or ""
-        stderr = result.stderr or ""
-        return result.returncode, f"{stdout}{stderr}"
-
-    _ = subprocess.Popen(
-        cmd,
-        shell=True,
-        env=env,
-        stdout=subprocess.PIPE if capture else None,
-        stderr=subprocess.PIPE if capture else None,
-        text=capture,
-    )
-
-    return 0, ""
-
 def get_process_env(process_name) -> tuple[int, dict[str, str]] | None:
-    try:
-        # get all pids matching the process
-        result = subprocess.run(
-            ["pgrep", "-f", process_name],
-            capture_output=True,
-            text=True,
-            check=False
-        )
-
-        if result.returncode != 0:
-            return None
-
-        if result.returncode != 0:
-            return None
-
-        pids = result.stdout.strip().split("\n")
-
-        # we dont any wrapper process
-        wrappers = ["umu-run", "proton", "pv-adverb", "steam-runtime"]
-
-        for pid in pids:
-            try:
-                with open(f"/proc/{pid}/cmdline", "rb") as f:
-                    cmdline = f.read().decode("utf-8", errors="ignore")
-
-                # skip if its a wrapper process
-                if any(wrapper in cmdline for wrapper in wrappers):
-                    continue
-
-                # this is the real process, grab its env
-                with open(f"/proc/{pid}/environ", "rb") as f:
-                    environ_data = f.read().decode("utf-8", errors="ignore")
-
-                env_dict: dict[str, str] = {}
-
-                for entry in environ_data.split("\0"):
-                    if "=" in entry:
-                        key, value = entry.split("=", 1)
-                        env_dict[key] = value
-
-                return int(pid), env_dict
-
-            except (FileNotFoundError, PermissionError):
-                continue
-
-        return None
-
-    except (FileNotFoundError, PermissionError):
-        return None
+    return get_scanner().find(process_name)
 
 def filter_game_env(env: dict) -> dict:
     filtered = {k: env[k] for k in WINE_VARS_ALLOWED if k in env}
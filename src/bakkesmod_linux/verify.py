@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+from bakkesmod_linux.constants import BAKKESMOD_LOCATION
+from bakkesmod_linux.copier import default_workers
+from bakkesmod_linux.store import KIND_BAKKESMOD, KIND_INJECTOR, VersionStore
+from bakkesmod_linux.sync import DEPLOY_COPY, DEPLOY_LINK, MANIFEST_NAME, deploy_policy, hash_file, load_manifest
+from bakkesmod_linux.timing import span
+from bakkesmod_linux.utils import write_atomic
+
+VERIFY_CACHE_FILE = BAKKESMOD_LOCATION / "verify_cache.json"
+VERIFY_CACHE_VERSION = 1
+
+AREA_CACHE = "cache"
+
+PROBLEM_MISSING = "missing"
+PROBLEM_MODIFIED = "modified"
+PROBLEM_UNREADABLE = "unreadable"
+PROBLEM_NO_HASHES = "no recorded hashes, reinstall this version to record them"
+
+class Problem(NamedTuple):
+    # "cache" or the prefix path the file was deployed to
+    area: str
+    path: str
+    problem: str
+
+class VerifyReport(NamedTuple):
+    checked: int
+    # files actually read, the rest were unchanged since the last check
+    hashed: int
+    problems: list[Problem]
+    seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+class HashCache:
+    # "dev:inode" -> (size, mtime_ns, ctime_ns, sha256). keyed by inode so a
+    # file hardlinked into several prefixes is hashed once, and ctime is in
+    # the key because copy2-style tools can put an old mtime back
+    def __init__(self, path: Path = VERIFY_CACHE_FILE):
+        self.path = path
+        self._entries: dict[str, list] = {}
+        self._seen: set[str] = set()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+
+        if isinstance(data, dict) and data.get("version") == VERIFY_CACHE_VERSION:
+            self._entries = data.get("files", {})
+
+    @staticmethod
+    def key(stat: os.stat_result) -> str:
+        return f"{stat.st_dev}:{stat.st_ino}"
+
+    def lookup(self, stat: os.stat_result) -> str | None:
+        key = self.key(stat)
+
+        with self._lock:
+            self._seen.add(key)
+            entry = self._entries.get(key)
+
+        if entry and entry[:3] == [stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns]:
+            return entry[3]
+
+        return None
+
+    def store(self, stat: os.stat_result, digest: str):
+        with self._lock:
+            self._entries[self.key(stat)] = [stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, digest]
+            self._dirty = True
+
+    def save(self):
+        # inodes nothing pointed at this run are gone or evicted
+        with self._lock:
+            stale = self._entries.keys() - self._seen
+
+            if not self._dirty and not stale:
+                return
+
+            for key in stale:
+                del self._entries[key]
+
+            payload = {"version": VERIFY_CACHE_VERSION, "files": self._entries}
+            write_atomic(self.path, json.dumps(payload, separators=(",", ":")), durable=False)
+            self._dirty = False
+
+def _expected_files(store: VersionStore, prefixes: list[str]) -> tuple[list[tuple[str, str, str]], list[Problem]]:
+    # plain strings, pathlib would cost more than the stat calls themselves
+    expected: list[tuple[str, str, str]] = []
+    problems: list[Problem] = []
+
+    for kind in (KIND_BAKKESMOD, KIND_INJECTOR):
+        version = store.current_path(kind)
+
+        if version is None:
+            continue
+
+        hashes = store.hashes(version.name)
+
+        if not hashes:
+            problems.append(Problem(AREA_CACHE, str(version), PROBLEM_NO_HASHES))
+            continue
+
+        root = str(version)
+        expected.extend((AREA_CACHE, f"{root}/{rel}", digest) for rel, digest in hashes.items())
+
+    for prefix in prefixes:
+        # the prefix manifest records what each deployed file should hash to
+        for rel, entry in load_manifest(Path(prefix) / MANIFEST_NAME).items():
+            # files wine or bakkesmod write to are supposed to change
+            if deploy_policy(rel, DEPLOY_LINK) == DEPLOY_COPY:
+                continue
+
+            expected.append((prefix, f"{prefix}/{rel}", entry[2]))
+
+    return expected, problems
+
+def verify_install(
+    store: VersionStore, prefixes: list[str], cache: HashCache | None = None, workers: int | None = None
+) -> VerifyReport:
+    started = time.monotonic()
+    cache = cache or HashCache()
+    expected, problems = _expected_files(store, prefixes)
+    stats: dict[int, os.stat_result] = {}
+    # one hash per inode, hardlinks between cache and prefixes share it
+    to_hash: dict[str, tuple[str, os.stat_result]] = {}
+    digests: dict[str, str] = {}
+
+    with span("verify", files=len(expected)) as fields:
+        for index, (area, path, _) in enumerate(expected):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                problems.append(Problem(area, path, PROBLEM_MISSING))
+                continue
+            except OSError:
+                problems.append(Problem(area, path, PROBLEM_UNREADABLE))
+                continue
+
+            stats[index] = stat
+            key = HashCache.key(stat)
+            cached = cache.lookup(stat)
+
+            if cached is not None:
+                digests[key] = cached
+            else:
+                to_hash.setdefault(key, (path, stat))
+
+        def compute(item: tuple[str, tuple[str, os.stat_result]]):
+            key, (path, stat) = item
+
+            try:
+                digest = hash_file(path)
+            except OSError:
+                return
+
+            digests[key] = digest
+            cache.store(stat, digest)
+
+        jobs = list(to_hash.items())
+        workers = min(workers or default_workers(BAKKESMOD_LOCATION), max(len(jobs), 1))
+
+        if workers <= 1:
+            for job in jobs:
+                compute(job)
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verify") as pool:
+                list(pool.map(compute, jobs))
+
+        for index, stat in stats.items():
+            area, path, digest = expected[index]
+            actual = digests.get(HashCache.key(stat))
+
+            if actual is None:
+                problems.append(Problem(area, path, PROBLEM_UNREADABLE))
+            elif actual != digest:
+                problems.append(Problem(area, path, PROBLEM_MODIFIED))
+
+        fields["hashed"] = len(jobs)
+        fields["problems"] = len(problems)
+        fields["ok"] = not problems
+
+    try:
+        cache.save()
+    except OSError as e:
+        print(f"verify: failed to save the hash cache: {e}")
+
+    return VerifyReport(len(expected), len(jobs), problems, time.monotonic() - started)
@@ -0,0 +1,305 @@
+import os
+import errno
+import select
+import socket
+import struct
+import threading
+import time
+
+from typing import Callable, NamedTuple
+from bakkesmod_linux.procscan import get_scanner
+
+PROCESS_STARTED = "started"
+PROCESS_EXITED = "exited"
+
+# adaptive /proc scan bounds (seconds), only used without the proc connector.
+# that is the usual unprivileged case, so the slowest scan stays below the
+# 3s pgrep poll it replaced
+SCAN_MIN_INTERVAL = 0.5
+SCAN_MAX_INTERVAL = 2.0
+
+# after a matching exec the real game process can take a moment to show up
+# (umu-run / proton spawn it), so keep rescanning quickly for a while
+EXEC_SETTLE_INTERVAL = 0.25
+EXEC_SETTLE_TIMEOUT = 30.0
+
+# exit polling interval when pidfd_open is not available
+EXIT_POLL_INTERVAL = 1.0
+
+# linux/netlink.h, linux/connector.h, linux/cn_proc.h
+NETLINK_CONNECTOR = 11
+NLMSG_DONE = 3
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+PROC_CN_MCAST_LISTEN = 1
+PROC_EVENT_EXEC = 0x00000002
+PROC_EVENT_EXIT = 0x80000000
+
+NLMSG_HDR = struct.Struct("=IHHII")
+CN_MSG_HDR = struct.Struct("=IIIIHH")
+PROC_EVENT_HDR = struct.Struct("=IIQ")
+PROC_EVENT_IDS = struct.Struct("=II")
+
+class ProcessEvent(NamedTuple):
+    kind: str
+    pid: int
+    env: dict[str, str] | None = None
+
+class ProcConnector:
+    # kernel process event connector, needs CAP_NET_ADMIN on most kernels
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+
+        try:
+            self.sock.bind((0, CN_IDX_PROC))
+            port = self.sock.getsockname()[0]
+
+            op = struct.pack("=I", PROC_CN_MCAST_LISTEN)
+            cn_msg = CN_MSG_HDR.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(op), 0) + op
+            header = NLMSG_HDR.pack(NLMSG_HDR.size + len(cn_msg), NLMSG_DONE, 0, 0, port)
+
+            self.sock.send(header + cn_msg)
+            self.sock.setblocking(False)
+        except OSError:
+            self.sock.close()
+            raise
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def close(self):
+        self.sock.close()
+
+    def read_events(self) -> list[tuple[int, int]] | None:
+        # returns (event, tgid) pairs, or None if the kernel dropped events
+        events: list[tuple[int, int]] = []
+        event_size = CN_MSG_HDR.size + PROC_EVENT_HDR.size + PROC_EVENT_IDS.size
+
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                return events
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:
+                    return None
+                raise
+
+            offset = 0
+
+            while offset + NLMSG_HDR.size <= len(data):
+                length, msg_type, _, _, _ = NLMSG_HDR.unpack_from(data, offset)
+
+                if length < NLMSG_HDR.size:
+                    break
+
+                body = offset + NLMSG_HDR.size
+
+                if msg_type == NLMSG_DONE and length - NLMSG_HDR.size >= event_size:
+                    what, _, _ = PROC_EVENT_HDR.unpack_from(data, body + CN_MSG_HDR.size)
+                    pid, tgid = PROC_EVENT_IDS.unpack_from(
+                        data, body + CN_MSG_HDR.size + PROC_EVENT_HDR.size
+                    )
+
+                    # ignore thread level events
+                    if what in (PROC_EVENT_EXEC, PROC_EVENT_EXIT) and pid == tgid:
+                        events.append((what, tgid))
+
+                offset += (length + 3) & ~3
+
+class ProcessWatcher:
+    # reports every matching process, several game instances can run at once
+    def __init__(self, process_name: str, on_event: Callable[[ProcessEvent], None]):
+        self.process_name = process_name
+        self.on_event = on_event
+        self.backend = "scan"
+        # tracked pid -> pidfd, None when pidfd_open is not available
+        self._pids: dict[int, int | None] = {}
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._wake_r, self._wake_w = -1, -1
+
+    @property
+    def pid(self) -> int | None:
+        return next(iter(self._pids), None)
+
+    @property
+    def pids(self) -> list[int]:
+        return list(self._pids)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            if not self._stop.is_set():
+                return
+
+            # a stop() that timed out, the old thread still polls its pipe
+            self._thread.join()
+            self._close_wake_pipe()
+
+        self._stop.clear()
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = threading.Thread(target=self._run, name="rl-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+
+        if not self._stop.is_set():
+            self._stop.set()
+            os.write(self._wake_w, b"\0")
+
+        self._thread.join(timeout=2)
+
+        # closing the pipe under a running poll() could hand its fd number
+        # to something else, so it waits for the thread to be gone
+        if self._thread.is_alive():
+            print("watcher: thread is still busy, it will stop on its own")
+            return
+
+        self._thread = None
+        self._close_wake_pipe()
+
+    def _close_wake_pipe(self):
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+        self._wake_r, self._wake_w = -1, -1
+
+    def _run(self):
+        interval = SCAN_MIN_INTERVAL
+        settle_deadline = 0.0
+        connector = self._open_connector()
+
+        try:
+            while not self._stop.is_set():
+                if self._scan():
+                    interval = SCAN_MIN_INTERVAL
+
+                now = time.monotonic()
+
+                if connector:
+                    # exec events tell us about new instances, pidfds about exits
+                    timeout = EXEC_SETTLE_INTERVAL if now < settle_deadline else None
+                else:
+                    timeout = interval
+                    interval = min(interval * 2, SCAN_MAX_INTERVAL)
+
+                if any(pidfd is None for pidfd in self._pids.values()):
+                    timeout = EXIT_POLL_INTERVAL if timeout is None else min(timeout, EXIT_POLL_INTERVAL)
+
+                wake_at = None if timeout is None else now + timeout
+
+                # block until a exec event, an exit, the next scan tick or stop()
+                while not self._stop.is_set():
+                    fds = [pidfd for pidfd in self._pids.values() if pidfd is not None]
+
+                    if connector:
+                        fds.append(connector.fileno())
+
+                    ready = self._wait(fds, timeout)
+                    self._reap(ready)
+
+                    if not connector or connector.fileno() not in ready:
+                        break
+
+                    events = connector.read_events()
+
+                    # overflowed, rescan to make sure we didnt miss the game
+                    if events is None:
+                        break
+
+                    if any(what == PROC_EVENT_EXEC and self._matches(tgid) for what, tgid in events):
+                        settle_deadline = time.monotonic() + EXEC_SETTLE_TIMEOUT
+                        break
+
+                    if wake_at is not None:
+                        # unrelated execs don't move the next settle tick or exit poll
+                        timeout = max(0.0, wake_at - time.monotonic())
+        finally:
+            if connector:
+                connector.close()
+
+            for pidfd in self._pids.values():
+                if pidfd is not None:
+                    os.close(pidfd)
+
+            self._pids.clear()
+
+    def _open_connector(self) -> ProcConnector | None:
+        try:
+            connector = ProcConnector()
+            self.backend = "netlink"
+            return connector
+        except OSError:
+            self.backend = "scan"
+            return None
+
+    def _scan(self) -> bool:
+        # returns True if a new instance showed up
+        found = False
+
+        for pid, env in get_scanner().find_all(self.process_name):
+            if pid in self._pids:
+                continue
+
+            self._pids[pid] = self._open_pidfd(pid)
+            self._emit(ProcessEvent(PROCESS_STARTED, pid, env))
+            found = True
+
+        return found
+
+    def _reap(self, ready: set[int]):
+        for pid, pidfd in list(self._pids.items()):
+            if pidfd is None:
+                exited = not os.path.exists(f"/proc/{pid}")
+            else:
+                exited = pidfd in ready
+
+            if not exited:
+                continue
+
+            del self._pids[pid]
+
+            if pidfd is not None:
+                os.close(pidfd)
+
+            self._emit(ProcessEvent(PROCESS_EXITED, pid))
+
+    def _matches(self, pid: int) -> bool:
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                return self.process_name.encode() in f.read()
+        except OSError:
+            return False
+
+    def _open_pidfd(self, pid: int) -> int | None:
+        pidfd_open = getattr(os, "pidfd_open", None)
+
+        if pidfd_open is None:
+            return None
+
+        try:
+            return pidfd_open(pid)
+        except ProcessLookupError:
+            # already gone, report a ready fd so the exit is handled right away
+            r, w = os.pipe()
+            os.close(w)
+            return r
+        except OSError:
+            return None
+
+    def _wait(self, fds: list, timeout: float | None) -> set[int]:
+        poller = select.poll()
+        poller.register(self._wake_r, select.POLLIN)
+
+        for fd in fds:
+            poller.register(fd, select.POLLIN)
+
+        events = poller.poll(None if timeout is None else int(timeout * 1000))
+        return {fd for fd, _ in events if fd != self._wake_r}
+
+    def _emit(self, event: ProcessEvent):
+        try:
+            self.on_event(event)
+        except Exception as e:
+            print(f"watcher: callback failed: {e}")
@@ -0,0 +1,219 @@
+import os
+import re
+import threading
+
+from pathlib import Path
+
+SHELL_FOLDERS_KEY = r"software\microsoft\windows\currentversion\explorer\shell folders"
+USER_SHELL_FOLDERS_KEY = r"software\microsoft\windows\currentversion\explorer\user shell folders"
+VOLATILE_ENV_KEY = r"volatile environment"
+USER_ENV_KEY = r"environment"
+SYSTEM_ENV_KEY = r"system\currentcontrolset\control\session manager\environment"
+
+USER_KEYS = {SHELL_FOLDERS_KEY, USER_SHELL_FOLDERS_KEY, VOLATILE_ENV_KEY, USER_ENV_KEY}
+SYSTEM_KEYS = {SYSTEM_ENV_KEY}
+
+KEY_RE = re.compile(r"^\[(.+)\](?:\s+\d+)?\s*$")
+VAR_RE = re.compile(r"%([^%]+)%")
+ESCAPES = {"n": "\n", "r": "\r", "t": "\t", "0": "\0", "\\": "\\", '"': '"'}
+
+# key -> value name -> string, both lowercased
+Registry = dict[str, dict[str, str]]
+
+_cache: dict[str, tuple[int, Path | None]] = {}
+_cache_lock = threading.Lock()
+
+def _unescape(raw: str) -> str:
+    out = []
+    index = 0
+
+    while index < len(raw):
+        char = raw[index]
+
+        if char != "\\" or index + 1 >= len(raw):
+            out.append(char)
+            index += 1
+            continue
+
+        nxt = raw[index + 1]
+
+        if nxt == "x":
+            match = re.match(r"[0-9a-fA-F]{1,4}", raw[index + 2:])
+            if match:
+                out.append(chr(int(match.group(0), 16)))
+                index += 2 + len(match.group(0))
+                continue
+
+        out.append(ESCAPES.get(nxt, nxt))
+        index += 2
+
+    return "".join(out)
+
+def _read_quoted(line: str, start: int) -> tuple[str, int] | None:
+    # returns the raw (still escaped) text and the index after the closing quote
+    index = start
+
+    while index < len(line):
+        if line[index] == "\\":
+            index += 2
+            continue
+
+        if line[index] == '"':
+            return line[start:index], index + 1
+
+        index += 1
+
+    return None
+
+def parse_registry(path: Path, wanted: set[str]) -> Registry:
+    registry: Registry = {}
+    values: dict[str, str] | None = None
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith("["):
+                match = KEY_RE.match(line)
+                key = _unescape(match.group(1)).lower() if match else ""
+                values = registry.setdefault(key, {}) if key in wanted else None
+                continue
+
+            # only string values of wanted keys matter, skip everything else cheaply
+            if values is None or not line.startswith('"'):
+                continue
+
+            name = _read_quoted(line, 1)
+
+            if name is None:
+                continue
+
+            raw_name, index = name
+            rest = line[index:].rstrip("\n")
+
+            if rest.startswith('="'):
+                offset = 2
+            elif rest.startswith('=str(2):"'):
+                offset = 9
+            else:
+                continue
+
+            value = _read_quoted(rest, offset)
+
+            if value is not None:
+                values[_unescape(raw_name).lower()] = _unescape(value[0])
+
+    return registry
+
+def _expand(value: str, variables: dict[str, str]) -> str:
+    return VAR_RE.sub(lambda m: variables.get(m.group(1).lower(), m.group(0)), value)
+
+def _guess_profile(prefix: Path) -> str | None:
+    users = prefix / "drive_c" / "users"
+
+    try:
+        names = sorted(entry.name for entry in os.scandir(users) if entry.is_dir())
+    except OSError:
+        return None
+
+    candidates = [name for name in names if name.lower() not in ("public", "default")]
+    return f"C:\\users\\{candidates[0]}" if candidates else None
+
+def resolve_case_insensitive(base: Path, parts: list[str]) -> Path:
+    current = base
+
+    for index, part in enumerate(parts):
+        exact = current / part
+
+        if exact.exists():
+            current = exact
+            continue
+
+        try:
+            match = next(
+                (entry.name for entry in os.scandir(current) if entry.name.lower() == part.lower()),
+                None
+            )
+        except OSError:
+            match = None
+
+        # nothing on disk yet, keep the remaining parts as written
+        if match is None:
+            return current.joinpath(*parts[index:])
+
+        current = current / match
+
+    return current
+
+def windows_to_prefix_path(prefix: Path, win_path: str) -> Path | None:
+    win_path = win_path.replace("/", "\\")
+
+    if len(win_path) < 2 or win_path[1] != ":":
+        return None
+
+    drive = win_path[0].lower()
+    parts = [part for part in win_path[2:].split("\\") if part]
+
+    if drive == "c":
+        base = prefix / "drive_c"
+    else:
+        base = prefix / "dosdevices" / f"{drive}:"
+
+    return resolve_case_insensitive(base, parts)
+
+def _lookup_appdata(prefix: Path) -> Path | None:
+    user = parse_registry(prefix / "user.reg", USER_KEYS)
+
+    appdata = user.get(SHELL_FOLDERS_KEY, {}).get("appdata")
+
+    if not appdata:
+        template = user.get(USER_SHELL_FOLDERS_KEY, {}).get("appdata")
+
+        if not template:
+            return None
+
+        variables: dict[str, str] = {}
+        system_reg = prefix / "system.reg"
+
+        if system_reg.exists():
+            variables.update(parse_registry(system_reg, SYSTEM_KEYS).get(SYSTEM_ENV_KEY, {}))
+
+        variables.update(user.get(USER_ENV_KEY, {}))
+        variables.update(user.get(VOLATILE_ENV_KEY, {}))
+
+        if "userprofile" not in variables:
+            profile = _guess_profile(prefix)
+            if profile:
+                variables["userprofile"] = profile
+
+        appdata = _expand(template, variables)
+
+        if "%" in appdata:
+            return None
+
+    return windows_to_prefix_path(prefix, appdata)
+
+def get_appdata_path(wine_prefix: str | Path) -> Path | None:
+    prefix = Path(wine_prefix)
+
+    try:
+        mtime = (prefix / "user.reg").stat().st_mtime_ns
+    except OSError:
+        return None
+
+    key = str(prefix)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+    try:
+        appdata = _lookup_appdata(prefix)
+    except OSError as e:
+        print(f"failed to read wine registry: {e}")
+        return None
+
+    with _cache_lock:
+        _cache[key] = (mtime, appdata)
+
+    return appdata
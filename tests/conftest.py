@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+from pathlib import Path
+
+# the install and config locations are derived from $HOME at import time,
+# point them at a scratch directory before anything imports the package
+os.environ["HOME"] = tempfile.mkdtemp(prefix="bkl-test-")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
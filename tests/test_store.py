@@ -0,0 +1,92 @@
+import hashlib
+import io
+import os
+import zipfile
+
+from bakkesmod_linux.bakkesmod import BakkesHelper
+from bakkesmod_linux.constants import BAKKESMOD_LOCATION
+from bakkesmod_linux.progress import ProgressReporter
+from bakkesmod_linux.store import KIND_BAKKESMOD, VersionStore
+
+UNCHANGED = os.urandom(64 * 1024)
+
+def release(version: str) -> dict[str, bytes]:
+    return {
+        "version.txt": version.encode(),
+        "bakkesmod/dll/bakkesmod.dll": f"dll {version}".encode() * 1000,
+        "bakkesmod/data/unchanged.bin": UNCHANGED,
+        "plugins/example.dll": f"plugin {version}".encode(),
+    }
+
+def build_zip(files: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+
+    return buffer.getvalue()
+
+def install(helper: BakkesHelper, version: str) -> str:
+    archive = build_zip(release(version))
+    helper._iter_download = lambda url, progress=None, label="": iter([(archive, 100)])
+    name = helper._stream_install("http://localhost/bakkesmod.zip", version, ProgressReporter())
+    helper.store.activate(KIND_BAKKESMOD, name)
+    return name
+
+def test_update_stores_new_contents(tmp_path):
+    helper = BakkesHelper()
+    helper.store = VersionStore(tmp_path / "store", tmp_path)
+
+    first = install(helper, "1")
+    second = install(helper, "2")
+
+    old_root = helper.store.versions_dir / first
+    new_root = helper.store.versions_dir / second
+    hashes = helper.store.hashes(second)
+
+    for rel, data in release("2").items():
+        assert (new_root / rel).read_bytes() == data
+        assert hashes[rel] == hashlib.sha256(data).hexdigest()
+
+    # the old version is untouched and the unchanged file is stored once
+    for rel, data in release("1").items():
+        assert (old_root / rel).read_bytes() == data
+
+    assert os.path.samefile(old_root / "bakkesmod/data/unchanged.bin", new_root / "bakkesmod/data/unchanged.bin")
+
+def test_shared_dirs_are_copies(tmp_path):
+    helper = BakkesHelper()
+    helper.store = VersionStore(tmp_path / "store", tmp_path)
+    name = install(helper, "1")
+    helper._activate(KIND_BAKKESMOD, name)
+
+    stored = helper.store.versions_dir / name / "plugins/example.dll"
+    shared = BAKKESMOD_LOCATION / "plugins/example.dll"
+
+    assert not os.path.samefile(stored, shared)
+
+    # a plugin update writing in place must not reach the store
+    with open(shared, "r+b") as f:
+        f.write(b"patched")
+
+    assert stored.read_bytes() == b"plugin 1"
+
+def commit(store: VersionStore, version: str, files: dict[str, bytes]) -> str:
+    staging = store.begin(KIND_BAKKESMOD, version)
+
+    for rel, data in files.items():
+        (staging / rel).write_bytes(data)
+
+    return store.commit(KIND_BAKKESMOD, version, staging)
+
+def test_evict_keeps_versions_that_free_nothing(tmp_path):
+    store = VersionStore(tmp_path / "store", tmp_path)
+    shared = commit(store, "1", {"a.bin": UNCHANGED})
+    unique = commit(store, "2", {"a.bin": UNCHANGED, "b.bin": os.urandom(64 * 1024)})
+    store.activate(KIND_BAKKESMOD, commit(store, "3", {"a.bin": UNCHANGED}))
+
+    # the current version alone is over budget, only version 2 has space to give back
+    assert store.evict(keep=5, budget_mb=0.01) == [unique]
+    assert store.has(shared)
+    assert store.blob_usage() == len(UNCHANGED)